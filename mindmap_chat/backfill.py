@@ -0,0 +1,274 @@
+"""
+Background embedding backfill.
+Finds blocks without an intent embedding and user messages without a
+message embedding (e.g. after an import), plus items embedded with a model
+other than the current one, and embeds them in rate-limited batches so
+the request path never has to.
+
+Each batch is saved as soon as it is embedded, and a small progress file
+records totals and texts that keep failing, so an interrupted run resumes
+where it stopped.
+
+Usage (from mindmap_chat/):
+    python backfill.py                  # embed everything pending
+    python backfill.py --dry-run        # only count
+    python backfill.py --reembed-untagged --rate 30
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from threading import Event
+from typing import Any, Dict, List, Optional
+
+from config import config
+from core import embed_texts
+from llm.base import LLMClient
+from llm.scheduler import call_priority
+from models import Mindmap
+from storage import StorageBackend
+from storage.files import write_json_atomic
+
+
+@dataclass
+class BackfillItem:
+    """One block or message that needs an embedding."""
+    kind: str  # "block" | "message"
+    graph_id: str
+    item_id: str
+    text: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.item_id}"
+
+
+class EmbeddingBackfill:
+    """Embeds historical blocks/messages in batches, outside the request path."""
+
+    def __init__(self, llm_client: LLMClient, storage: StorageBackend,
+                 progress_path: Optional[str] = None,
+                 batch_size: Optional[int] = None,
+                 requests_per_minute: Optional[float] = None,
+                 reembed_untagged: bool = False,
+                 max_retries: int = 3):
+        """
+        Args:
+            llm_client: Client whose embedding model is the current one
+            storage: Storage backend holding the mindmap
+            progress_path: JSON progress file (None = do not persist progress)
+            batch_size: Texts per embedding request (uses config if None)
+            requests_per_minute: Maximum embedding requests per minute (uses config if None)
+            reembed_untagged: Also re-embed embeddings that carry no model name (older data)
+            max_retries: Attempts per batch before its texts are recorded as failed
+        """
+        self.llm = llm_client
+        self.storage = storage
+        self.progress_path = Path(progress_path) if progress_path else None
+        self.batch_size = batch_size or config.embeddings.backfill_batch_size
+        self.requests_per_minute = requests_per_minute or config.embeddings.backfill_requests_per_minute
+        self.reembed_untagged = reembed_untagged
+        self.max_retries = max_retries
+        self.progress = self._load_progress()
+
+    @property
+    def model(self) -> str:
+        return self.llm.embedding_model
+
+    def _needs_embedding(self, embedded: bool, model: str) -> bool:
+        if not embedded:
+            return True
+        if not model:
+            return self.reembed_untagged
+        return model != self.model
+
+    def pending(self, mindmap: Optional[Mindmap] = None) -> List[BackfillItem]:
+        """
+        Items that need (re-)embedding, skipping ones that already failed.
+
+        Args:
+            mindmap: Mindmap to scan (uses a storage snapshot if None)
+
+        Returns:
+            Blocks first (they drive routing), then user messages
+        """
+        mindmap = mindmap or self.storage.snapshot()
+        failed = self.progress.get("failed", {})
+        blocks, messages = [], []
+        for graph_id, graph in mindmap.graphs.items():
+            for block in graph.blocks.values():
+                if block.intent and self._needs_embedding(bool(block.embedding), block.embedding_model):
+                    blocks.append(BackfillItem("block", graph_id, block.block_id, block.intent))
+            for message_id in graph.messages:
+                # Raw data: avoids hydrating every message and loading its vector
+                data = graph.message_data(message_id, resolve_embedding=False)
+                if data.get("role") != "user" or not data.get("content"):
+                    continue
+                embedded = bool(data.get("embedding") or data.get("embedding_ref"))
+                if self._needs_embedding(embedded, data.get("embedding_model", "")):
+                    messages.append(BackfillItem("message", graph_id, message_id, data["content"]))
+        return [item for item in blocks + messages if item.key not in failed]
+
+    def run(self, stop: Optional[Event] = None, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Embed everything pending.
+
+        Args:
+            stop: Set to end the run after the current batch (e.g. on shutdown)
+            max_batches: Stop after this many batches (None = until done)
+
+        Returns:
+            Progress dict (also written to progress_path)
+        """
+        items = self.pending()
+        self.progress.update({"model": self.model, "remaining": len(items), "finished": not items})
+        self._save_progress()
+        if not items:
+            return self.progress
+        print(f"[BACKFILL] {len(items)} item(s) to embed with {self.model or type(self.llm).__name__}")
+
+        interval = 60.0 / self.requests_per_minute if self.requests_per_minute > 0 else 0.0
+        next_request = 0.0
+        for number, start in enumerate(range(0, len(items), self.batch_size)):
+            if (stop is not None and stop.is_set()) or (max_batches is not None and number >= max_batches):
+                break
+            batch = items[start:start + self.batch_size]
+            for attempt in range(self.max_retries):
+                wait = next_request - time.monotonic()
+                if wait > 0 and _sleep(wait, stop):
+                    return self.progress
+                next_request = time.monotonic() + interval
+                try:
+                    with call_priority("backfill"):
+                        vectors = embed_texts(self.llm, [item.text for item in batch])
+                    break
+                except Exception as e:
+                    print(f"[WARN] Backfill batch failed (attempt {attempt + 1}/{self.max_retries}): {e}")
+                    # Back off beyond the rate limit (provider quota errors are the usual cause)
+                    next_request += interval * 2 ** attempt
+            else:
+                failed = self.progress.setdefault("failed", {})
+                for item in batch:
+                    failed[item.key] = "embedding request failed"
+                self.progress["remaining"] -= len(batch)
+                self._save_progress()
+                continue
+
+            self._apply(batch, vectors)
+            self.progress["remaining"] -= len(batch)
+            self._save_progress()
+
+        self.progress["finished"] = self.progress["remaining"] <= 0
+        self._save_progress()
+        print(f"[BACKFILL] Done: {self.progress.get('embedded_blocks', 0)} block(s), "
+              f"{self.progress.get('embedded_messages', 0)} message(s) embedded in total")
+        return self.progress
+
+    def _apply(self, batch: List[BackfillItem], vectors: List[List[float]]) -> None:
+        """Write one batch of embeddings into the latest persisted mindmap."""
+        mindmap = self.storage.load()
+        blocks = messages = 0
+        for item, vector in zip(batch, vectors):
+            graph = mindmap.graphs.get(item.graph_id)
+            if graph is None or not vector:
+                continue
+            if item.kind == "block":
+                block = graph.blocks.get(item.item_id)
+                # Skip blocks deleted or re-intented since the scan
+                if block is not None and block.intent == item.text:
+                    graph.set_block_embedding(block.block_id, vector, self.model)
+                    blocks += 1
+            elif item.item_id in graph.messages:
+                message = graph.messages[item.item_id]
+                if message.content == item.text:
+                    graph.update_message(replace(message, embedding=vector, embedding_model=self.model))
+                    messages += 1
+        if blocks or messages:
+            self.storage.save(mindmap)
+        self.progress["embedded_blocks"] = self.progress.get("embedded_blocks", 0) + blocks
+        self.progress["embedded_messages"] = self.progress.get("embedded_messages", 0) + messages
+
+    def _load_progress(self) -> Dict[str, Any]:
+        if self.progress_path is None or not self.progress_path.exists():
+            return {}
+        try:
+            with open(self.progress_path, "r") as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Failures are only meaningful for the model they happened with
+        if progress.get("model") != self.model:
+            progress["failed"] = {}
+        return progress
+
+    def _save_progress(self) -> None:
+        self.progress["updated_at"] = time.time()
+        if self.progress_path is not None:
+            self.progress_path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self.progress_path, self.progress, indent=2)
+
+
+def _sleep(seconds: float, stop: Optional[Event]) -> bool:
+    """Sleep, waking early if stop is set. Returns True if stopped."""
+    if stop is None:
+        time.sleep(seconds)
+        return False
+    return stop.wait(seconds)
+
+
+def default_progress_path(storage_path: Optional[str] = None) -> str:
+    """Progress file next to the conversation data."""
+    return str(Path(storage_path or config.storage_path).parent / "embedding_backfill.json")
+
+
+def main(argv: List[str] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    from dotenv import load_dotenv
+    from llm.gemini import GeminiClient
+    from llm.local import with_configured_embeddings
+    from llm.scheduler import with_scheduler
+    from storage import create_storage
+    from config import validate_config
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Embed blocks and messages that are missing embeddings")
+    parser.add_argument("--batch-size", type=int, help="Texts per embedding request")
+    parser.add_argument("--rate", type=float, help="Maximum embedding requests per minute")
+    parser.add_argument("--reembed-untagged", action="store_true",
+                        help="Also re-embed embeddings stored without a model name")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what is pending")
+    args = parser.parse_args(argv)
+
+    if config.embeddings.provider == "remote":
+        try:
+            validate_config()
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return 1
+    storage = create_storage(config.storage_path)
+    backfill = EmbeddingBackfill(
+        with_configured_embeddings(with_scheduler(GeminiClient())),
+        storage,
+        progress_path=default_progress_path(),
+        batch_size=args.batch_size,
+        requests_per_minute=args.rate,
+        reembed_untagged=args.reembed_untagged,
+    )
+    if args.dry_run:
+        items = backfill.pending()
+        blocks = sum(1 for item in items if item.kind == "block")
+        print(f"{blocks} block(s) and {len(items) - blocks} message(s) need embeddings")
+        return 0
+    try:
+        backfill.run(max_batches=args.max_batches)
+    finally:
+        storage.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Benchmark module."""
+
+from .synthetic import make_mindmap, random_unit_vector
+
+__all__ = ["make_mindmap", "random_unit_vector"]
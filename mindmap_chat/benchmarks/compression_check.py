@@ -0,0 +1,171 @@
+"""
+Accuracy check for embedding compression.
+Replays the embedding-only routing decision (continue / deepen / tangent /
+ambiguous, see core.intent_detector.route_by_similarity) and the top-1
+cross-graph block match for a sample of (message, block) pairs, with full
+float32 vectors and with each compression setting, and reports every
+decision that changed.
+
+The sample is either a stored mindmap (user messages carry the embedding
+computed for their turn) or synthetic pairs whose similarities are spread
+across all thresholds, drawn from a low-rank space like real embeddings.
+
+Usage (from mindmap_chat/):
+    python -m benchmarks.compression_check
+    python -m benchmarks.compression_check --mindmap data/conversation.json --strict
+"""
+
+import argparse
+import sys
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from core.compression import EmbeddingCompressor
+from core.intent_detector import route_by_similarity
+from core.vector_index import BlockVectorIndex
+from models import Block
+from storage import create_storage
+
+SETTINGS = [
+    ("float16", "none"),
+    ("int8", "none"),
+    ("float32", "truncate"),
+    ("int8", "truncate"),
+    ("float32", "pca"),
+    ("int8", "pca"),
+]
+
+
+def synthetic_sample(blocks: int, messages: int, dim: int, rank: int, seed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Block vectors, message vectors and the block each message belongs to.
+    Message/block similarities are uniform in [0.3, 1.0].
+    """
+    rng = np.random.default_rng(seed)
+    basis = np.linalg.qr(rng.standard_normal((dim, rank)))[0].T  # (rank, dim) orthonormal
+    spectrum = 1.0 / np.sqrt(np.arange(1, rank + 1))  # Decaying variance, like real embeddings
+
+    def draw(count: int) -> np.ndarray:
+        vectors = (rng.standard_normal((count, rank)) * spectrum) @ basis
+        vectors += 0.005 * rng.standard_normal((count, dim))
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    block_vectors = draw(blocks)
+    owners = rng.integers(0, blocks, messages)
+    targets = rng.uniform(0.3, 1.0, messages)
+    noise = draw(messages)
+    # Remove the block component from the noise, then mix to the target similarity
+    anchors = block_vectors[owners]
+    noise -= np.sum(noise * anchors, axis=1, keepdims=True) * anchors
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    message_vectors = targets[:, None] * anchors + np.sqrt(1 - targets ** 2)[:, None] * noise
+    return block_vectors.astype(np.float32), message_vectors.astype(np.float32), owners
+
+
+def stored_sample(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Embedded blocks and embedded user messages (paired with their block) of a stored mindmap."""
+    mindmap = create_storage(path).load()
+    block_rows: Dict[str, int] = {}
+    block_vectors: List[List[float]] = []
+    for graph in mindmap.graphs.values():
+        for block in graph.blocks.values():
+            if block.embedding:
+                block_rows[block.block_id] = len(block_vectors)
+                block_vectors.append(block.embedding)
+    message_vectors, owners = [], []
+    for graph in mindmap.graphs.values():
+        for message_id in graph.messages:
+            message = graph.messages[message_id]
+            if message.role == "user" and message.embedding and message.block_id in block_rows:
+                message_vectors.append(message.embedding)
+                owners.append(block_rows[message.block_id])
+    if not message_vectors:
+        raise ValueError(f"No user messages with embeddings in {path} (they are stored from user-turn embeddings on)")
+    return np.asarray(block_vectors, dtype=np.float32), np.asarray(message_vectors, dtype=np.float32), np.asarray(owners)
+
+
+def _index(block_vectors: np.ndarray, compressor: EmbeddingCompressor) -> BlockVectorIndex:
+    index = BlockVectorIndex(compressor=compressor)
+    for i, vector in enumerate(block_vectors):
+        index.add("sample", Block(block_id=str(i), intent="sample", embedding=vector.tolist()))
+    return index
+
+
+def check(block_vectors: np.ndarray, message_vectors: np.ndarray, owners: np.ndarray,
+          precision: str, reduce: str, dim: int) -> Dict[str, Any]:
+    """Compare one compression setting against full float32."""
+    compressor = EmbeddingCompressor(precision, reduce, dim)
+    exact_index = _index(block_vectors, EmbeddingCompressor())
+    index = _index(block_vectors, compressor)
+
+    # The index fits the PCA basis on the block embeddings; reuse it for pairwise scores
+    index.search(message_vectors[0].tolist())
+    compressor = index.compressor
+    codes, scales = compressor.encode(block_vectors[owners])
+    compressed = np.sum(compressor.decode(codes, scales) * compressor.reduce(message_vectors), axis=1)
+    exact = np.sum(block_vectors[owners] * message_vectors, axis=1)
+    errors = np.abs(compressed - exact)
+
+    flips = []
+    for i, (before, after) in enumerate(zip(exact, compressed)):
+        if route_by_similarity(float(before)) != route_by_similarity(float(after)):
+            flips.append((float(before), float(after)))
+    matches = sum(
+        exact_index.search(vector.tolist())[0][1] == index.search(vector.tolist())[0][1]
+        for vector in message_vectors
+    )
+    return {
+        "bytes_per_vector": compressor.nbytes(block_vectors.shape[1]),
+        "max_error": float(errors.max()),
+        "mean_error": float(errors.mean()),
+        "routing_agreement": 1 - len(flips) / len(exact),
+        "routing_flips": flips,
+        "match_agreement": matches / len(message_vectors),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Check that embedding compression keeps routing decisions")
+    parser.add_argument("--mindmap", help="Stored mindmap to sample (default: synthetic pairs)")
+    parser.add_argument("--blocks", type=int, default=1000, help="Synthetic blocks (PCA needs at least 2 x --dim)")
+    parser.add_argument("--messages", type=int, default=1000, help="Synthetic messages")
+    parser.add_argument("--input-dim", type=int, default=3072, help="Synthetic embedding length")
+    parser.add_argument("--rank", type=int, default=128, help="Intrinsic dimension of the synthetic embeddings")
+    parser.add_argument("--dim", type=int, default=384, help="Target dimension for truncate/pca")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strict", action="store_true", help="Exit 1 if any routing decision changes")
+    args = parser.parse_args(argv)
+
+    if args.mindmap:
+        block_vectors, message_vectors, owners = stored_sample(args.mindmap)
+    else:
+        block_vectors, message_vectors, owners = synthetic_sample(
+            args.blocks, args.messages, args.input_dim, args.rank, args.seed
+        )
+    input_dim = block_vectors.shape[1]
+    print(f"Sample: {len(block_vectors)} blocks, {len(message_vectors)} messages, dim {input_dim}")
+    print(f"float32 baseline: {input_dim * 4} bytes/vector\n")
+
+    changed = False
+    for precision, reduce in SETTINGS:
+        result = check(block_vectors, message_vectors, owners, precision, reduce, args.dim)
+        label = precision if reduce == "none" else f"{precision}+{reduce}{args.dim}"
+        print(
+            f"{label:<20} {result['bytes_per_vector']:6d} B  "
+            f"sim error max {result['max_error']:.4f} mean {result['mean_error']:.4f}  "
+            f"routing {result['routing_agreement']:.2%}  top-1 match {result['match_agreement']:.2%}"
+        )
+        for before, after in result["routing_flips"][:5]:
+            print(f"    changed: {before:.4f} ({route_by_similarity(before)}) -> {after:.4f} ({route_by_similarity(after)})")
+        if len(result["routing_flips"]) > 5:
+            print(f"    ... {len(result['routing_flips']) - 5} more")
+        changed = changed or bool(result["routing_flips"])
+
+    if args.strict and changed:
+        print("\n[FAIL] Compression changed routing decisions")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
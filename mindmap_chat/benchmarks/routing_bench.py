@@ -0,0 +1,137 @@
+"""
+Routing benchmark: two-stage graph-centroid routing vs flat block scan.
+For a growing number of graphs (each a topic whose blocks are spread around
+it), reports per-query latency (median/p95) of the flat BlockVectorIndex and
+of GraphRoutedIndex, plus recall@k of the two-stage lookup against the flat
+scan, so the cost curve as history grows can be compared directly.
+
+Queries are noisy copies of indexed blocks, like a tangent that returns to
+an earlier topic.
+
+Usage (from mindmap_chat/):
+    python -m benchmarks.routing_bench
+    python -m benchmarks.routing_bench --graphs 10 100 1000 --blocks-per-graph 50 --top-graphs 2 4 8
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from core.vector_index import BlockVectorIndex, GraphRoutedIndex
+from models import Block
+from .search_bench import _latencies, _summary
+
+
+def make_graphs(graphs: int, per_graph: int, dim: int, spread: float, seed: int) -> List[Tuple[str, Block]]:
+    """
+    (graph_id, block) pairs: every graph has its own topic center and its
+    blocks are drawn around it (larger spread = graphs overlap more, the
+    harder case for centroid routing).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((graphs, dim)).astype(np.float32)
+    owners = np.repeat(np.arange(graphs), per_graph)
+    vectors = centers[owners] + spread * rng.standard_normal((len(owners), dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        (f"graph-{owner}", Block(block_id=f"block-{i}", intent="synthetic", embedding=vector.tolist()))
+        for i, (owner, vector) in enumerate(zip(owners, vectors))
+    ]
+
+
+def make_queries(blocks: List[Tuple[str, Block]], count: int, noise: float, seed: int) -> List[List[float]]:
+    """Perturbed copies of randomly chosen block embeddings."""
+    rng = np.random.default_rng(seed + 1)
+    dim = len(blocks[0][1].embedding)
+    return [
+        (np.asarray(blocks[i][1].embedding, dtype=np.float32) + noise * rng.standard_normal(dim) / np.sqrt(dim)).tolist()
+        for i in rng.integers(0, len(blocks), count)
+    ]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the benchmark and return a JSON-serializable report."""
+    report: Dict[str, Any] = {
+        "params": {
+            "blocks_per_graph": args.blocks_per_graph,
+            "embedding_dim": args.dim,
+            "spread": args.spread,
+            "queries": args.queries,
+            "k": args.k,
+        },
+        "runs": {},
+    }
+    for graphs in args.graphs:
+        blocks = make_graphs(graphs, args.blocks_per_graph, args.dim, args.spread, args.seed)
+        queries = make_queries(blocks, args.queries, args.noise, args.seed)
+
+        flat = BlockVectorIndex()
+        for graph_id, block in blocks:
+            flat.add(graph_id, block)
+        truth, samples = _latencies(flat, queries, args.k)
+        result: Dict[str, Any] = {"blocks": len(blocks), "flat": _summary(samples), "two_stage": {}}
+
+        for top_graphs in args.top_graphs:
+            routed = GraphRoutedIndex(top_graphs=top_graphs)
+            start = time.perf_counter()
+            for graph_id, block in blocks:
+                routed.add(graph_id, block)
+            build_s = time.perf_counter() - start
+            found, samples = _latencies(routed, queries, args.k)
+            recall = sum(len(f & t) for f, t in zip(found, truth)) / sum(len(t) for t in truth)
+            metrics = {"build_s": build_s, "recall": recall, **_summary(samples)}
+            metrics["speedup"] = result["flat"]["query_median_s"] / metrics["query_median_s"]
+            result["two_stage"][str(top_graphs)] = metrics
+        report["runs"][str(graphs)] = result
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the report as aligned text."""
+    params = report["params"]
+    print(
+        f"{params['blocks_per_graph']} blocks/graph, dim {params['embedding_dim']}, spread {params['spread']}, "
+        f"{params['queries']} queries, recall@{params['k']}"
+    )
+    for graphs, result in report["runs"].items():
+        flat = result["flat"]
+        print(
+            f"\n{graphs} graphs ({result['blocks']} blocks)\n"
+            f"  flat              median {flat['query_median_s'] * 1000:7.3f} ms  p95 {flat['query_p95_s'] * 1000:7.3f} ms"
+        )
+        for top_graphs, metrics in result["two_stage"].items():
+            print(
+                f"  top_graphs={top_graphs:<5} median {metrics['query_median_s'] * 1000:7.3f} ms  "
+                f"p95 {metrics['query_p95_s'] * 1000:7.3f} ms  recall {metrics['recall']:.3f}  "
+                f"speedup {metrics['speedup']:.1f}x"
+            )
+
+
+def main(argv: List[str] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Benchmark two-stage graph routing vs a flat block scan")
+    parser.add_argument("--graphs", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--blocks-per-graph", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--spread", type=float, default=1.0, help="Spread of blocks around their graph's topic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="Query distance from its source block")
+    parser.add_argument("--k", type=int, default=1, help="Neighbours per query (tangent matching uses 1)")
+    parser.add_argument("--top-graphs", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[SAVED] {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
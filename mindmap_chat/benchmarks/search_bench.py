@@ -0,0 +1,157 @@
+"""
+Block search benchmark: approximate (IVF) vs exact index.
+Indexes a synthetic set of clustered block embeddings, then reports build
+and training time, per-query latency (median/p95) and recall@k of the
+IVFBlockIndex against the exact BlockVectorIndex for each nprobe.
+
+Queries are noisy copies of indexed blocks, which is what tangent
+redirection looks for: a message close to an existing topic.
+
+Usage (from mindmap_chat/):
+    python -m benchmarks.search_bench --blocks 100000 --dim 768
+    python -m benchmarks.search_bench --blocks 20000 --nprobe 4 8 16 32 --output search.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from core.vector_index import BlockVectorIndex, IVFBlockIndex
+from models import Block
+
+
+def make_blocks(count: int, dim: int, clusters: int, spread: float, seed: int) -> List[Tuple[str, Block]]:
+    """
+    (graph_id, block) pairs whose embeddings are drawn around random topic
+    centers, so they cluster like real embeddings do (spread 0 = identical
+    vectors per topic; large spread = no structure, the worst case for IVF).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + spread * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        (f"graph-{i % 100}", Block(block_id=f"block-{i}", intent="synthetic", embedding=vector.tolist()))
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def make_queries(blocks: List[Tuple[str, Block]], count: int, noise: float, seed: int) -> List[List[float]]:
+    """Perturbed copies of randomly chosen block embeddings."""
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.integers(0, len(blocks), count)
+    dim = len(blocks[0][1].embedding)
+    return [
+        (np.asarray(blocks[i][1].embedding, dtype=np.float32) + noise * rng.standard_normal(dim) / np.sqrt(dim)).tolist()
+        for i in picks
+    ]
+
+
+def _latencies(index: BlockVectorIndex, queries: List[List[float]], k: int) -> Tuple[List[set], List[float]]:
+    results, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k)
+        samples.append(time.perf_counter() - start)
+        results.append({block_id for _, block_id, _ in hits})
+    return results, samples
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "query_median_s": statistics.median(ordered),
+        "query_p95_s": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the benchmark and return a JSON-serializable report."""
+    blocks = make_blocks(args.blocks, args.dim, args.clusters, args.spread, args.seed)
+    queries = make_queries(blocks, args.queries, args.noise, args.seed)
+
+    start = time.perf_counter()
+    exact = BlockVectorIndex()
+    for graph_id, block in blocks:
+        exact.add(graph_id, block)
+    report: Dict[str, Any] = {
+        "params": {
+            "blocks": args.blocks,
+            "embedding_dim": args.dim,
+            "clusters": args.clusters,
+            "spread": args.spread,
+            "queries": args.queries,
+            "k": args.k,
+        },
+        "exact": {"build_s": time.perf_counter() - start},
+        "ivf": {},
+    }
+    truth, samples = _latencies(exact, queries, args.k)
+    report["exact"].update(_summary(samples))
+
+    approx = IVFBlockIndex(min_train_size=0, seed=args.seed)
+    for graph_id, block in blocks:
+        approx.add(graph_id, block)
+    start = time.perf_counter()
+    approx.train()
+    train_s = time.perf_counter() - start
+
+    for nprobe in args.nprobe:
+        approx.nprobe = nprobe
+        found, samples = _latencies(approx, queries, args.k)
+        recall = sum(len(f & t) for f, t in zip(found, truth)) / sum(len(t) for t in truth)
+        metrics = {"train_s": train_s, "recall": recall, **_summary(samples)}
+        metrics["speedup"] = report["exact"]["query_median_s"] / metrics["query_median_s"]
+        report["ivf"][str(nprobe)] = metrics
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the report as aligned text."""
+    params = report["params"]
+    print(
+        f"Index: {params['blocks']} blocks, dim {params['embedding_dim']}, "
+        f"{params['clusters']} topic clusters (spread {params['spread']}), {params['queries']} queries, recall@{params['k']}"
+    )
+    exact = report["exact"]
+    print(
+        f"\nexact  build {exact['build_s'] * 1000:9.1f} ms  "
+        f"median {exact['query_median_s'] * 1000:7.3f} ms  p95 {exact['query_p95_s'] * 1000:7.3f} ms"
+    )
+    for nprobe, metrics in report["ivf"].items():
+        print(
+            f"ivf nprobe={nprobe:<4} train {metrics['train_s'] * 1000:7.1f} ms  "
+            f"median {metrics['query_median_s'] * 1000:7.3f} ms  p95 {metrics['query_p95_s'] * 1000:7.3f} ms  "
+            f"recall {metrics['recall']:.3f}  speedup {metrics['speedup']:.1f}x"
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Benchmark approximate vs exact block search")
+    parser.add_argument("--blocks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--clusters", type=int, default=500, help="Topic clusters in the synthetic data")
+    parser.add_argument("--spread", type=float, default=1.0, help="Spread of blocks around their topic center")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="Query distance from its source block")
+    parser.add_argument("--k", type=int, default=1, help="Neighbours per query (tangent matching uses 1)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[SAVED] {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
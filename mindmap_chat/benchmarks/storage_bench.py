@@ -0,0 +1,263 @@
+"""
+Storage scalability benchmark.
+Generates a synthetic mindmap and reports model-level timings (to_dict,
+from_dict, rebuild_children, to_d3_graph, message hydration) plus, per
+storage backend, save/load latency, on-disk size and peak load memory.
+
+Results can be written to JSON and compared against an earlier run; the
+comparison exits non-zero when a metric regresses past the tolerance.
+
+Usage (from mindmap_chat/):
+    python -m benchmarks.storage_bench --graphs 5 --blocks 50 --messages 10 --dim 768
+    python -m benchmarks.storage_bench --output baseline.json
+    python -m benchmarks.storage_bench --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from models import ConversationMessage, Mindmap
+from storage import JSONStorage, SQLiteStorage, ShardedStorage, StorageBackend
+from .synthetic import make_mindmap
+
+BACKENDS = ("json", "json-journal", "sqlite", "sharded")
+
+# Timings below this many seconds are never reported as regressions (noise)
+MIN_REGRESSION_SECONDS = 0.002
+
+
+def _quiet():
+    """Silence the backends' [SAVED]/[CLEARED] logging while timing."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _median_seconds(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _peak_mb(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file() and not p.name.endswith(".lock"))
+
+
+def make_storage(backend: str, root: Path, codec: str, sidecar: bool) -> StorageBackend:
+    """Fresh backend instance (empty in-memory caches) rooted at root."""
+    if backend == "json":
+        return JSONStorage(str(root / "conversation.json"), embedding_sidecar=sidecar, codec=codec)
+    if backend == "json-journal":
+        return JSONStorage(str(root / "conversation.json"), journal=True, embedding_sidecar=sidecar, codec=codec)
+    if backend == "sqlite":
+        return SQLiteStorage(str(root / "conversation.db"))
+    if backend == "sharded":
+        return ShardedStorage(str(root / "conversation"), embedding_sidecar=sidecar, codec=codec)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def bench_models(mindmap: Mindmap, repeat: int) -> Dict[str, float]:
+    """Timings of the in-memory model operations."""
+    data = mindmap.to_dict()
+    results = {
+        "to_dict_s": _median_seconds(mindmap.to_dict, repeat),
+        "from_dict_s": _median_seconds(lambda: Mindmap.from_dict(data), repeat),
+    }
+    loaded = Mindmap.from_dict(data)
+    results["rebuild_children_s"] = _median_seconds(
+        lambda: [graph.rebuild_children() for graph in loaded.graphs.values()], repeat
+    )
+    results["to_d3_graph_s"] = _median_seconds(
+        lambda: [graph.to_d3_graph() for graph in loaded.graphs.values()], repeat
+    )
+
+    def hydrate():
+        fresh = Mindmap.from_dict(data)
+        for graph in fresh.graphs.values():
+            for block_id in graph.blocks:
+                graph.get_block_messages(block_id)
+
+    results["hydrate_messages_s"] = _median_seconds(hydrate, repeat)
+    results["from_dict_peak_mb"] = _peak_mb(lambda: Mindmap.from_dict(data))
+    return results
+
+
+def bench_backend(backend: str, mindmap: Mindmap, repeat: int, codec: str, sidecar: bool) -> Dict[str, float]:
+    """Save/load latency, file size and peak load memory of one backend."""
+    root = Path(tempfile.mkdtemp(prefix=f"bench_{backend}_"))
+    try:
+        results: Dict[str, float] = {}
+        with _quiet():
+            full_saves = []
+            for i in range(repeat):
+                target = root / f"run{i}"
+                target.mkdir()
+                storage = make_storage(backend, target, codec, sidecar)
+                copy = mindmap.copy()
+                start = time.perf_counter()
+                storage.save(copy)
+                storage.flush()
+                full_saves.append(time.perf_counter() - start)
+            results["save_full_s"] = statistics.median(full_saves)
+            target = root / "run0"
+            results["size_bytes"] = float(_dir_size(target))
+
+            results["load_cold_s"] = _median_seconds(
+                lambda: make_storage(backend, target, codec, sidecar).load(), repeat
+            )
+            results["load_peak_mb"] = _peak_mb(lambda: make_storage(backend, target, codec, sidecar).load())
+
+            storage = make_storage(backend, target, codec, sidecar)
+            loaded = storage.load()
+            graph = loaded.get_current_graph()
+
+            def save_one_turn():
+                block_id = graph.current_block_id
+                for role in ("user", "assistant"):
+                    message = ConversationMessage(block_id=block_id, role=role, content="benchmark turn")
+                    graph.add_message(message)
+                    graph.blocks[block_id].add_message_ref(message.message_id)
+                storage.save(loaded)
+                storage.flush()
+
+            results["save_turn_s"] = _median_seconds(save_one_turn, repeat)
+            results["load_warm_s"] = _median_seconds(storage.load, repeat)
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected benchmarks and return a JSON-serializable report."""
+    mindmap = make_mindmap(args.graphs, args.blocks, args.messages, args.dim, seed=args.seed)
+    report: Dict[str, Any] = {
+        "params": {
+            "graphs": args.graphs,
+            "blocks_per_graph": args.blocks,
+            "messages_per_block": args.messages,
+            "embedding_dim": args.dim,
+            "codec": args.codec,
+            "sidecar": args.sidecar,
+        },
+        "models": bench_models(mindmap, args.repeat),
+        "backends": {},
+    }
+    for backend in args.backends:
+        report["backends"][backend] = bench_backend(backend, mindmap, args.repeat, args.codec, args.sidecar)
+    return report
+
+
+def _flatten(report: Dict[str, Any]) -> Dict[str, float]:
+    flat = {f"models.{k}": v for k, v in report.get("models", {}).items()}
+    for backend, metrics in report.get("backends", {}).items():
+        flat.update({f"{backend}.{k}": v for k, v in metrics.items()})
+    return flat
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Metrics that got worse than baseline by more than tolerance (fraction).
+
+    Returns:
+        One human-readable line per regression
+    """
+    if report.get("params") != baseline.get("params"):
+        print("[WARN] Baseline was recorded with different parameters; comparison may be meaningless")
+    current, previous = _flatten(report), _flatten(baseline)
+    regressions = []
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None or old <= 0:
+            continue
+        if name.endswith("_s") and new - old < MIN_REGRESSION_SECONDS:
+            continue
+        if new > old * (1 + tolerance):
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the report as aligned text."""
+    params = report["params"]
+    print(
+        f"Mindmap: {params['graphs']} graphs x {params['blocks_per_graph']} blocks x "
+        f"{params['messages_per_block']} messages, dim {params['embedding_dim']}, "
+        f"codec {params['codec']}, sidecar {'on' if params['sidecar'] else 'off'}"
+    )
+    print("\nModels")
+    for name, value in report["models"].items():
+        print(f"  {name:<22} {_format(name, value)}")
+    for backend, metrics in report["backends"].items():
+        print(f"\n{backend}")
+        for name, value in metrics.items():
+            print(f"  {name:<22} {_format(name, value)}")
+
+
+def _format(name: str, value: float) -> str:
+    if name.endswith("_s"):
+        return f"{value * 1000:10.2f} ms"
+    if name.endswith("_mb"):
+        return f"{value:10.2f} MB"
+    return f"{value / 1024:10.1f} KB"
+
+
+def main(argv: List[str] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Benchmark mindmap storage and model operations")
+    parser.add_argument("--graphs", type=int, default=5)
+    parser.add_argument("--blocks", type=int, default=50, help="Blocks per graph")
+    parser.add_argument("--messages", type=int, default=10, help="Messages per block")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (0 = none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timing (median is reported)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--codec", default="auto", help="Codec for the JSON-based backends")
+    parser.add_argument("--no-sidecar", dest="sidecar", action="store_false", help="Keep embeddings inline")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a report written with --output")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown/growth (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[SAVED] {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[REGRESSION] {len(regressions)} metric(s) worse than {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n[OK] No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
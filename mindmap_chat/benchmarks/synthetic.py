@@ -0,0 +1,79 @@
+"""
+Synthetic mindmaps for benchmarks.
+Deterministic for a given seed, so runs are comparable across commits.
+"""
+
+import math
+import random
+from typing import List
+from models import Block, ConversationGraph, ConversationMessage, Mindmap
+
+
+def random_unit_vector(rng: random.Random, dim: int) -> List[float]:
+    """Random L2-normalized vector (embeddings in the app are normalized too)."""
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def make_mindmap(graphs: int = 5, blocks_per_graph: int = 50, messages_per_block: int = 10,
+                 embedding_dim: int = 768, seed: int = 0, message_chars: int = 400) -> Mindmap:
+    """
+    Build a mindmap shaped like real usage: random trees of blocks, each with
+    alternating user/assistant messages. Blocks and user messages get embeddings.
+
+    Args:
+        graphs: Number of graphs (top-level conversations)
+        blocks_per_graph: Blocks per graph, including the root
+        messages_per_block: Messages per block
+        embedding_dim: Embedding length (0 for no embeddings)
+        seed: RNG seed
+        message_chars: Approximate length of each message
+
+    Returns:
+        Populated Mindmap
+    """
+    rng = random.Random(seed)
+    words = ["graph", "vector", "storage", "latency", "topic", "python", "cache", "index", "model", "query"]
+    mindmap = Mindmap()
+    timestamp = 1_700_000_000.0
+
+    def text(length: int) -> str:
+        out = []
+        while sum(len(w) + 1 for w in out) < length:
+            out.append(rng.choice(words))
+        return " ".join(out)
+
+    for g in range(graphs):
+        graph = ConversationGraph()
+        block_ids: List[str] = []
+        for b in range(blocks_per_graph):
+            parent_id = rng.choice(block_ids) if block_ids else None
+            block = Block(
+                parent_block_id=parent_id,
+                title=f"Topic {g}.{b}",
+                intent=text(60),
+                summary=text(200),
+                key_points=[text(40) for _ in range(3)],
+                open_questions=[text(40)],
+                created_at=timestamp,
+                embedding=random_unit_vector(rng, embedding_dim) if embedding_dim else [],
+            )
+            graph.add_block(block)
+            block_ids.append(block.block_id)
+            for i in range(messages_per_block):
+                timestamp += 1.0
+                role = "user" if i % 2 == 0 else "assistant"
+                message = ConversationMessage(
+                    block_id=block.block_id,
+                    role=role,
+                    content=text(message_chars),
+                    timestamp=timestamp,
+                    embedding=random_unit_vector(rng, embedding_dim) if embedding_dim and role == "user" else [],
+                )
+                graph.add_message(message)
+                block.add_message_ref(message.message_id)
+        graph.rebuild_children()
+        graph.current_block_id = block_ids[-1] if block_ids else ""
+        mindmap.add_graph(graph)
+    return mindmap
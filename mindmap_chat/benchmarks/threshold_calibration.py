@@ -0,0 +1,188 @@
+"""
+Routing threshold calibration per embedding provider.
+Embeds a fixed sample of conversations (a block intent plus follow-up
+messages labeled continue / deepen / tangent), then grid-searches the
+continue/deepen/tangent thresholds of core.intent_detector.route_by_similarity
+for the fewest wrong embedding-only decisions, then the fewest "ambiguous"
+ones (those cost an LLM classification call). The other thresholds are
+mapped from the remote defaults relative to these three.
+
+The values printed for a provider belong in config.PROVIDER_THRESHOLDS.
+
+Usage (from mindmap_chat/):
+    python -m benchmarks.threshold_calibration
+    python -m benchmarks.threshold_calibration --provider remote   # needs GEMINI_API_KEY
+"""
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, replace
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from config import DetectionThresholds
+from core.embeddings import compute_similarity
+from llm.base import LLMClient
+
+# (block title, block intent, [(expected route, follow-up message), ...])
+SAMPLE_CONVERSATIONS: List[Tuple[str, str, List[Tuple[str, str]]]] = [
+    ("Setting up a Python virtual environment",
+     "Learn how to create and activate a Python virtual environment for a project", [
+         ("continue", "How do I activate the virtual environment on Windows?"),
+         ("continue", "Should the virtual environment folder be committed to the project?"),
+         ("deepen", "What is the difference between venv and virtualenv for a Python project environment?"),
+         ("deepen", "How do I pin package versions inside the virtual environment with a requirements file?"),
+         ("tangent", "What's a good recipe for banana bread?"),
+         ("tangent", "Who won the football world cup in 2014?"),
+     ]),
+    ("Training for a first marathon",
+     "Build a training plan to run a first marathon in four months", [
+         ("continue", "How many days a week should I run when training for the marathon?"),
+         ("continue", "Is four months enough training for a first marathon?"),
+         ("deepen", "How long should the weekly long run be in the marathon training plan?"),
+         ("deepen", "What should I eat before a long training run for the marathon?"),
+         ("tangent", "How do I fix a merge conflict in git?"),
+         ("tangent", "Which houseplants survive in low light?"),
+     ]),
+    ("Planning a trip to Japan",
+     "Plan a two week trip to Japan in spring, covering cities and transport", [
+         ("continue", "Which cities should I visit on a two week trip to Japan?"),
+         ("continue", "Is spring a good time for a trip to Japan?"),
+         ("deepen", "Is the Japan Rail Pass worth it for transport between cities?"),
+         ("deepen", "How many days should I spend in Kyoto on the Japan trip?"),
+         ("tangent", "How do I compute the derivative of x squared?"),
+         ("tangent", "What is the best way to store fresh basil?"),
+     ]),
+    ("Database indexing in PostgreSQL",
+     "Understand how indexes speed up PostgreSQL queries and when to add them", [
+         ("continue", "When should I add an index to a PostgreSQL table?"),
+         ("continue", "Why do indexes speed up queries in PostgreSQL?"),
+         ("deepen", "How does a B-tree index in PostgreSQL handle range queries?"),
+         ("deepen", "Should I use a partial index or a composite index for this PostgreSQL query?"),
+         ("tangent", "What are the rules of chess castling?"),
+         ("tangent", "Can you recommend a science fiction novel?"),
+     ]),
+    ("Learning to bake sourdough bread",
+     "Learn to bake sourdough bread at home, starting with a starter", [
+         ("continue", "How do I keep a sourdough starter alive?"),
+         ("continue", "How long does it take to bake sourdough bread at home?"),
+         ("deepen", "Why is my sourdough bread dense and how do I get a more open crumb?"),
+         ("deepen", "What hydration should the sourdough dough have for a beginner?"),
+         ("tangent", "How do I configure nginx as a reverse proxy?"),
+         ("tangent", "What's the capital of Australia?"),
+     ]),
+]
+
+# Cost of an embedding-only decision: wrong routes are worse than asking the LLM
+WRONG_COST = 3
+AMBIGUOUS_COST = 1
+
+
+def similarities(client: LLMClient) -> List[Tuple[str, float]]:
+    """(expected route, message/intent similarity) for every sample message."""
+    intents = [intent for _, intent, _ in SAMPLE_CONVERSATIONS]
+    messages = [message for _, _, pairs in SAMPLE_CONVERSATIONS for _, message in pairs]
+    vectors = client.embed_many(intents + messages)
+    intent_vectors, message_vectors = vectors[:len(intents)], iter(vectors[len(intents):])
+    return [
+        (label, compute_similarity(next(message_vectors), intent_vector))
+        for intent_vector, (_, _, pairs) in zip(intent_vectors, SAMPLE_CONVERSATIONS)
+        for label, _ in pairs
+    ]
+
+
+def route(similarity: float, continue_at: float, deepen_at: float, tangent_below: float) -> str:
+    """route_by_similarity() with explicit thresholds."""
+    if similarity >= continue_at:
+        return "continue"
+    if similarity >= deepen_at:
+        return "deepen"
+    if similarity < tangent_below:
+        return "tangent"
+    return "ambiguous"
+
+
+def calibrate(samples: List[Tuple[str, float]], step: float = 0.01) -> Dict[str, Any]:
+    """Thresholds with the lowest decision cost on samples, and their outcome counts."""
+    grid = np.round(np.arange(0.0, 1.0 + step, step), 4)
+    best: Tuple[Tuple[int, float], Tuple[float, float, float]] = ((sys.maxsize, 0.0), (1.0, 1.0, 0.0))
+    for continue_at in grid:
+        for deepen_at in grid[grid <= continue_at]:
+            for tangent_below in grid[grid <= deepen_at]:
+                cost = 0
+                for label, similarity in samples:
+                    decision = route(similarity, continue_at, deepen_at, tangent_below)
+                    cost += 0 if decision == label else AMBIGUOUS_COST if decision == "ambiguous" else WRONG_COST
+                # Ties: prefer the widest margins around each threshold
+                key = (cost, -_margin(samples, (continue_at, deepen_at, tangent_below)))
+                if key < best[0]:
+                    best = (key, (float(continue_at), float(deepen_at), float(tangent_below)))
+    continue_at, deepen_at, tangent_below = best[1]
+    outcomes: Dict[str, int] = {}
+    for label, similarity in samples:
+        decision = route(similarity, continue_at, deepen_at, tangent_below)
+        outcome = "correct" if decision == label else "ambiguous" if decision == "ambiguous" else "wrong"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {"thresholds": asdict(scaled_thresholds(continue_at, deepen_at, tangent_below)), "outcomes": outcomes}
+
+
+def _margin(samples: List[Tuple[str, float]], thresholds: Tuple[float, ...]) -> float:
+    """Smallest distance between any sample similarity and any threshold."""
+    return min(abs(similarity - threshold) for _, similarity in samples for threshold in thresholds)
+
+
+def scaled_thresholds(continue_at: float, deepen_at: float, tangent_below: float) -> DetectionThresholds:
+    """
+    Full threshold set: the three calibrated values, and the others mapped
+    piecewise-linearly from where the remote defaults sit between them.
+    """
+    remote = DetectionThresholds()
+    anchors = [0.0, remote.tangent_threshold, remote.deepen_threshold, remote.continue_threshold, 1.0]
+    targets = [0.0, tangent_below, deepen_at, continue_at, 1.0]
+    return replace(
+        remote,
+        continue_threshold=round(continue_at, 2),
+        deepen_threshold=round(deepen_at, 2),
+        tangent_threshold=round(tangent_below, 2),
+        sibling_threshold=round(float(np.interp(remote.sibling_threshold, anchors, targets)), 2),
+        related_match_threshold=round(float(np.interp(remote.related_match_threshold, anchors, targets)), 2),
+    )
+
+
+def make_client(provider: str) -> LLMClient:
+    """Embedding client of a provider ("local" or "remote")."""
+    if provider == "local":
+        from llm.local import LocalEmbeddingClient
+        return LocalEmbeddingClient()
+    from config import validate_config
+    from llm.gemini import GeminiClient
+    validate_config()
+    return GeminiClient()
+
+
+def main(argv: List[str] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Calibrate routing thresholds for an embedding provider")
+    parser.add_argument("--provider", choices=["local", "remote"], default="local")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    samples = similarities(make_client(args.provider))
+    report = {"provider": args.provider, **calibrate(samples)}
+    for label in ("continue", "deepen", "tangent"):
+        values = sorted(similarity for l, similarity in samples if l == label)
+        print(f"{label:<9} similarities {values[0]:.2f} .. {values[-1]:.2f} (median {np.median(values):.2f})")
+    print(f"\nOutcomes on {len(samples)} messages: {report['outcomes']}")
+    print(f'PROVIDER_THRESHOLDS["{args.provider}"] = DetectionThresholds(')
+    for name, value in report["thresholds"].items():
+        print(f"    {name}={value},")
+    print(")")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[SAVED] {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,9 @@ Centralized place for API keys, model names, thresholds.
 """
 
 import os
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import Dict
 
 from dotenv import load_dotenv
 
@@ -23,11 +24,56 @@ class GeminiConfig:
     max_output_tokens: int = 1024
 
 
+@dataclass
+class DeepSeekConfig:
+    """DeepSeek API configuration (llm/deepseek.py)."""
+    api_key: str = os.getenv("DEEPSEEK_API_KEY", "")
+    model_name: str = "deepseek-chat"
+    base_url: str = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/chat/completions")
+    temperature: float = 0.7
+    max_output_tokens: int = 1024
+    connect_timeout: float = 5.0  # Seconds to establish a connection
+    read_timeout: float = 60.0  # Seconds to wait for (the next chunk of) a response
+    pool_size: int = 10  # Kept-alive connections shared by all DeepSeek clients
+    max_retries: int = 3  # Retries on 429/5xx, connection errors and timeouts
+    backoff_base: float = 0.5  # Seconds; retry n waits up to backoff_base * 2**n (full jitter)
+    backoff_max: float = 30.0  # Longest wait; a longer Retry-After fails the call instead
+
+
 @dataclass
 class EmbeddingConfig:
     """Embedding model configuration."""
     model: str = "gemini-embedding-001"  # Free, local, lightweight
-    embedding_dim: int = 384
+    embedding_dim: int = 384  # Vector length of the local provider, and target of compression_reduce
+    provider: str = os.getenv("MINDMAP_EMBEDDING_PROVIDER", "remote")  # "remote" (LLM client) | "local" (offline)
+    compression_precision: str = os.getenv("MINDMAP_EMBEDDING_PRECISION", "float32")  # "float32" | "float16" | "int8"
+    compression_reduce: str = os.getenv("MINDMAP_EMBEDDING_REDUCE", "none")  # "none" | "truncate" | "pca"
+    cache_enabled: bool = os.getenv("MINDMAP_EMBEDDING_CACHE", "1") == "1"  # Reuse embeddings of identical texts
+    cache_path: str = os.getenv("MINDMAP_EMBEDDING_CACHE_PATH", "./data/embedding_cache.db")  # "" = memory only
+    cache_memory_entries: int = 4096  # In-process LRU size
+    cache_disk_entries: int = 200_000  # SQLite rows before LRU eviction
+    backfill_batch_size: int = 32  # Texts per embedding request in the background backfill
+    backfill_requests_per_minute: float = float(os.getenv("MINDMAP_EMBEDDING_BACKFILL_RPM", "60"))  # Backfill rate limit
+    backfill_on_startup: bool = os.getenv("MINDMAP_EMBEDDING_BACKFILL_ON_STARTUP", "") == "1"  # Run backfill in the API server
+
+
+@dataclass
+class ResponseCacheConfig:
+    """Cache of structured (call_json) LLM responses."""
+    enabled: bool = os.getenv("MINDMAP_RESPONSE_CACHE", "1") == "1"
+    ttl_seconds: float = float(os.getenv("MINDMAP_RESPONSE_CACHE_TTL", "3600"))  # 0 = entries never expire
+    max_entries: int = 1024  # LRU size
+    families: str = os.getenv("MINDMAP_RESPONSE_CACHE_FAMILIES", "intent,classify,summary")  # Cached prompt families
+
+
+@dataclass
+class SchedulerConfig:
+    """Rate and concurrency limits of LLM provider requests (llm/scheduler.py)."""
+    enabled: bool = os.getenv("MINDMAP_LLM_SCHEDULER", "1") == "1"
+    requests_per_minute: float = float(os.getenv("MINDMAP_LLM_RPM", "60"))  # Per provider; 0 = unlimited
+    burst: int = 10  # Requests allowed at once after an idle period
+    max_in_flight: int = int(os.getenv("MINDMAP_LLM_MAX_IN_FLIGHT", "4"))  # Concurrent requests per provider
+    background_in_flight: int = 2  # Of those, most held by summaries/backfill (the rest stay free for answers)
 
 
 @dataclass
@@ -40,12 +86,58 @@ class DetectionThresholds:
     tangent_threshold: float = 0.65  # Unrelated
 
 
+# Similarity scales differ per embedding provider; values from
+# `python -m benchmarks.threshold_calibration --provider <name>`
+PROVIDER_THRESHOLDS: Dict[str, DetectionThresholds] = {
+    "remote": DetectionThresholds(),  # Tuned for gemini-embedding-001
+    "local": DetectionThresholds(  # LocalEmbeddingClient: on-topic text scores ~0.35-0.6
+        continue_threshold=0.44,
+        deepen_threshold=0.18,
+        sibling_threshold=0.25,
+        related_match_threshold=0.15,
+        tangent_threshold=0.16,
+    ),
+}
+
+
+def thresholds_for(provider: str) -> DetectionThresholds:
+    """Detection thresholds calibrated for an embedding provider (remote ones if unknown)."""
+    return replace(PROVIDER_THRESHOLDS.get(provider, PROVIDER_THRESHOLDS["remote"]))
+
+
+@dataclass
+class StorageConfig:
+    """Persistence backend configuration."""
+    backend: str = os.getenv("MINDMAP_STORAGE_BACKEND", "json")  # "json" | "sqlite" | "sharded"
+    journal: bool = os.getenv("MINDMAP_STORAGE_JOURNAL", "") == "1"  # Append deltas instead of rewriting JSON
+    journal_compact_bytes: int = 4 * 1024 * 1024  # Fold journal into snapshot past this size
+    embedding_sidecar: bool = os.getenv("MINDMAP_STORAGE_EMBEDDING_SIDECAR", "") == "1"  # float32 vectors file
+    codec: str = os.getenv("MINDMAP_STORAGE_CODEC", "auto")  # "auto" | "json" | "json-pretty" | "orjson" | "msgpack"
+    write_behind_interval: float = float(os.getenv("MINDMAP_STORAGE_WRITE_BEHIND", "0"))  # Seconds; 0 = write on save
+
+
+@dataclass
+class SearchConfig:
+    """Block similarity search configuration."""
+    index: str = os.getenv("MINDMAP_SEARCH_INDEX", "exact")  # "exact" | "ivf" | "graph" (approximate)
+    ivf_nprobe: int = int(os.getenv("MINDMAP_SEARCH_IVF_NPROBE", "8"))  # Clusters scanned per query
+    ivf_min_train_size: int = 2048  # Below this many blocks the IVF index scans exactly
+    graph_top_k: int = int(os.getenv("MINDMAP_SEARCH_GRAPH_TOP_K", "4"))  # Graphs whose blocks are scored ("graph" index)
+
+
 @dataclass
 class AppConfig:
     """Application-wide configuration."""
     gemini: GeminiConfig = field(default_factory=GeminiConfig)
+    deepseek: DeepSeekConfig = field(default_factory=DeepSeekConfig)
     embeddings: EmbeddingConfig = field(default_factory=EmbeddingConfig)
-    thresholds: DetectionThresholds = field(default_factory=DetectionThresholds)
+    response_cache: ResponseCacheConfig = field(default_factory=ResponseCacheConfig)
+    thresholds: DetectionThresholds = field(
+        default_factory=lambda: thresholds_for(os.getenv("MINDMAP_EMBEDDING_PROVIDER", "remote"))
+    )
+    storage: StorageConfig = field(default_factory=StorageConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    search: SearchConfig = field(default_factory=SearchConfig)
     auto_summarize_after_n_messages: int = 6
     storage_path: str = "./data/conversation.json"
     context_window_size: int = 3  # Last N messages to include in context
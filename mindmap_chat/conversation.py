@@ -3,41 +3,70 @@ Main conversation loop and orchestration.
 Ties together all modules for the core functionality.
 """
 
-from typing import Optional
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Optional
 import re
 from llm.base import LLMClient
 from llm import prompts
 from models import ConversationGraph, ConversationMessage, Block, Mindmap, BlockClassification
 from core import (
     detect_intent_shift,
+    adetect_intent_shift,
+    classification_prompt,
     create_root_block,
+    acreate_root_block,
     create_child_block,
     maybe_auto_summarize,
+    amaybe_auto_summarize,
     construct_block_context,
-    compute_similarity,
     embed_text,
+    embed_texts,
+    BlockVectorIndex,
+    SearchResult,
+    TurnContext,
+    shared_block_index,
+    shared_search_index,
 )
 from config import config
-from storage import JSONStorage
+from storage import StorageBackend
 from utils import print_block_tree
 
+# Best index hits checked when looking for a matching block in other graphs
+_MATCH_CANDIDATES = 4
+
 
 class ConversationManager:
     """Manages a multi-block conversation."""
 
-    def __init__(self, llm_client: LLMClient, storage: JSONStorage):
+    def __init__(self, llm_client: LLMClient, storage: StorageBackend, mindmap: Optional[Mindmap] = None):
         """
         Initialize conversation manager.
         
         Args:
             llm_client: LLM client instance
             storage: Storage backend
+            mindmap: Already loaded mindmap (loads it from storage if None)
         """
         self.llm = llm_client
         self.storage = storage
-        self.mindmap = storage.load()
+        self.mindmap = mindmap if mindmap is not None else storage.load()
         self.graph = self.mindmap.get_current_graph()
 
+    @classmethod
+    async def acreate(cls, llm_client: LLMClient, storage: StorageBackend) -> "ConversationManager":
+        """Async constructor: the storage load runs in a worker thread, off the event loop."""
+        return cls(llm_client, storage, await asyncio.to_thread(storage.load))
+
+    async def _asave(self) -> None:
+        """Save the mindmap in a worker thread, off the event loop."""
+        await asyncio.to_thread(self.storage.save, self.mindmap)
+
+    @property
+    def block_index(self) -> BlockVectorIndex:
+        """Similarity index over the blocks of every graph (shared per mindmap)."""
+        return shared_block_index(self.mindmap)
+
     def start_new_conversation(self, user_message: str) -> str:
         """
         Start a completely new conversation.
@@ -49,32 +78,12 @@ class ConversationManager:
             Assistant response
         """
         # Create new graph + root block
-        self.graph = ConversationGraph()
-        root_block = create_root_block(self.llm, user_message)
-        self.graph.add_block(root_block)
-        self.graph.current_block_id = root_block.block_id
-        self.mindmap.add_graph(self.graph)
-        
-        # Store user message
-        user_msg = ConversationMessage(
-            block_id=root_block.block_id,
-            role="user",
-            content=user_message,
-        )
-        self.graph.add_message(user_msg)
-        root_block.add_message_ref(user_msg.message_id)
+        root_block = self._start_graph(create_root_block(self.llm, user_message))
         
-        # Get response
+        # Store user message, get and store response
+        self._add_message(root_block, "user", user_message)
         response = self._get_response_in_block(root_block, user_message)
-        
-        # Store assistant response
-        assistant_msg = ConversationMessage(
-            block_id=root_block.block_id,
-            role="assistant",
-            content=response,
-        )
-        self.graph.add_message(assistant_msg)
-        root_block.add_message_ref(assistant_msg.message_id)
+        self._add_message(root_block, "assistant", response)
         
         # Save
         self.storage.save(self.mindmap)
@@ -82,6 +91,19 @@ class ConversationManager:
         print(f"\n[OK] Started new conversation: '{root_block.title}'")
         return response
 
+    async def astart_new_conversation(self, user_message: str) -> str:
+        """Async start_new_conversation(): LLM calls do not block the event loop."""
+        root_block = self._start_graph(await acreate_root_block(self.llm, user_message))
+        
+        self._add_message(root_block, "user", user_message)
+        response = await self._aget_response_in_block(root_block, user_message)
+        self._add_message(root_block, "assistant", response)
+        
+        await self._asave()
+        
+        print(f"\n[OK] Started new conversation: '{root_block.title}'")
+        return response
+
     def continue_conversation(self, user_message: str) -> str:
         """
         Continue conversation in current block or create new block.
@@ -95,7 +117,116 @@ class ConversationManager:
         if not self.graph:
             return self.start_new_conversation(user_message)
 
+        target_block, turn, _ = self._prepare_turn(user_message)
+        
+        # Store user message (with the embedding computed for this turn)
+        self._add_message(target_block, "user", user_message, turn)
+        
+        # Get response
+        response = self._get_response_in_block(target_block, user_message)
+        self._add_message(target_block, "assistant", response)
+        
+        # Auto-summarize if needed
+        maybe_auto_summarize(self.llm, self.graph, target_block)
+        
+        # Save
+        self.storage.save(self.mindmap)
+        
+        return response
+
+    async def acontinue_conversation(self, user_message: str) -> str:
+        """
+        Async continue_conversation(): same routing, with every LLM call and
+        embedding awaited so one event loop can serve many chats at once.
+        
+        Args:
+            user_message: User's message
+            
+        Returns:
+            Assistant response
+        """
+        if not self.graph:
+            return await self.astart_new_conversation(user_message)
+
+        target_block, turn, _ = await self._aprepare_turn(user_message)
+        
+        self._add_message(target_block, "user", user_message, turn)
+        response = await self._aget_response_in_block(target_block, user_message)
+        self._add_message(target_block, "assistant", response)
+        
+        await amaybe_auto_summarize(self.llm, self.graph, target_block)
+        
+        await self._asave()
+        
+        return response
+
+    def stream_conversation(self, user_message: str) -> Iterator[tuple[str, dict[str, Any]]]:
+        """
+        continue_conversation() (or start_new_conversation() when there is
+        no graph yet) with the answer streamed as it is generated.
+        
+        Yields (event, data) pairs, in order:
+            "classification": where the message went (action, confidence,
+                reasoning, graph_id, block_id, block_title), before any token
+            "token": {"text": chunk} for each piece of the answer
+            "done": ids of the stored messages and the full response, once
+                the answer is stored and the mindmap saved
+        
+        Nothing is saved if the stream fails or is closed before "done".
+        
+        Args:
+            user_message: User's message
+        """
+        if self.graph and self.graph.root_block_id:
+            target_block, turn, classification = self._prepare_turn(user_message)
+        else:
+            target_block = self._start_graph(create_root_block(self.llm, user_message))
+            turn, classification = None, None
+        user = self._add_message(target_block, "user", user_message, turn)
+        yield "classification", self._classification_event(target_block, classification)
+        
+        chunks = []
+        for chunk in self.llm.stream(self._answer_prompt(target_block, user_message)):
+            chunks.append(chunk)
+            yield "token", {"text": chunk}
+        
+        response = "".join(chunks)
+        assistant = self._add_message(target_block, "assistant", response)
+        maybe_auto_summarize(self.llm, self.graph, target_block)
+        self.storage.save(self.mindmap)
+        yield "done", self._done_event(target_block, user, assistant)
+
+    async def astream_conversation(self, user_message: str) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """Async stream_conversation()."""
+        if self.graph and self.graph.root_block_id:
+            target_block, turn, classification = await self._aprepare_turn(user_message)
+        else:
+            target_block = self._start_graph(await acreate_root_block(self.llm, user_message))
+            turn, classification = None, None
+        user = self._add_message(target_block, "user", user_message, turn)
+        yield "classification", self._classification_event(target_block, classification)
+        
+        chunks = []
+        async for chunk in self.llm.astream(self._answer_prompt(target_block, user_message)):
+            chunks.append(chunk)
+            yield "token", {"text": chunk}
+        
+        response = "".join(chunks)
+        assistant = self._add_message(target_block, "assistant", response)
+        await amaybe_auto_summarize(self.llm, self.graph, target_block)
+        await self._asave()
+        yield "done", self._done_event(target_block, user, assistant)
+
+    def _prepare_turn(self, user_message: str) -> tuple[Block, TurnContext, BlockClassification]:
+        """
+        Classify a message against the current block and create whatever
+        blocks its route needs.
+        
+        Returns:
+            (block the message goes to, the turn, its classification)
+        """
         current_block = self.graph.blocks[self.graph.current_block_id]
+        turn = TurnContext(self.llm, user_message)
         
         # Get recent messages for context
         block_messages = self.graph.get_block_messages(current_block.block_id)
@@ -106,112 +237,145 @@ class ConversationManager:
             self.llm,
             current_block,
             user_message,
-            block_messages
+            block_messages,
+            new_msg_embedding=turn.embedding,
         )
         
+        # Handle classification
+        route = self._route_turn(classification, current_block, turn)
+        target_block = route.target
+        if route.parent is not None:
+            new_blocks = route.new_blocks
+            if new_blocks is None:
+                new_blocks = self._resolve_deepen_blocks(classification, route.parent, user_message)
+            target_block = self._create_child_blocks(route.parent, new_blocks)[0]
+            self.graph.current_block_id = target_block.block_id
+        elif target_block is None:
+            # Start a new graph with this message as the root block
+            target_block = self._start_graph(create_root_block(self.llm, user_message))
+        return target_block, turn, classification
+
+    async def _aprepare_turn(self, user_message: str) -> tuple[Block, TurnContext, BlockClassification]:
+        """Async _prepare_turn()."""
+        current_block = self.graph.blocks[self.graph.current_block_id]
+        turn = TurnContext(self.llm, user_message)
+        block_messages = self.graph.get_block_messages(current_block.block_id)
+        
+        print(f"\n[Analyzing intent...]")
+        classification = await adetect_intent_shift(
+            self.llm,
+            current_block,
+            user_message,
+            block_messages,
+            new_msg_embedding=await turn.aembed(),
+        )
+        
+        route = self._route_turn(classification, current_block, turn)
+        target_block = route.target
+        if route.parent is not None:
+            new_blocks = route.new_blocks
+            if new_blocks is None:
+                new_blocks = await self._aresolve_deepen_blocks(classification, route.parent, user_message)
+            target_block = (await self._acreate_child_blocks(route.parent, new_blocks))[0]
+            self.graph.current_block_id = target_block.block_id
+        elif target_block is None:
+            target_block = self._start_graph(await acreate_root_block(self.llm, user_message))
+        return target_block, turn, classification
+
+    def _classification_event(self, block: Block,
+                              classification: Optional[BlockClassification]) -> dict[str, Any]:
+        """First streamed event: the route taken ("start" for a new conversation)."""
+        return {
+            "action": classification.action if classification else "start",
+            "confidence": classification.confidence if classification else 1.0,
+            "reasoning": classification.reasoning if classification else "",
+            "graph_id": self.graph.graph_id,
+            "block_id": block.block_id,
+            "block_title": block.title,
+        }
+
+    def _done_event(self, block: Block, user: ConversationMessage,
+                    assistant: ConversationMessage) -> dict[str, Any]:
+        """Last streamed event: where the turn was stored."""
+        return {
+            "graph_id": self.graph.graph_id,
+            "block_id": block.block_id,
+            "current_block_id": self.graph.current_block_id,
+            "user_message_id": user.message_id,
+            "message_id": assistant.message_id,
+            "response": assistant.content,
+        }
+
+    def _route_turn(self, classification: BlockClassification, current_block: Block,
+                    turn: TurnContext) -> "_TurnRoute":
+        """
+        Decide where a classified message goes (no LLM calls; a tangent
+        match only searches the block index with the turn's embedding).
+        Switches graph when a tangent matches a block of another graph.
+        """
         print(f"  [ACTION] {classification.action} (confidence: {classification.confidence:.2f})")
         print(f"  [REASON] {classification.reasoning}")
         
-        # Handle classification
         if classification.action == "continue":
             # Stay in current block
-            target_block = current_block
+            return _TurnRoute(target=current_block)
 
-        elif classification.action == "deepen":
+        if classification.action == "deepen":
             # Create child block(s) for a deeper dive
-            new_blocks = self._resolve_deepen_blocks(classification, current_block, user_message)
-            created_blocks = self._create_child_blocks(current_block, new_blocks)
-            target_block = created_blocks[0]
-            self.graph.current_block_id = target_block.block_id
-
-        elif classification.action == "tangent":
-            matched = self._find_matching_block_in_other_graphs(user_message)
-            if matched:
-                matched_graph, matched_block, similarity = matched
-                if similarity >= config.thresholds.continue_threshold:
-                    self.graph = matched_graph
-                    self.mindmap.current_graph_id = matched_graph.graph_id
-                    self.graph.current_block_id = matched_block.block_id
-                    target_block = matched_block
-                    print(
-                        f"  [MATCH] Redirected tangent to '{matched_block.title}' "
-                        f"(similarity: {similarity:.2f})"
-                    )
-                else:
-                    self.graph = matched_graph
-                    self.mindmap.current_graph_id = matched_graph.graph_id
-                    self.graph.current_block_id = matched_block.block_id
-                    new_blocks = self._resolve_deepen_blocks(
-                        classification,
-                        matched_block,
-                        user_message,
-                    )
-                    created_blocks = self._create_child_blocks(
-                        matched_block,
-                        new_blocks,
-                    )
-                    target_block = created_blocks[0]
-                    self.graph.current_block_id = target_block.block_id
-                    print(
-                        f"  [MATCH] Created child under '{matched_block.title}' "
-                        f"(similarity: {similarity:.2f})"
-                    )
-            else:
-                # Start a new graph with this message as the root block
-                self.graph = ConversationGraph()
-                root_block = create_root_block(self.llm, user_message)
-                self.graph.add_block(root_block)
-                self.graph.current_block_id = root_block.block_id
-                self.mindmap.add_graph(self.graph)
-                target_block = root_block
+            return _TurnRoute(parent=current_block)
+
+        if classification.action == "tangent":
+            matched = self._find_matching_block_in_other_graphs(turn)
+            if not matched:
+                return _TurnRoute()
+            matched_graph, matched_block, similarity = matched
+            self.graph = matched_graph
+            self.mindmap.current_graph_id = matched_graph.graph_id
+            self.graph.current_block_id = matched_block.block_id
+            if similarity >= config.thresholds.continue_threshold:
+                print(
+                    f"  [MATCH] Redirected tangent to '{matched_block.title}' "
+                    f"(similarity: {similarity:.2f})"
+                )
+                return _TurnRoute(target=matched_block)
+            print(
+                f"  [MATCH] Creating child under '{matched_block.title}' "
+                f"(similarity: {similarity:.2f})"
+            )
+            return _TurnRoute(parent=matched_block)
 
-        elif classification.action == "new_child":
+        if classification.action == "new_child":
             # Create new block(s)
-            new_blocks = classification.new_blocks or []
-            if not new_blocks and (classification.new_block_title or classification.new_block_intent):
-                new_blocks = [{
-                    "title": classification.new_block_title or "Untitled",
-                    "intent": classification.new_block_intent or "New discussion",
-                }]
+            new_blocks = _blocks_from_classification(classification)
             if not new_blocks:
                 new_blocks = [{"title": "Untitled", "intent": "New discussion"}]
-
-            created_blocks = self._create_child_blocks(current_block, new_blocks)
-            target_block = created_blocks[0]
-            self.graph.current_block_id = target_block.block_id
+            return _TurnRoute(parent=current_block, new_blocks=new_blocks)
         
-        else:
-            # Fallback
-            target_block = current_block
-        
-        # Store user message
-        user_msg = ConversationMessage(
-            block_id=target_block.block_id,
-            role="user",
-            content=user_message,
-        )
-        self.graph.add_message(user_msg)
-        target_block.add_message_ref(user_msg.message_id)
-        
-        # Get response
-        response = self._get_response_in_block(target_block, user_message)
-        
-        # Store assistant response
-        assistant_msg = ConversationMessage(
-            block_id=target_block.block_id,
-            role="assistant",
-            content=response,
+        # Fallback
+        return _TurnRoute(target=current_block)
+
+    def _start_graph(self, root_block: Block) -> Block:
+        """Make root_block the root of a new current graph."""
+        self.graph = ConversationGraph()
+        self.graph.add_block(root_block)
+        self.graph.current_block_id = root_block.block_id
+        self.mindmap.add_graph(self.graph)
+        return root_block
+
+    def _add_message(self, block: Block, role: str, content: str,
+                     turn: Optional[TurnContext] = None) -> ConversationMessage:
+        """Store a message in block (a user message keeps the turn's embedding, if computed)."""
+        embedding = turn.computed_embedding if turn else []
+        message = ConversationMessage(
+            block_id=block.block_id,
+            role=role,
+            content=content,
+            embedding=embedding,
+            embedding_model=self.llm.embedding_model if embedding else "",
         )
-        self.graph.add_message(assistant_msg)
-        target_block.add_message_ref(assistant_msg.message_id)
-        
-        # Auto-summarize if needed
-        maybe_auto_summarize(self.llm, self.graph, target_block)
-        
-        # Save
-        self.storage.save(self.mindmap)
-        
-        return response
+        self.graph.add_message(message)
+        block.add_message_ref(message.message_id)
+        return message
 
     def _get_response_in_block(self, block: Block, user_message: str) -> str:
         """
@@ -224,12 +388,14 @@ class ConversationManager:
         Returns:
             Assistant response
         """
-        # Construct block-scoped context
-        context = construct_block_context(self.graph, block)
-        
-        # Build full prompt
-        prompt = context + f"\nUSER: {user_message}\n\nASSISTANT:"
-        prompt = prompts.prompt_answer_in_block_context(
+        return self.llm.call(self._answer_prompt(block, user_message))
+
+    async def _aget_response_in_block(self, block: Block, user_message: str) -> str:
+        return await self.llm.acall(self._answer_prompt(block, user_message))
+
+    def _answer_prompt(self, block: Block, user_message: str) -> str:
+        """Block-scoped answer prompt."""
+        return prompts.prompt_answer_in_block_context(
             block.title,
             block.intent,
             block.summary or "(discussion just started)",
@@ -238,9 +404,6 @@ class ConversationManager:
             construct_block_context(self.graph, block),
             user_message
         )
-        
-        response = self.llm.call(prompt)
-        return response
 
     def _resolve_deepen_blocks(
         self,
@@ -248,55 +411,54 @@ class ConversationManager:
         current_block: Block,
         user_message: str,
     ) -> list[dict[str, str]]:
-        new_blocks = classification.new_blocks or []
+        new_blocks = _blocks_from_classification(classification)
         if new_blocks:
             return new_blocks
+        try:
+            prompt = classification_prompt(
+                current_block, user_message, self.graph.get_block_messages(current_block.block_id)
+            )
+            new_blocks = _parse_block_seeds(self.llm.call_json(prompt, family="classify"))
+        except Exception as exc:
+            print(f"  [WARN] Could not expand deepen blocks: {exc}")
+        return new_blocks or _default_deepen_blocks(current_block, user_message)
 
-        if classification.new_block_title or classification.new_block_intent:
-            return [{
-                "title": classification.new_block_title or "Untitled",
-                "intent": classification.new_block_intent or "New discussion",
-            }]
-
-        prompt = prompts.prompt_classify_intent_shift(
-            current_block.title,
-            current_block.intent,
-            current_block.summary or "(block just started)",
-            "(context omitted)",
-            "(context omitted)",
-            user_message,
-        )
+    async def _aresolve_deepen_blocks(
+        self,
+        classification: "BlockClassification",
+        current_block: Block,
+        user_message: str,
+    ) -> list[dict[str, str]]:
+        new_blocks = _blocks_from_classification(classification)
+        if new_blocks:
+            return new_blocks
         try:
-            response_json = self.llm.call_json(prompt)
-            for item in response_json.get("new_blocks", []) or []:
-                if not isinstance(item, dict):
-                    continue
-                title = item.get("title")
-                intent = item.get("intent")
-                if title or intent:
-                    new_blocks.append({
-                        "title": title or "Untitled",
-                        "intent": intent or "New discussion",
-                    })
+            prompt = classification_prompt(
+                current_block, user_message, self.graph.get_block_messages(current_block.block_id)
+            )
+            new_blocks = _parse_block_seeds(await self.llm.acall_json(prompt, family="classify"))
         except Exception as exc:
             print(f"  [WARN] Could not expand deepen blocks: {exc}")
+        return new_blocks or _default_deepen_blocks(current_block, user_message)
 
-        if not new_blocks:
-            new_blocks = [{
-                "title": _make_deepen_title(current_block.title, user_message),
-                "intent": f"Explore details of {current_block.intent}: {user_message}",
-            }]
+    def _create_child_blocks(self, parent_block: Block, new_blocks: list[dict[str, str]]) -> list[Block]:
+        intents = [block_seed.get("intent", "New discussion") for block_seed in new_blocks]
+        return self._add_child_blocks(parent_block, new_blocks, intents, embed_texts(self.llm, intents))
 
-        return new_blocks
+    async def _acreate_child_blocks(self, parent_block: Block, new_blocks: list[dict[str, str]]) -> list[Block]:
+        intents = [block_seed.get("intent", "New discussion") for block_seed in new_blocks]
+        return self._add_child_blocks(parent_block, new_blocks, intents, await self.llm.aembed_many(intents))
 
-    def _create_child_blocks(self, parent_block: Block, new_blocks: list[dict[str, str]]) -> list[Block]:
+    def _add_child_blocks(self, parent_block: Block, new_blocks: list[dict[str, str]],
+                          intents: list[str], embeddings: list[list[float]]) -> list[Block]:
         created_blocks = []
-        for block_seed in new_blocks:
+        for block_seed, intent, embedding in zip(new_blocks, intents, embeddings):
             new_block = create_child_block(
                 self.llm,
                 parent_block,
                 block_seed.get("title", "Untitled"),
-                block_seed.get("intent", "New discussion"),
+                intent,
+                intent_embedding=embedding,
             )
             self.graph.add_block(new_block)
             created_blocks.append(new_block)
@@ -306,26 +468,28 @@ class ConversationManager:
    
     def _find_matching_block_in_other_graphs(
         self,
-        user_message: str,
+        turn: TurnContext,
     ) -> Optional[tuple[ConversationGraph, Block, float]]:
         if not self.graph:
             return None
 
-        user_embedding = embed_text(self.llm, user_message)
-        best_match: Optional[tuple[ConversationGraph, Block, float]] = None
+        user_embedding = turn.embedding
 
-        for graph_id, graph in self.mindmap.graphs.items():
-            for block in graph.blocks.values():
-                if not block.intent:
-                    continue
-                if not block.embedding:
-                    block.embedding = embed_text(self.llm, block.intent)
-                similarity = compute_similarity(user_embedding, block.embedding)
-                if best_match is None or similarity > best_match[2]:
-                    best_match = (graph, block, similarity)
-
-        if best_match and best_match[2] >= config.thresholds.sibling_threshold:
-            return best_match
+        # Blocks without an embedding (e.g. imported data) are left to the
+        # background backfill (backfill.py) rather than embedded mid-request.
+        # The index is shared per mindmap_id and only changed by sync(), so
+        # another request may have synced it to a different copy in between:
+        # skip hits this mindmap does not have.
+        index = self.block_index
+        index.sync(self.mindmap)
+
+        for graph_id, block_id, similarity in index.search(user_embedding, k=_MATCH_CANDIDATES):
+            if similarity < config.thresholds.sibling_threshold:
+                break
+            graph = self.mindmap.graphs.get(graph_id)
+            block = graph.blocks.get(block_id) if graph else None
+            if block is not None:
+                return graph, block, similarity
 
         return None
     
@@ -353,6 +517,27 @@ class ConversationManager:
         
         return summary
 
+    def search(self, query: str, k: int = 10) -> list[SearchResult]:
+        """
+        Find blocks and user messages related to a query across all graphs.
+
+        Args:
+            query: Free-text query (embedded once)
+            k: Number of results
+
+        Returns:
+            Results ranked by similarity, best first
+        """
+        if not query.strip():
+            return []
+        return shared_search_index(self.mindmap).search(self.mindmap, embed_text(self.llm, query), k)
+
+    async def asearch(self, query: str, k: int = 10) -> list[SearchResult]:
+        """Async search() (the query embedding is awaited)."""
+        if not query.strip():
+            return []
+        return shared_search_index(self.mindmap).search(self.mindmap, await self.llm.aembed(query), k)
+
     def print_mindmap(self) -> None:
         """Print the block tree."""
         print("\n[MINDMAP] CONVERSATION GRAPH:")
@@ -481,6 +666,52 @@ class ConversationManager:
         
         self.storage.save(self.mindmap)
     
+@dataclass
+class _TurnRoute:
+    """
+    Where a message goes: target (an existing block), or new child blocks
+    under parent (new_blocks None = resolve them as for a deepen), or, with
+    neither set, the root of a new graph.
+    """
+    target: Optional[Block] = None
+    parent: Optional[Block] = None
+    new_blocks: Optional[list[dict[str, str]]] = None
+
+
+def _blocks_from_classification(classification: BlockClassification) -> list[dict[str, str]]:
+    """Block seeds the classifier already proposed (new_blocks, else the legacy title/intent)."""
+    if classification.new_blocks:
+        return classification.new_blocks
+    if classification.new_block_title or classification.new_block_intent:
+        return [{
+            "title": classification.new_block_title or "Untitled",
+            "intent": classification.new_block_intent or "New discussion",
+        }]
+    return []
+
+
+def _parse_block_seeds(response_json: dict) -> list[dict[str, str]]:
+    new_blocks = []
+    for item in response_json.get("new_blocks", []) or []:
+        if not isinstance(item, dict):
+            continue
+        title = item.get("title")
+        intent = item.get("intent")
+        if title or intent:
+            new_blocks.append({
+                "title": title or "Untitled",
+                "intent": intent or "New discussion",
+            })
+    return new_blocks
+
+
+def _default_deepen_blocks(current_block: Block, user_message: str) -> list[dict[str, str]]:
+    return [{
+        "title": _make_deepen_title(current_block.title, user_message),
+        "intent": f"Explore details of {current_block.intent}: {user_message}",
+    }]
+
+
 def _make_deepen_title(parent_title: str, user_message: str) -> str:
     cleaned_title = re.sub(r"^(deep dive|deepen|details)\s*[:\-]\s*", "", parent_title, flags=re.I).strip()
     cleaned_title = cleaned_title or "Details"
@@ -1,18 +1,44 @@
 """Core business logic module."""
 
-from .embeddings import compute_similarity, embed_text
+from .embeddings import compute_similarity, embed_text, embed_texts
 from .context_builder import construct_block_context, construct_summary_prompt_context
-from .intent_detector import detect_intent_shift
-from .block_manager import create_root_block, create_child_block, summarize_block, maybe_auto_summarize
+from .intent_detector import detect_intent_shift, adetect_intent_shift, route_by_similarity, classification_prompt
+from .block_manager import (
+    create_root_block, create_child_block, summarize_block, maybe_auto_summarize,
+    acreate_root_block, acreate_child_block, asummarize_block, amaybe_auto_summarize,
+)
+from .compression import EmbeddingCompressor, default_compressor
+from .turn import TurnContext
+from .vector_index import BlockVectorIndex, IVFBlockIndex, GraphRoutedIndex, create_block_index, shared_block_index
+from .search import SearchResult, SemanticSearch, shared_search_index
 
 __all__ = [
     "compute_similarity",
     "embed_text",
+    "embed_texts",
     "construct_block_context",
     "construct_summary_prompt_context",
     "detect_intent_shift",
+    "adetect_intent_shift",
+    "route_by_similarity",
+    "classification_prompt",
     "create_root_block",
     "create_child_block",
     "summarize_block",
     "maybe_auto_summarize",
+    "acreate_root_block",
+    "acreate_child_block",
+    "asummarize_block",
+    "amaybe_auto_summarize",
+    "EmbeddingCompressor",
+    "default_compressor",
+    "TurnContext",
+    "BlockVectorIndex",
+    "IVFBlockIndex",
+    "GraphRoutedIndex",
+    "create_block_index",
+    "shared_block_index",
+    "SearchResult",
+    "SemanticSearch",
+    "shared_search_index",
 ]
@@ -3,9 +3,10 @@ Block lifecycle management.
 Creating, updating, and summarizing blocks.
 """
 
-from typing import Optional
+from typing import List, Optional
 from llm.base import LLMClient
 from llm import prompts
+from llm.scheduler import call_priority
 from models import Block, ConversationGraph, ConversationMessage
 from core.embeddings import embed_text
 from core.context_builder import construct_summary_prompt_context
@@ -26,7 +27,7 @@ def create_root_block(llm_client: LLMClient, user_message: str) -> Block:
     """
     # Extract intent from message
     prompt = prompts.prompt_extract_intent_from_message(user_message)
-    response = llm_client.call_json(prompt)
+    response = llm_client.call_json(prompt, family="intent")
     
     intent = response.get("intent", "Initial conversation")
     title = response.get("title", "Untitled")
@@ -39,13 +40,29 @@ def create_root_block(llm_client: LLMClient, user_message: str) -> Block:
         title=title,
         intent=intent,
         embedding=intent_embedding,
+        embedding_model=llm_client.embedding_model,
     )
     
     return block
 
 
+async def acreate_root_block(llm_client: LLMClient, user_message: str) -> Block:
+    """Async create_root_block()."""
+    prompt = prompts.prompt_extract_intent_from_message(user_message)
+    response = await llm_client.acall_json(prompt, family="intent")
+    
+    intent = response.get("intent", "Initial conversation")
+    return Block(
+        title=response.get("title", "Untitled"),
+        intent=intent,
+        embedding=await llm_client.aembed(intent),
+        embedding_model=llm_client.embedding_model,
+    )
+
+
 def create_child_block(llm_client: LLMClient, parent_block: Block, 
-                      title: str, intent: str) -> Block:
+                      title: str, intent: str,
+                      intent_embedding: Optional[List[float]] = None) -> Block:
     """
     Create a child block.
     
@@ -54,12 +71,14 @@ def create_child_block(llm_client: LLMClient, parent_block: Block,
         parent_block: Parent block
         title: Block title
         intent: Block intent
+        intent_embedding: Embedding of intent, if already computed (e.g. in a batch)
         
     Returns:
         New Block instance
     """
     # Embed the intent
-    intent_embedding = embed_text(llm_client, intent)
+    if intent_embedding is None:
+        intent_embedding = embed_text(llm_client, intent)
     
     # Create block
     block = Block(
@@ -67,6 +86,7 @@ def create_child_block(llm_client: LLMClient, parent_block: Block,
         title=title,
         intent=intent,
         embedding=intent_embedding,
+        embedding_model=llm_client.embedding_model,
     )
     
     # Update parent
@@ -75,6 +95,15 @@ def create_child_block(llm_client: LLMClient, parent_block: Block,
     return block
 
 
+async def acreate_child_block(llm_client: LLMClient, parent_block: Block,
+                              title: str, intent: str,
+                              intent_embedding: Optional[List[float]] = None) -> Block:
+    """Async create_child_block() (only the embedding is awaited)."""
+    if intent_embedding is None:
+        intent_embedding = await llm_client.aembed(intent)
+    return create_child_block(llm_client, parent_block, title, intent, intent_embedding=intent_embedding)
+
+
 def summarize_block(llm_client: LLMClient, graph: ConversationGraph, 
                    block: Block) -> None:
     """
@@ -93,24 +122,42 @@ def summarize_block(llm_client: LLMClient, graph: ConversationGraph,
     prompt = prompts.prompt_generate_block_summary(block.intent, context)
     
     try:
-        response = llm_client.call_json(prompt)
-        
-        # Update block
-        block.summary = response.get("summary", "")
-        block.key_points = response.get("key_points", [])
-        block.open_questions = response.get("open_questions", [])
-        
-        # Update title if suggested
-        new_title = response.get("title_suggestion")
-        if new_title:
-            block.title = new_title
-        
-        print(f"[OK] Block '{block.title}' summarized")
+        # Summaries wait behind answers for provider capacity
+        with call_priority("summary"):
+            response = llm_client.call_json(prompt, family="summary")
+        _apply_summary(block, response)
+    except Exception as e:
+        print(f"Error summarizing block: {e}")
+
+
+async def asummarize_block(llm_client: LLMClient, graph: ConversationGraph,
+                           block: Block) -> None:
+    """Async summarize_block()."""
+    context = construct_summary_prompt_context(graph, block)
+    prompt = prompts.prompt_generate_block_summary(block.intent, context)
     
+    try:
+        with call_priority("summary"):
+            response = await llm_client.acall_json(prompt, family="summary")
+        _apply_summary(block, response)
     except Exception as e:
         print(f"Error summarizing block: {e}")
 
 
+def _apply_summary(block: Block, response: dict) -> None:
+    """Update block in-place from the summary prompt's JSON reply."""
+    block.summary = response.get("summary", "")
+    block.key_points = response.get("key_points", [])
+    block.open_questions = response.get("open_questions", [])
+    
+    # Update title if suggested
+    new_title = response.get("title_suggestion")
+    if new_title:
+        block.title = new_title
+    
+    print(f"[OK] Block '{block.title}' summarized")
+
+
 def maybe_auto_summarize(llm_client: LLMClient, graph: ConversationGraph, 
                         block: Block) -> None:
     """
@@ -121,9 +168,22 @@ def maybe_auto_summarize(llm_client: LLMClient, graph: ConversationGraph,
         graph: Conversation graph
         block: Block to check
     """
+    if _needs_summary(block):
+        summarize_block(llm_client, graph, block)
+
+
+async def amaybe_auto_summarize(llm_client: LLMClient, graph: ConversationGraph,
+                                block: Block) -> None:
+    """Async maybe_auto_summarize()."""
+    if _needs_summary(block):
+        await asummarize_block(llm_client, graph, block)
+
+
+def _needs_summary(block: Block) -> bool:
     message_count = len(block.conversation_refs)
     threshold = config.auto_summarize_after_n_messages
     
     if message_count >= threshold and not block.summary:
         print(f"Auto-summarizing block (reached {message_count} messages)...")
-        summarize_block(llm_client, graph, block)
+        return True
+    return False
@@ -0,0 +1,176 @@
+"""
+Embedding compression.
+Reduces embeddings to fewer dimensions (Matryoshka-style truncation, or a
+PCA projection fitted on the stored vectors) and quantizes them to float16
+or int8 with a per-vector scale. The block index stores its rows in this
+form and compute_similarity scores in it, so routing sees the same numbers
+whichever path computed them. The exception is PCA: its basis is fitted on
+each index's own rows, so compute_similarity compares full vectors there.
+
+Queries are reduced but not quantized (asymmetric scoring), which keeps
+most of the accuracy of the full vectors.
+"""
+
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from config import config
+
+PRECISIONS = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+REDUCTIONS = ("none", "truncate", "pca")
+
+
+class EmbeddingCompressor:
+    """Dimension reduction plus quantization of L2-normalized embeddings."""
+
+    def __init__(self, precision: str = "float32", reduce: str = "none", dim: int = 0,
+                 components: Optional[np.ndarray] = None):
+        """
+        Args:
+            precision: "float32", "float16" or "int8"
+            reduce: "none", "truncate" (keep the first dim components) or "pca"
+            dim: Target dimension for truncate/pca (0 = keep all)
+            components: (dim, input_dim) PCA basis; without it "pca" does not reduce yet
+
+        Raises:
+            ValueError: Unknown precision or reduction
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision: {precision} (expected one of {', '.join(PRECISIONS)})")
+        if reduce not in REDUCTIONS:
+            raise ValueError(f"Unknown embedding reduction: {reduce} (expected one of {', '.join(REDUCTIONS)})")
+        self.precision = precision
+        self.reduce_method = reduce
+        self.dim = dim
+        self.components = components
+        self.dtype = PRECISIONS[precision]
+
+    @classmethod
+    def from_config(cls) -> "EmbeddingCompressor":
+        """Compressor selected in config.embeddings (reducing to embedding_dim)."""
+        return cls(
+            config.embeddings.compression_precision.lower(),
+            config.embeddings.compression_reduce.lower(),
+            config.embeddings.embedding_dim,
+        )
+
+    @property
+    def lossless(self) -> bool:
+        return self.precision == "float32" and self.reduce_method == "none"
+
+    @property
+    def needs_fit(self) -> bool:
+        """True for a PCA compressor whose basis has not been fitted yet."""
+        return self.reduce_method == "pca" and self.components is None and self.dim > 0
+
+    def fit(self, vectors: np.ndarray, max_samples: int = 20000, seed: int = 0) -> "EmbeddingCompressor":
+        """
+        Compressor with a PCA basis fitted on vectors (uncentered, so dot
+        products are preserved as well as possible).
+
+        Args:
+            vectors: (n, input_dim) float32 rows
+            max_samples: Rows sampled for the fit
+            seed: Sampling seed
+
+        Returns:
+            New compressor (without reduction if dim >= input_dim); self if
+            this one is not a PCA compressor
+        """
+        if self.reduce_method != "pca" or not self.dim:
+            return self
+        if self.dim >= vectors.shape[1]:
+            return EmbeddingCompressor(self.precision)
+        if len(vectors) > max_samples:
+            vectors = vectors[np.random.default_rng(seed).choice(len(vectors), max_samples, replace=False)]
+        _, _, vt = np.linalg.svd(np.asarray(vectors, dtype=np.float32), full_matrices=False)
+        components = vt[:self.dim].astype(np.float32)
+        if len(components) < self.dim:
+            # Fewer samples than dimensions: the basis spans what was seen
+            return EmbeddingCompressor(self.precision, "pca", len(components), components)
+        return EmbeddingCompressor(self.precision, "pca", self.dim, components)
+
+    def output_dim(self, input_dim: int) -> int:
+        """Stored dimension for inputs of input_dim."""
+        if self.reduce_method == "truncate" and self.dim:
+            return min(self.dim, input_dim)
+        if self.reduce_method == "pca" and self.components is not None:
+            return len(self.components)
+        return input_dim
+
+    def reduce(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Reduce and re-normalize rows (no quantization).
+
+        Args:
+            vectors: (n, input_dim) array
+
+        Returns:
+            (n, output_dim) float32 array of unit rows (zero rows stay zero)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.reduce_method == "truncate" and self.dim:
+            vectors = vectors[:, :self.dim]
+        elif self.reduce_method == "pca" and self.components is not None:
+            vectors = vectors @ self.components.T
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reduce and quantize rows.
+
+        Args:
+            vectors: (n, input_dim) array
+
+        Returns:
+            (codes, scales): codes in the target dtype, float32 scale per row
+            (1.0 unless int8)
+        """
+        reduced = self.reduce(vectors)
+        if self.precision != "int8":
+            return reduced.astype(self.dtype), np.ones(len(reduced), dtype=np.float32)
+        peaks = np.abs(reduced).max(axis=1)
+        scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+        codes = np.rint(reduced / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """float32 rows back from encode() output (approximately unit length)."""
+        decoded = codes.astype(np.float32)
+        if self.precision == "int8":
+            decoded *= scales[:, None]
+        return decoded
+
+    def nbytes(self, input_dim: int) -> int:
+        """Bytes stored per vector of input_dim."""
+        size = self.output_dim(input_dim) * np.dtype(self.dtype).itemsize
+        return size + (4 if self.precision == "int8" else 0)
+
+    def similarity(self, stored: Sequence[float], query: Sequence[float]) -> float:
+        """
+        Cosine similarity between a stored embedding (compressed) and a query
+        embedding (reduced only).
+
+        Args:
+            stored: Embedding as it would be kept (e.g. a block intent)
+            query: Fresh embedding (e.g. the user message)
+
+        Returns:
+            Approximate cosine similarity
+        """
+        if not stored or not query or len(stored) != len(query):
+            return 0.0
+        codes, scales = self.encode(np.asarray([stored], dtype=np.float32))
+        reduced = self.reduce(np.asarray([query], dtype=np.float32))
+        return float(self.decode(codes, scales)[0] @ reduced[0])
+
+
+_default_compressor: Optional[EmbeddingCompressor] = None
+
+
+def default_compressor() -> EmbeddingCompressor:
+    """Process-wide compressor from config (used for pairwise similarities; never fitted)."""
+    global _default_compressor
+    if _default_compressor is None:
+        _default_compressor = EmbeddingCompressor.from_config()
+    return _default_compressor
@@ -5,21 +5,30 @@ Uses the configured LLM client for embeddings.
 
 from typing import List
 from llm.base import LLMClient
+from core.compression import default_compressor
 
 
 def compute_similarity(embedding1: List[float], embedding2: List[float]) -> float:
     """
     Compute cosine similarity between two embeddings.
+    With truncation or quantization configured, embedding2 is scored in its
+    compressed form (as the block index stores it). A PCA basis is fitted per
+    index on the rows it holds, so in pca mode the full vectors are compared
+    and scores can differ slightly from the index's.
     
     Args:
-        embedding1: First embedding vector
-        embedding2: Second embedding vector
+        embedding1: First embedding vector (e.g. the user message)
+        embedding2: Second embedding vector (e.g. a block intent)
         
     Returns:
         Similarity score (0-1)
     """
     if not embedding1 or not embedding2:
         return 0.0
+
+    compressor = default_compressor()
+    if not compressor.lossless and compressor.reduce_method != "pca":
+        return compressor.similarity(embedding2, embedding1)
     
     dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
     magnitude1 = sum(a * a for a in embedding1) ** 0.5
@@ -43,3 +52,17 @@ def embed_text(llm_client: LLMClient, text: str) -> List[float]:
         Embedding vector
     """
     return llm_client.embed(text)
+
+
+def embed_texts(llm_client: LLMClient, texts: List[str]) -> List[List[float]]:
+    """
+    Generate embeddings for several texts in as few requests as possible.
+    
+    Args:
+        llm_client: LLM client instance
+        texts: Texts to embed
+        
+    Returns:
+        One embedding vector per text, in order
+    """
+    return llm_client.embed_many(texts)
@@ -3,7 +3,7 @@ Intent shift detection.
 Determines if new message continues, deepens, or diverges from current block.
 """
 
-from typing import Optional
+from typing import List, Optional
 import json
 from llm.base import LLMClient
 from llm import prompts
@@ -13,7 +13,8 @@ from config import config
 
 
 def detect_intent_shift(llm_client: LLMClient, current_block: Block, 
-                       new_user_msg: str, last_messages: list[ConversationMessage]) -> BlockClassification:
+                       new_user_msg: str, last_messages: list[ConversationMessage],
+                       new_msg_embedding: Optional[List[float]] = None) -> BlockClassification:
     """
     Detect if the new message represents an intent shift.
     
@@ -24,21 +25,50 @@ def detect_intent_shift(llm_client: LLMClient, current_block: Block,
         current_block: The current block
         new_user_msg: The new user message
         last_messages: Recent messages (for context)
+        new_msg_embedding: Embedding of new_user_msg, if the caller already has it
         
     Returns:
         BlockClassification with action and reasoning
     """
     
     # Step 1: Embed the new message
-    new_msg_embedding = embed_text(llm_client, new_user_msg)
+    if not new_msg_embedding:
+        new_msg_embedding = embed_text(llm_client, new_user_msg)
+    
+    # Steps 2-3: Compare to the block intent; ask the LLM if unclear
+    classification = _classify_by_similarity(new_msg_embedding, current_block)
+    if classification is not None:
+        return classification
+    return _classify_with_llm(
+        llm_client, current_block, new_user_msg, last_messages
+    )
+
+
+async def adetect_intent_shift(llm_client: LLMClient, current_block: Block,
+                               new_user_msg: str, last_messages: list[ConversationMessage],
+                               new_msg_embedding: Optional[List[float]] = None) -> BlockClassification:
+    """Async detect_intent_shift() (same arguments and result)."""
+    if not new_msg_embedding:
+        new_msg_embedding = await llm_client.aembed(new_user_msg)
+    
+    classification = _classify_by_similarity(new_msg_embedding, current_block)
+    if classification is not None:
+        return classification
+    return await _aclassify_with_llm(
+        llm_client, current_block, new_user_msg, last_messages
+    )
+
+
+def _classify_by_similarity(new_msg_embedding: List[float], current_block: Block) -> Optional[BlockClassification]:
+    """Embedding-only classification, or None when the LLM has to decide."""
     
     # Step 2: Compare similarity to current block intent
     intent_similarity = compute_similarity(new_msg_embedding, current_block.embedding)
     
     # Step 3: Make decision based on thresholds
-    thresholds = config.thresholds
+    decision = route_by_similarity(intent_similarity)
     
-    if intent_similarity >= thresholds.continue_threshold:
+    if decision == "continue":
         # Very high similarity: same topic
         return BlockClassification(
             action="continue",
@@ -46,7 +76,7 @@ def detect_intent_shift(llm_client: LLMClient, current_block: Block,
             reasoning=f"Message aligns strongly with block intent (similarity: {intent_similarity:.2f})"
         )
     
-    elif intent_similarity >= thresholds.deepen_threshold:
+    elif decision == "deepen":
         # Medium-high similarity: deeper dive
         return BlockClassification(
             action="deepen",
@@ -54,18 +84,26 @@ def detect_intent_shift(llm_client: LLMClient, current_block: Block,
             reasoning=f"Message deepens the current topic (similarity: {intent_similarity:.2f})"
         )
     
-    elif intent_similarity < thresholds.tangent_threshold:
-        # Low similarity: likely tangent or new topic
-        # Ask LLM for confirmation
-        return _classify_with_llm(
-            llm_client, current_block, new_user_msg, last_messages
-        )
+    # Low similarity (likely tangent or new topic) or ambiguous: ask LLM for confirmation
+    return None
+
+
+def route_by_similarity(intent_similarity: float) -> str:
+    """
+    Embedding-only routing decision for a message/block-intent similarity.
     
-    else:
-        # Medium similarity: ambiguous, ask LLM
-        return _classify_with_llm(
-            llm_client, current_block, new_user_msg, last_messages
-        )
+    Returns:
+        "continue", "deepen", "tangent" (likely off-topic) or "ambiguous";
+        the last two are confirmed by the LLM classifier
+    """
+    thresholds = config.thresholds
+    if intent_similarity >= thresholds.continue_threshold:
+        return "continue"
+    if intent_similarity >= thresholds.deepen_threshold:
+        return "deepen"
+    if intent_similarity < thresholds.tangent_threshold:
+        return "tangent"
+    return "ambiguous"
 
 
 def _classify_with_llm(llm_client: LLMClient, current_block: Block, 
@@ -73,13 +111,44 @@ def _classify_with_llm(llm_client: LLMClient, current_block: Block,
     """
     Use LLM to classify intent shift when embedding similarity is ambiguous.
     """
-    
+    base_prompt = classification_prompt(current_block, new_user_msg, last_messages)
+    try:
+        return _classification_from_response(llm_client.call_json(base_prompt, family="classify"))
+    except json.JSONDecodeError:
+        try:
+            return _classification_from_response(llm_client.call_json(_retry_prompt(base_prompt), family="classify"))
+        except Exception as e:
+            return _fallback_classification(e)
+    except Exception as e:
+        return _fallback_classification(e)
+
+
+async def _aclassify_with_llm(llm_client: LLMClient, current_block: Block,
+                              new_user_msg: str, last_messages: list[ConversationMessage]) -> BlockClassification:
+    """Async _classify_with_llm()."""
+    base_prompt = classification_prompt(current_block, new_user_msg, last_messages)
+    try:
+        return _classification_from_response(await llm_client.acall_json(base_prompt, family="classify"))
+    except json.JSONDecodeError:
+        try:
+            return _classification_from_response(await llm_client.acall_json(_retry_prompt(base_prompt), family="classify"))
+        except Exception as e:
+            return _fallback_classification(e)
+    except Exception as e:
+        return _fallback_classification(e)
+
+
+def classification_prompt(current_block: Block, new_user_msg: str,
+                          last_messages: list[ConversationMessage]) -> str:
+    """
+    Intent-shift prompt for a message in a block. Also used to expand deepen
+    blocks, so both callers send the same text and share response-cache entries.
+    """
     # Format last messages for context
     last_user = last_messages[-2].content if len(last_messages) >= 2 else "(first message)"
     last_assistant = last_messages[-1].content if last_messages else "(no response yet)"
     
-    # Get classification from LLM
-    base_prompt = prompts.prompt_classify_intent_shift(
+    return prompts.prompt_classify_intent_shift(
         current_block.title,
         current_block.intent,
         current_block.summary or "(block just started)",
@@ -87,88 +156,55 @@ def _classify_with_llm(llm_client: LLMClient, current_block: Block,
         last_assistant,
         new_user_msg
     )
+
+
+def _retry_prompt(base_prompt: str) -> str:
+    return (
+        base_prompt
+        + "\n\nReminder: Return a single valid JSON object only. No extra text."
+    )
+
+
+def _classification_from_response(response_json: dict) -> BlockClassification:
+    """Map the LLM's JSON reply to a BlockClassification."""
+    llm_action = response_json.get("classification", "").upper()
+    action_map = {
+        "CONTINUE": "continue",
+        "DEEPEN": "deepen",
+        "NEW_CHILD": "new_child",
+        "TANGENT": "tangent",
+    }
+    action = action_map.get(llm_action, "continue")
+
+    new_blocks = _parse_new_blocks(response_json)
+    if not new_blocks:
+        legacy_title = response_json.get("new_block_title")
+        legacy_intent = response_json.get("new_block_intent")
+        if legacy_title or legacy_intent:
+            new_blocks = [{
+                "title": legacy_title or "Untitled",
+                "intent": legacy_intent or "New discussion",
+            }]
     
-    try:
-        response_json = llm_client.call_json(base_prompt)
-        
-        # Map LLM response to our action enum
-        llm_action = response_json.get("classification", "").upper()
-        action_map = {
-            "CONTINUE": "continue",
-            "DEEPEN": "deepen",
-            "NEW_CHILD": "new_child",
-            "TANGENT": "tangent",
-        }
-        
-        action = action_map.get(llm_action, "continue")
-
-        new_blocks = _parse_new_blocks(response_json)
-        if not new_blocks:
-            legacy_title = response_json.get("new_block_title")
-            legacy_intent = response_json.get("new_block_intent")
-            if legacy_title or legacy_intent:
-                new_blocks = [{
-                    "title": legacy_title or "Untitled",
-                    "intent": legacy_intent or "New discussion",
-                }]
-        
-        return BlockClassification(
-            action=action,
-            confidence=float(response_json.get("confidence", 0.5)),
-            reasoning=response_json.get("reasoning", ""),
-            new_block_title=response_json.get("new_block_title"),
-            new_block_intent=response_json.get("new_block_intent"),
-            new_blocks=new_blocks
-        )
-    
-    except json.JSONDecodeError:
-        retry_prompt = (
-            base_prompt
-            + "\n\nReminder: Return a single valid JSON object only. No extra text."
-        )
-        try:
-            response_json = llm_client.call_json(retry_prompt)
-            llm_action = response_json.get("classification", "").upper()
-            action_map = {
-                "CONTINUE": "continue",
-                "DEEPEN": "deepen",
-                "NEW_CHILD": "new_child",
-                "TANGENT": "tangent",
-            }
-            action = action_map.get(llm_action, "continue")
-            new_blocks = _parse_new_blocks(response_json)
-            if not new_blocks:
-                legacy_title = response_json.get("new_block_title")
-                legacy_intent = response_json.get("new_block_intent")
-                if legacy_title or legacy_intent:
-                    new_blocks = [{
-                        "title": legacy_title or "Untitled",
-                        "intent": legacy_intent or "New discussion",
-                    }]
-            return BlockClassification(
-                action=action,
-                confidence=float(response_json.get("confidence", 0.5)),
-                reasoning=response_json.get("reasoning", ""),
-                new_block_title=response_json.get("new_block_title"),
-                new_block_intent=response_json.get("new_block_intent"),
-                new_blocks=new_blocks
-            )
-        except Exception as e:
-            print(f"Error in LLM classification: {e}")
-            return BlockClassification(
-                action="continue",
-                confidence=0.5,
-                reasoning="Fallback classification due to LLM error"
-            )
-    
-    except Exception as e:
-        print(f"Error in LLM classification: {e}")
-        # Fallback
-        return BlockClassification(
-            action="continue",
-            confidence=0.5,
-            reasoning="Fallback classification due to LLM error"
-        )
+    return BlockClassification(
+        action=action,
+        confidence=float(response_json.get("confidence", 0.5)),
+        reasoning=response_json.get("reasoning", ""),
+        new_block_title=response_json.get("new_block_title"),
+        new_block_intent=response_json.get("new_block_intent"),
+        new_blocks=new_blocks
+    )
+
+
+def _fallback_classification(error: Exception) -> BlockClassification:
+    print(f"Error in LLM classification: {error}")
+    return BlockClassification(
+        action="continue",
+        confidence=0.5,
+        reasoning="Fallback classification due to LLM error"
+    )
+
+
 def _parse_new_blocks(response_json: dict) -> list[dict]:
     new_blocks = []
     for item in response_json.get("new_blocks", []) or []:
@@ -0,0 +1,165 @@
+"""
+Semantic search over all graphs.
+Ranks blocks (by intent embedding) and user messages (by the embedding
+stored for their turn) against a query embedding. Both live in vector
+indexes that are kept per mindmap and synced incrementally, so a query
+costs one embedding plus two index lookups however long the history is.
+
+Messages without an embedding are skipped until the backfill (backfill.py)
+embeds them.
+"""
+
+from dataclasses import dataclass, asdict
+from threading import RLock
+from typing import Any, Dict, List, Optional, Set, Tuple
+from models import Mindmap
+from .vector_index import BlockVectorIndex, create_block_index, shared_block_index
+
+
+@dataclass
+class SearchResult:
+    """One ranked hit; graph_id/block_id locate it in the mindmap."""
+    kind: str  # "block" | "message"
+    graph_id: str
+    block_id: str
+    score: float
+    title: str  # Block title
+    text: str  # Block intent or message content
+    message_id: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class MessageIndex:
+    """Vector index over user-message embeddings, synced per graph from the message IDs."""
+
+    def __init__(self, index: Optional[BlockVectorIndex] = None):
+        """
+        Args:
+            index: Row storage (uses create_block_index() if None)
+        """
+        self._lock = RLock()
+        self.index = index or create_block_index()
+        self._seen: Dict[str, Set[str]] = {}  # graph_id -> every message id looked at
+        self._pending: Dict[str, Set[str]] = {}  # graph_id -> user messages still missing an embedding
+        self._revisions: Dict[str, int] = {}  # graph_id -> ConversationGraph.revision last synced
+
+    def sync(self, mindmap: Mindmap) -> None:
+        """
+        Index messages added (or embedded) since the last sync. A graph whose
+        revision is unchanged is skipped. Otherwise messages are append-only
+        apart from deletions and backfilled embeddings, so only the message IDs
+        are compared (not counts: deleting a block and adding as many messages
+        keeps the count) before the pending ones are checked.
+
+        Args:
+            mindmap: Current mindmap
+        """
+        with self._lock:
+            for graph_id in [gid for gid in self._seen if gid not in mindmap.graphs]:
+                self.index.remove_graph(graph_id)
+                del self._seen[graph_id]
+                del self._pending[graph_id]
+                self._revisions.pop(graph_id, None)
+
+            for graph_id, graph in mindmap.graphs.items():
+                if self._revisions.get(graph_id) == graph.revision:
+                    continue
+                self._revisions[graph_id] = graph.revision
+                seen = self._seen.setdefault(graph_id, set())
+                pending = self._pending.setdefault(graph_id, set())
+                if graph.messages.keys() != seen:
+                    current = set(graph.messages)
+                    removed = seen - current
+                    if removed:
+                        self.index.remove_blocks(list(removed))
+                        seen -= removed
+                        pending -= removed
+                    added = current - seen
+                    seen |= added
+                    pending |= added
+                for message_id in list(pending):
+                    data = graph.message_data(message_id, resolve_embedding=False)
+                    if data.get("role") != "user" or not data.get("content"):
+                        pending.discard(message_id)
+                    elif data.get("embedding") or data.get("embedding_ref"):
+                        embedding = graph.message_data(message_id)["embedding"]
+                        self.index.add_vector(graph_id, message_id, embedding)
+                        pending.discard(message_id)
+
+    def search(self, query: List[float], k: int) -> List[Tuple[str, str, float]]:
+        """Up to k (graph_id, message_id, similarity) tuples, best first."""
+        return self.index.search(query, k)
+
+
+class SemanticSearch:
+    """Blocks and messages of a mindmap, searchable by one query embedding."""
+
+    def __init__(self, block_index: BlockVectorIndex, message_index: Optional[MessageIndex] = None):
+        """
+        Args:
+            block_index: Block index (normally the one shared with tangent matching)
+            message_index: Message index (new, empty one if None)
+        """
+        self.blocks = block_index
+        self.messages = message_index or MessageIndex()
+
+    def search(self, mindmap: Mindmap, query: List[float], k: int = 10) -> List[SearchResult]:
+        """
+        Best-matching blocks and messages across every graph.
+
+        Args:
+            mindmap: Current mindmap (indexes are synced to it first)
+            query: Query embedding
+            k: Number of results
+
+        Returns:
+            Up to k results, best first
+        """
+        self.blocks.sync(mindmap)
+        self.messages.sync(mindmap)
+        results = []
+        # The indexes are shared per mindmap_id, so another request may have
+        # synced them to a newer copy than this one: skip rows it lacks
+        for graph_id, block_id, score in self.blocks.search(query, k):
+            graph = mindmap.graphs.get(graph_id)
+            block = graph.blocks.get(block_id) if graph else None
+            if block is None:
+                continue
+            results.append(SearchResult("block", graph_id, block_id, score, block.title, block.intent))
+        for graph_id, message_id, score in self.messages.search(query, k):
+            graph = mindmap.graphs.get(graph_id)
+            if graph is None or message_id not in graph.messages:
+                continue
+            data = graph.message_data(message_id, resolve_embedding=False)
+            block = graph.blocks.get(data.get("block_id", ""))
+            results.append(SearchResult(
+                "message", graph_id, data.get("block_id", ""), score,
+                block.title if block else "", data.get("content", ""), message_id,
+            ))
+        results.sort(key=lambda result: result.score, reverse=True)
+        return results[:k]
+
+
+# One message index per mindmap per process, like shared_block_index
+_shared_message_indexes: Dict[str, MessageIndex] = {}
+_shared_lock = RLock()
+
+
+def shared_search_index(mindmap: Mindmap) -> SemanticSearch:
+    """
+    Process-wide search for a mindmap, sharing the block index used for
+    tangent matching.
+
+    Args:
+        mindmap: Mindmap to search
+
+    Returns:
+        SemanticSearch whose indexes persist across calls with the same mindmap_id
+    """
+    with _shared_lock:
+        messages = _shared_message_indexes.get(mindmap.mindmap_id)
+        if messages is None:
+            messages = _shared_message_indexes[mindmap.mindmap_id] = MessageIndex()
+    return SemanticSearch(shared_block_index(mindmap), messages)
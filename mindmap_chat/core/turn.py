@@ -0,0 +1,41 @@
+"""
+Per-turn state shared by the steps of one chat turn.
+Lets intent detection, cross-graph matching and message storage reuse a
+single embedding of the user message instead of each embedding it again.
+"""
+
+from typing import List, Optional
+from llm.base import LLMClient
+from core.embeddings import embed_text
+
+
+class TurnContext:
+    """One user turn: the message text plus its lazily computed embedding."""
+
+    def __init__(self, llm_client: LLMClient, user_message: str):
+        """
+        Args:
+            llm_client: LLM client used for the embedding
+            user_message: The user's message for this turn
+        """
+        self.llm_client = llm_client
+        self.user_message = user_message
+        self._embedding: Optional[List[float]] = None
+
+    @property
+    def embedding(self) -> List[float]:
+        """Embedding of the user message (computed on first access, then reused)."""
+        if self._embedding is None:
+            self._embedding = embed_text(self.llm_client, self.user_message)
+        return self._embedding
+
+    async def aembed(self) -> List[float]:
+        """Compute the embedding without blocking the event loop (then reused by .embedding)."""
+        if self._embedding is None:
+            self._embedding = await self.llm_client.aembed(self.user_message)
+        return self._embedding
+
+    @property
+    def computed_embedding(self) -> List[float]:
+        """The embedding if some step already needed it, else [] (never calls the API)."""
+        return self._embedding or []
@@ -0,0 +1,609 @@
+"""
+Vectorized block similarity index.
+Keeps L2-normalized block embeddings in one matrix so a query is a single
+matrix-vector product plus top-k, instead of a Python loop over every block
+of every graph. Rows are stored compressed (see core.compression) when
+config.embeddings asks for float16/int8 or a reduced dimension.
+
+IVFBlockIndex is an approximate variant for very large mindmaps: rows are
+bucketed by k-means cluster and a query only scores the closest clusters.
+GraphRoutedIndex routes in two stages instead: graphs are ranked by the
+centroid of their blocks and only the blocks of the best graphs are scored.
+"""
+
+from threading import RLock
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from config import config
+from models import Block, Mindmap
+from .compression import EmbeddingCompressor
+
+# Rows decoded at a time when scoring compressed matrices
+_DECODE_CHUNK = 16384
+
+
+class BlockVectorIndex:
+    """Exact cosine-similarity index over block embeddings, updated incrementally."""
+
+    def __init__(self, initial_capacity: int = 256, compressor: Optional[EmbeddingCompressor] = None):
+        """
+        Initialize an empty index (the dimension is fixed by the first vector added).
+
+        Args:
+            initial_capacity: Rows allocated up front; the matrix doubles when full
+            compressor: How rows are stored (None = full float32)
+        """
+        self._lock = RLock()
+        self._initial_capacity = initial_capacity
+        self.compressor = compressor or EmbeddingCompressor()
+        self._input_dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None  # (capacity, stored dim) codes, first _count rows live
+        self._scales: Optional[np.ndarray] = None  # (capacity,) float32 per-row scale (int8 only)
+        self._fitted_count = 0  # Rows when the PCA basis was last fitted
+        self._count = 0
+        self._block_ids: List[str] = []  # row -> block_id
+        self._graph_ids: List[str] = []  # row -> graph_id
+        self._rows: Dict[str, int] = {}  # block_id -> row
+        self._sources: Dict[str, List[float]] = {}  # block_id -> embedding list last indexed
+        self._by_graph: Dict[str, Set[str]] = {}  # graph_id -> block_ids of its rows
+        self._synced: Dict[str, int] = {}  # graph_id -> revision last synced
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Dimension of the embeddings added (before any reduction)."""
+        return self._input_dim
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the live rows of the matrix."""
+        if self._matrix is None:
+            return 0
+        per_row = self._matrix.shape[1] * self._matrix.itemsize
+        if self.compressor.precision == "int8":
+            per_row += self._scales.itemsize
+        return self._count * per_row
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, block_id: object) -> bool:
+        return block_id in self._rows
+
+    @classmethod
+    def from_mindmap(cls, mindmap: Mindmap) -> "BlockVectorIndex":
+        """Build an index over every embedded block of a mindmap."""
+        index = cls()
+        index.sync(mindmap)
+        return index
+
+    def add(self, graph_id: str, block: Block) -> None:
+        """
+        Insert or update one block. Blocks without an intent or embedding are removed.
+
+        Args:
+            graph_id: Graph containing the block
+            block: Block to index
+        """
+        with self._lock:
+            if not block.intent:
+                self.remove(block.block_id)
+                return
+            self.add_vector(graph_id, block.block_id, block.embedding)
+
+    def add_vector(self, graph_id: str, item_id: str, embedding: List[float]) -> None:
+        """
+        Insert or update one row by id, for rows that are not blocks (e.g.
+        messages). An empty embedding removes the row.
+
+        Args:
+            graph_id: Graph containing the item
+            item_id: Row key (returned in place of a block_id by search)
+            embedding: Embedding list (replaced, never mutated, by callers)
+        """
+        with self._lock:
+            if not embedding:
+                self.remove(item_id)
+                return
+            if self._matrix is None:
+                self._input_dim = len(embedding)
+                self._allocate(self._initial_capacity)
+            elif len(embedding) != self._input_dim:
+                # Embedded with a different model/dimension: not comparable
+                self.remove(item_id)
+                return
+            codes, scales = self.compressor.encode(np.asarray([embedding], dtype=np.float32))
+
+            row = self._rows.get(item_id)
+            if row is None:
+                if self._count == len(self._matrix):
+                    matrix, old_scales = self._matrix, self._scales
+                    self._allocate(2 * len(matrix))
+                    self._matrix[:self._count] = matrix[:self._count]
+                    self._scales[:self._count] = old_scales[:self._count]
+                    self._grown(len(self._matrix))
+                row = self._count
+                self._count += 1
+                self._block_ids.append(item_id)
+                self._graph_ids.append(graph_id)
+                self._rows[item_id] = row
+            else:
+                self._released(row)
+                self._discard(self._graph_ids[row], item_id)
+                self._graph_ids[row] = graph_id
+            self._by_graph.setdefault(graph_id, set()).add(item_id)
+            self._synced.pop(graph_id, None)  # Changed outside sync(): re-read on the next one
+            self._matrix[row] = codes[0]
+            self._scales[row] = scales[0]
+            self._sources[item_id] = embedding
+            self._written(row)
+
+    def remove(self, block_id: str) -> None:
+        """Drop one block (the last row is moved into its slot)."""
+        with self._lock:
+            row = self._rows.pop(block_id, None)
+            if row is None:
+                return
+            self._released(row)
+            self._sources.pop(block_id, None)
+            self._discard(self._graph_ids[row], block_id)
+            last = self._count - 1
+            if row != last:
+                moved_id = self._block_ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._scales[row] = self._scales[last]
+                self._block_ids[row] = moved_id
+                self._graph_ids[row] = self._graph_ids[last]
+                self._rows[moved_id] = row
+                self._moved(last, row)
+            self._block_ids.pop()
+            self._graph_ids.pop()
+            self._count = last
+
+    def remove_blocks(self, block_ids: List[str]) -> None:
+        """Drop several blocks."""
+        with self._lock:
+            for block_id in block_ids:
+                self.remove(block_id)
+
+    def remove_graph(self, graph_id: str) -> None:
+        """Drop every block of a graph."""
+        with self._lock:
+            self._synced.pop(graph_id, None)
+            self.remove_blocks(list(self._by_graph.get(graph_id, ())))
+
+    def _discard(self, graph_id: str, block_id: str) -> None:
+        """Forget the row of block_id in graph_id (the graph is re-read on the next sync)."""
+        self._synced.pop(graph_id, None)
+        blocks = self._by_graph.get(graph_id)
+        if blocks is not None:
+            blocks.discard(block_id)
+            if not blocks:
+                del self._by_graph[graph_id]
+
+    def _graph_of(self, block_id: str) -> Optional[str]:
+        row = self._rows.get(block_id)
+        return self._graph_ids[row] if row is not None else None
+
+    def sync(self, mindmap: Mindmap) -> List[Tuple[str, Block]]:
+        """
+        Bring the index in line with a mindmap. Graphs whose revision is the
+        one last synced (see ConversationGraph.revision) are skipped without
+        reading their blocks. In the others, only blocks that were added,
+        removed or re-embedded are re-encoded: embeddings are replaced, never
+        mutated, so they are compared by identity, and by value only when a
+        reload produced a new list. Rows of a graph that this sync did not
+        index (added with add() for a turn that was never saved, or synced
+        from another copy of the mindmap) are dropped.
+
+        Args:
+            mindmap: Current mindmap
+
+        Returns:
+            (graph_id, block) pairs of the re-read graphs that have an intent but no embedding yet
+        """
+        with self._lock:
+            for graph_id in [gid for gid in {*self._synced, *self._by_graph} if gid not in mindmap.graphs]:
+                self.remove_graph(graph_id)
+
+            missing = []
+            for graph_id, graph in mindmap.graphs.items():
+                if self._synced.get(graph_id) == graph.revision:
+                    continue
+                indexed = set()
+                for block_id, block in graph.blocks.items():
+                    if block.intent and not block.embedding:
+                        missing.append((graph_id, block))
+                    if not (block.intent and block.embedding):
+                        self.remove(block_id)
+                        continue
+                    indexed.add(block_id)
+                    source = self._sources.get(block_id)
+                    if source is block.embedding and self._graph_of(block_id) == graph_id:
+                        continue
+                    if source == block.embedding and self._graph_of(block_id) == graph_id:
+                        self._sources[block_id] = block.embedding  # Same vector, reloaded
+                    else:
+                        self.add(graph_id, block)
+                self.remove_blocks(list(self._by_graph.get(graph_id, set()) - indexed))
+                self._synced[graph_id] = graph.revision
+            return missing
+
+    def search(self, query: List[float], k: int = 1) -> List[Tuple[str, str, float]]:
+        """
+        Most similar blocks to a query embedding.
+
+        Args:
+            query: Query embedding (any norm)
+            k: Number of results
+
+        Returns:
+            Up to k (graph_id, block_id, cosine similarity) tuples, best first
+        """
+        with self._lock:
+            if not self._count or not query or len(query) != self.dim:
+                return []
+            if self.compressor.needs_fit or (
+                self.compressor.components is not None and self._count >= 2 * self._fitted_count
+            ):
+                self._fit_compressor()
+            vector = self.compressor.reduce(np.asarray([query], dtype=np.float32))[0]
+            if not vector.any():
+                return []
+            rows = self._candidates(vector)
+            scores = self._scores(vector, rows)
+            k = min(k, len(scores))
+            if not k:
+                return []
+            if k < len(scores):
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+            else:
+                top = np.argsort(-scores)
+            if rows is not None:
+                return [(self._graph_ids[rows[i]], self._block_ids[rows[i]], float(scores[i])) for i in top]
+            return [(self._graph_ids[i], self._block_ids[i], float(scores[i])) for i in top]
+
+    def _allocate(self, capacity: int) -> None:
+        dim = self.compressor.output_dim(self._input_dim)
+        self._matrix = np.zeros((capacity, dim), dtype=self.compressor.dtype)
+        self._scales = np.ones(capacity, dtype=np.float32)
+
+    def _decode(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """float32 copies of the given rows (None = all live rows)."""
+        if rows is None:
+            return self.compressor.decode(self._matrix[:self._count], self._scales[:self._count])
+        return self.compressor.decode(self._matrix[rows], self._scales[rows])
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Similarity of a reduced query to the given rows (None = all live rows)."""
+        if self.compressor.precision == "float32":
+            return (self._matrix[:self._count] if rows is None else self._matrix[rows]) @ query
+        # No BLAS for float16/int8: decode in chunks so the float32 copy stays small
+        count = self._count if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _DECODE_CHUNK):
+            chunk = np.arange(start, min(start + _DECODE_CHUNK, count)) if rows is None \
+                else rows[start:start + _DECODE_CHUNK]
+            scores[start:start + len(chunk)] = self._decode(chunk) @ query
+        return scores
+
+    def _fit_compressor(self, max_samples: int = 20000) -> None:
+        """(Re)fit the PCA basis on the indexed embeddings and re-encode every row."""
+        if self._count < 2 * self.compressor.dim:
+            return  # Too few blocks for a meaningful basis: keep full dimensions
+        sample = self._block_ids
+        if self._count > max_samples:
+            picks = np.random.default_rng(0).choice(self._count, max_samples, replace=False)
+            sample = [self._block_ids[i] for i in picks]
+        vectors = np.asarray([self._sources[block_id] for block_id in sample], dtype=np.float32)
+        self.compressor = self.compressor.fit(vectors)
+        self._fitted_count = self._count
+        matrix_rows = len(self._matrix)
+        self._allocate(matrix_rows)
+        for start in range(0, self._count, _DECODE_CHUNK):
+            block_ids = self._block_ids[start:start + _DECODE_CHUNK]
+            codes, scales = self.compressor.encode(
+                np.asarray([self._sources[block_id] for block_id in block_ids], dtype=np.float32)
+            )
+            self._matrix[start:start + len(block_ids)] = codes
+            self._scales[start:start + len(block_ids)] = scales
+        self._reencoded()
+
+    # Hooks for subclasses that keep per-row state alongside the matrix
+
+    def _grown(self, capacity: int) -> None:
+        """The matrix was reallocated with this many rows."""
+        pass
+
+    def _written(self, row: int) -> None:
+        """A row received a new vector."""
+        pass
+
+    def _released(self, row: int) -> None:
+        """The vector in row is about to be overwritten or removed."""
+        pass
+
+    def _moved(self, source: int, target: int) -> None:
+        """The vector in row source was moved into row target."""
+        pass
+
+    def _reencoded(self) -> None:
+        """Every row was re-encoded with a new compressor (e.g. a refitted PCA basis)."""
+        pass
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows worth scoring for a normalized query (None = all rows)."""
+        return None
+
+
+class IVFBlockIndex(BlockVectorIndex):
+    """
+    Approximate index (inverted file). Rows are assigned to the nearest of
+    ~sqrt(n) k-means centroids and a query only scores the rows of the
+    nprobe closest centroids, trading a little recall for a scan of a small
+    fraction of the matrix.
+
+    Centroids are trained lazily on the first search once the index holds
+    min_train_size blocks, and retrained whenever it has doubled since. Below
+    that size, or before training, search is exact.
+    """
+
+    def __init__(self, nprobe: int = 8, min_train_size: int = 2048, initial_capacity: int = 256,
+                 seed: int = 0, compressor: Optional[EmbeddingCompressor] = None):
+        """
+        Args:
+            nprobe: Clusters scanned per query (higher = better recall, slower)
+            min_train_size: Blocks needed before clustering kicks in
+            initial_capacity: Rows allocated up front
+            seed: RNG seed for k-means initialization
+            compressor: How rows are stored (None = full float32)
+        """
+        super().__init__(initial_capacity, compressor)
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._seed = seed
+        self._centroids: Optional[np.ndarray] = None  # (nlist, dim) float32, normalized
+        self._assignments = np.full(initial_capacity, -1, dtype=np.int32)  # row -> cluster
+        self._trained_count = 0
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, iterations: int = 10, sample_size: int = 64) -> None:
+        """
+        (Re)cluster the current rows with spherical k-means and reassign all rows.
+
+        Args:
+            iterations: k-means iterations
+            sample_size: Training rows per centroid (the rest are only assigned)
+        """
+        with self._lock:
+            if not self._count:
+                return
+            nlist = max(1, int(np.sqrt(self._count)))
+            rng = np.random.default_rng(self._seed)
+            if self._count > nlist * sample_size:
+                sample = self._decode(rng.choice(self._count, nlist * sample_size, replace=False))
+            else:
+                sample = self._decode()
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty clusters keep their previous centroid
+                filled = norms[:, 0] > 0
+                centroids[filled] = sums[filled] / norms[filled]
+            self._centroids = centroids
+            self._assignments[:self._count] = self._assign()
+            self._trained_count = self._count
+
+    def _assign(self) -> np.ndarray:
+        # Chunked so assigning 100k+ rows does not build one huge score matrix
+        out = np.empty(self._count, dtype=np.int32)
+        for start in range(0, self._count, 8192):
+            chunk = self._decode(np.arange(start, min(start + 8192, self._count)))
+            out[start:start + len(chunk)] = np.argmax(chunk @ self._centroids.T, axis=1)
+        return out
+
+    def _grown(self, capacity: int) -> None:
+        grown = np.full(capacity, -1, dtype=np.int32)
+        grown[:len(self._assignments)] = self._assignments
+        self._assignments = grown
+
+    def _written(self, row: int) -> None:
+        if self._centroids is not None:
+            self._assignments[row] = int(np.argmax(self._centroids @ self._decode(np.array([row]))[0]))
+
+    def _reencoded(self) -> None:
+        # Centroids live in the old coordinates: retrain on the next search
+        self._centroids = None
+
+    def _moved(self, source: int, target: int) -> None:
+        self._assignments[target] = self._assignments[source]
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self._count < self.min_train_size:
+            return None
+        if self._centroids is None or self._count >= 2 * self._trained_count:
+            self.train()
+        if self.nprobe >= len(self._centroids):
+            return None
+        probes = np.argpartition(-(self._centroids @ query), self.nprobe - 1)[:self.nprobe]
+        selected = np.zeros(len(self._centroids), dtype=bool)
+        selected[probes] = True
+        return np.flatnonzero(selected[self._assignments[:self._count]])
+
+
+class GraphRoutedIndex(BlockVectorIndex):
+    """
+    Two-stage index for mindmaps with many graphs. Every graph keeps the
+    running sum of its block vectors (updated on each add/remove, so its
+    centroid is always current); a query ranks graphs by centroid
+    similarity and only scores the blocks of the top_graphs best ones.
+
+    With top_graphs or fewer graphs, search is exact.
+    """
+
+    def __init__(self, top_graphs: int = 4, initial_capacity: int = 256,
+                 compressor: Optional[EmbeddingCompressor] = None):
+        """
+        Args:
+            top_graphs: Graphs whose blocks are scored per query (higher = better recall, slower)
+            initial_capacity: Rows allocated up front
+            compressor: How rows are stored (None = full float32)
+        """
+        super().__init__(initial_capacity, compressor)
+        self.top_graphs = top_graphs
+        self._slots: Dict[str, int] = {}  # graph_id -> centroid slot
+        self._free_slots: List[int] = []
+        self._sums: Optional[np.ndarray] = None  # (slots, stored dim) float64 sum of the graph's rows
+        self._centroids: Optional[np.ndarray] = None  # (slots, stored dim) float32 normalized sums
+        self._dirty: Set[int] = set()  # Slots whose centroid is stale
+        self._sizes = np.zeros(0, dtype=np.int64)  # slot -> rows in the graph
+        self._row_slots = np.full(initial_capacity, -1, dtype=np.int32)  # row -> slot
+
+    @property
+    def graph_count(self) -> int:
+        return len(self._slots)
+
+    def graph_centroid(self, graph_id: str) -> Optional[np.ndarray]:
+        """Normalized centroid of a graph's indexed blocks (in stored coordinates), or None."""
+        with self._lock:
+            slot = self._slots.get(graph_id)
+            if slot is None:
+                return None
+            self._refresh_centroids()
+            return self._centroids[slot].copy()
+
+    def _refresh_centroids(self) -> None:
+        """Renormalize the centroids of graphs changed since the last query."""
+        if not self._dirty:
+            return
+        slots = np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty))
+        sums = self._sums[slots]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        self._centroids[slots] = sums / np.where(norms > 0, norms, 1.0)
+        self._dirty.clear()
+
+    def _slot(self, graph_id: str) -> int:
+        slot = self._slots.get(graph_id)
+        if slot is not None:
+            return slot
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._slots)
+            if self._sums is None or slot == len(self._sums):
+                capacity = max(16, 2 * slot)
+                sums = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float64)
+                centroids = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+                sizes = np.zeros(capacity, dtype=np.int64)
+                if self._sums is not None:
+                    sums[:slot] = self._sums[:slot]
+                    centroids[:slot] = self._centroids[:slot]
+                    sizes[:slot] = self._sizes[:slot]
+                self._sums, self._centroids, self._sizes = sums, centroids, sizes
+        self._slots[graph_id] = slot
+        return slot
+
+    def _grown(self, capacity: int) -> None:
+        grown = np.full(capacity, -1, dtype=np.int32)
+        grown[:len(self._row_slots)] = self._row_slots
+        self._row_slots = grown
+
+    def _written(self, row: int) -> None:
+        slot = self._slot(self._graph_ids[row])
+        self._sums[slot] += self._decode(np.array([row]))[0]
+        self._sizes[slot] += 1
+        self._row_slots[row] = slot
+        self._dirty.add(slot)
+
+    def _released(self, row: int) -> None:
+        slot = int(self._row_slots[row])
+        if slot < 0:
+            return
+        self._row_slots[row] = -1
+        self._sizes[slot] -= 1
+        self._dirty.add(slot)
+        if self._sizes[slot]:
+            self._sums[slot] -= self._decode(np.array([row]))[0]
+        else:
+            # Last block of the graph: free the slot (also clears rounding residue)
+            self._sums[slot] = 0.0
+            del self._slots[self._graph_ids[row]]
+            self._free_slots.append(slot)
+
+    def _moved(self, source: int, target: int) -> None:
+        self._row_slots[target] = self._row_slots[source]
+
+    def _reencoded(self) -> None:
+        # Stored coordinates changed (e.g. a refitted PCA basis): re-sum every graph
+        self._slots, self._free_slots, self._sums, self._centroids = {}, [], None, None
+        self._dirty.clear()
+        self._sizes = np.zeros(0, dtype=np.int64)
+        self._row_slots[:] = -1
+        for row in range(self._count):
+            self._written(row)
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if len(self._slots) <= self.top_graphs:
+            return None
+        self._refresh_centroids()
+        scores = self._centroids @ query
+        scores[self._sizes == 0] = -np.inf  # Free slots
+        top = np.argpartition(-scores, self.top_graphs - 1)[:self.top_graphs]
+        selected = np.zeros(len(scores), dtype=bool)
+        selected[top] = True
+        return np.flatnonzero(selected[self._row_slots[:self._count]])
+
+
+def create_block_index(kind: Optional[str] = None) -> BlockVectorIndex:
+    """
+    Create an empty block index of the kind selected in config.
+
+    Args:
+        kind: "exact", "ivf" or "graph" (uses config.search.index if None)
+
+    Returns:
+        BlockVectorIndex, IVFBlockIndex or GraphRoutedIndex
+    """
+    kind = (kind or config.search.index).lower()
+    compressor = EmbeddingCompressor.from_config()
+    if kind == "exact":
+        return BlockVectorIndex(compressor=compressor)
+    if kind == "ivf":
+        return IVFBlockIndex(
+            nprobe=config.search.ivf_nprobe,
+            min_train_size=config.search.ivf_min_train_size,
+            compressor=compressor,
+        )
+    if kind == "graph":
+        return GraphRoutedIndex(top_graphs=config.search.graph_top_k, compressor=compressor)
+    raise ValueError(f"Unknown search index: {kind}")
+
+
+# One index per mindmap per process, so per-request ConversationManagers
+# only pay for an incremental sync instead of a rebuild.
+_shared_indexes: Dict[str, BlockVectorIndex] = {}
+_shared_lock = RLock()
+
+
+def shared_block_index(mindmap: Mindmap) -> BlockVectorIndex:
+    """
+    Process-wide index for a mindmap. Call sync() before searching, since the
+    mindmap may have been changed elsewhere (another request or process).
+
+    Args:
+        mindmap: Mindmap to index
+
+    Returns:
+        Index (kind per config.search.index) shared by every caller with the same mindmap_id
+    """
+    with _shared_lock:
+        index = _shared_indexes.get(mindmap.mindmap_id)
+        if index is None:
+            index = _shared_indexes[mindmap.mindmap_id] = create_block_index()
+        return index
@@ -2,6 +2,13 @@
 
 from .base import LLMClient
 from .gemini import GeminiClient
+from .embedding_cache import EmbeddingCache, default_embedding_cache
+from .response_cache import ResponseCache, default_response_cache
+from .local import LocalEmbeddingClient, with_configured_embeddings
+from .scheduler import LLMScheduler, ScheduledLLMClient, call_priority, with_scheduler
 from . import prompts
 
-__all__ = ["LLMClient", "GeminiClient", "prompts"]
+__all__ = ["LLMClient", "GeminiClient", "EmbeddingCache", "default_embedding_cache",
+           "ResponseCache", "default_response_cache",
+           "LocalEmbeddingClient", "with_configured_embeddings",
+           "LLMScheduler", "ScheduledLLMClient", "call_priority", "with_scheduler", "prompts"]
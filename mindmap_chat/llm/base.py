@@ -1,16 +1,36 @@
 """
 Abstract base class for LLM clients.
 Allows easy swapping of different LLM providers.
+
+Every method has an async twin (acall, acall_json, aembed, aembed_many) for
+the FastAPI routes. By default they run the sync method in a worker thread;
+providers with an async SDK/HTTP client override acall/_aembed/_aembed_many.
+stream()/astream() yield the answer in chunks as it is generated (by
+default as a single chunk). call_json()/acall_json() of a prompt family
+(see response_cache.py) reuse cached responses to identical prompts.
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
 import json
+from .embedding_cache import EmbeddingCache, default_embedding_cache
+from .response_cache import ResponseCache, default_response_cache
 
 
 class LLMClient(ABC):
     """Abstract base class for LLM clients."""
 
+    # Name of the generation model; part of the response cache key
+    model_name: str = ""
+    # Name of the embedding model; part of the embedding cache key
+    embedding_model: str = ""
+    # Per-client cache overrides (None = the process-wide caches from config)
+    embedding_cache: Optional[EmbeddingCache] = None
+    response_cache: Optional[ResponseCache] = None
+    # Most texts sent to the provider in one batch embedding request
+    max_embed_batch: int = 100
+
     @abstractmethod
     def call(self, prompt: str, json_mode: bool = False) -> str:
         """
@@ -26,9 +46,9 @@ class LLMClient(ABC):
         pass
 
     @abstractmethod
-    def embed(self, text: str) -> list[float]:
+    def _embed(self, text: str) -> list[float]:
         """
-        Generate an embedding for text.
+        Generate an embedding for text with the provider (uncached).
         
         Args:
             text: Text to embed
@@ -38,33 +58,223 @@ class LLMClient(ABC):
         """
         pass
 
-    def call_json(self, prompt: str) -> Dict[str, Any]:
+    def embed(self, text: str) -> list[float]:
+        """
+        Generate an embedding for text, served from the embedding cache when
+        this model has embedded the same text before.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector (may be shared with other callers; do not mutate)
+        """
+        cache = self._cache()
+        if cache is None:
+            return self._embed(text)
+        return cache.get_or_compute(self.embedding_model or type(self).__name__, text, self._embed)
+
+    def _embed_many(self, texts: List[str]) -> List[list[float]]:
+        """
+        Generate embeddings for several texts with the provider (uncached).
+        Falls back to one _embed call per text; providers with a batch
+        endpoint override this.
+        
+        Args:
+            texts: Texts to embed (at most max_embed_batch)
+            
+        Returns:
+            One embedding per text, in order
+        """
+        return [self._embed(text) for text in texts]
+
+    def embed_many(self, texts: Sequence[str]) -> List[list[float]]:
+        """
+        Generate embeddings for several texts. Cached texts are skipped and the
+        rest are sent in batches of max_embed_batch (one round trip each).
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text, in order
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        cache = self._cache()
+        if cache is None:
+            return self._embed_batched(texts)
+        return cache.get_or_compute_many(self.embedding_model or type(self).__name__, texts, self._embed_batched)
+
+    def _embed_batched(self, texts: List[str]) -> List[list[float]]:
+        vectors: List[list[float]] = []
+        for start in range(0, len(texts), self.max_embed_batch):
+            vectors.extend(self._embed_many(texts[start:start + self.max_embed_batch]))
+        return vectors
+
+    def _cache(self) -> Optional[EmbeddingCache]:
+        return self.embedding_cache if self.embedding_cache is not None else default_embedding_cache()
+
+    async def acall(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Async call(). Runs call() in a worker thread unless the provider
+        overrides it with a native async request.
+        
+        Args:
+            prompt: The prompt to send
+            json_mode: If True, expect JSON-formatted response
+            
+        Returns:
+            The LLM's response as a string
+        """
+        return await asyncio.to_thread(self.call, prompt, json_mode)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Call the LLM and yield the response text in chunks as it arrives.
+        Providers without a streaming API yield the whole call() result.
+        
+        Args:
+            prompt: The prompt to send
+            
+        Yields:
+            Consecutive pieces of the response
+        """
+        yield self.call(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async stream() (the whole acall() result unless overridden)."""
+        yield await self.acall(prompt)
+
+    async def _aembed(self, text: str) -> list[float]:
+        """Async _embed() (worker thread unless overridden)."""
+        return await asyncio.to_thread(self._embed, text)
+
+    async def _aembed_many(self, texts: List[str]) -> List[list[float]]:
+        """Async _embed_many() (worker thread unless overridden)."""
+        return await asyncio.to_thread(self._embed_many, texts)
+
+    async def aembed(self, text: str) -> list[float]:
+        """
+        Async embed(), using the same embedding cache.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector (may be shared with other callers; do not mutate)
+        """
+        cache = self._cache()
+        if cache is None:
+            return await self._aembed(text)
+        model = self.embedding_model or type(self).__name__
+        # The cache's disk tier is SQLite: keep its reads and writes off the event loop
+        vector = await asyncio.to_thread(cache.get, model, text)
+        if vector is None:
+            vector = await self._aembed(text)
+            await asyncio.to_thread(cache.put, model, text, vector)
+        return vector
+
+    async def aembed_many(self, texts: Sequence[str]) -> List[list[float]]:
+        """
+        Async embed_many(): cached texts are skipped, the rest are sent in
+        batches of max_embed_batch.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text, in order
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        cache = self._cache()
+        model = self.embedding_model or type(self).__name__
+        vectors: List[Optional[list[float]]] = [None] * len(texts)
+        if cache is not None:
+            vectors = await asyncio.to_thread(lambda: [cache.get(model, text) for text in texts])
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        computed: Dict[str, list[float]] = {}
+        for start in range(0, len(missing), self.max_embed_batch):
+            batch = missing[start:start + self.max_embed_batch]
+            computed.update(zip(batch, await self._aembed_many(batch)))
+        if cache is not None and computed:
+            await asyncio.to_thread(lambda: [cache.put(model, text, vector) for text, vector in computed.items()])
+        return [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+
+    def call_json(self, prompt: str, family: Optional[str] = None) -> Dict[str, Any]:
         """
         Call the LLM and parse response as JSON.
         
         Args:
             prompt: The prompt
+            family: Prompt family ("intent", "classify", "summary"); a
+                response to the same prompt is then served from the response
+                cache if that family is cached (None = always call)
             
         Returns:
             Parsed JSON as dict
         """
+        cache, model = self._response_cache(family)
+        response = cache.get(model, family, prompt) if cache else None
+        if response is not None:
+            return _parse_json_response(response)
         response = self.call(prompt, json_mode=True)
-        try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            extracted = _extract_json_payload(response)
-            if extracted is not None:
-                try:
-                    return json.loads(extracted)
-                except json.JSONDecodeError:
-                    repaired = _repair_json_payload(extracted)
-                    if repaired is not None:
-                        return json.loads(repaired)
-            repaired = _repair_json_payload(response)
-            if repaired is not None:
-                return json.loads(repaired)
-            print(f"Failed to parse JSON response: {response}")
-            raise
+        parsed = _parse_json_response(response)
+        if cache is not None:
+            cache.put(model, family, prompt, response)
+        return parsed
+
+    async def acall_json(self, prompt: str, family: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async call_json(), using the same response cache.
+        
+        Args:
+            prompt: The prompt
+            family: Prompt family (see call_json)
+            
+        Returns:
+            Parsed JSON as dict
+        """
+        cache, model = self._response_cache(family)
+        response = cache.get(model, family, prompt) if cache else None
+        if response is not None:
+            return _parse_json_response(response)
+        response = await self.acall(prompt, json_mode=True)
+        parsed = _parse_json_response(response)
+        if cache is not None:
+            cache.put(model, family, prompt, response)
+        return parsed
+
+    def _response_cache(self, family: Optional[str]) -> tuple[Optional[ResponseCache], str]:
+        """Cache for a prompt family (None if uncached) and this client's cache key."""
+        cache = self.response_cache if self.response_cache is not None else default_response_cache()
+        if cache is None or not cache.enabled(family):
+            return None, ""
+        return cache, self.model_name or type(self).__name__
+
+
+def _parse_json_response(response: str) -> Dict[str, Any]:
+    """Parse a JSON reply, extracting or repairing the object if needed (raises JSONDecodeError)."""
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        extracted = _extract_json_payload(response)
+        if extracted is not None:
+            try:
+                return json.loads(extracted)
+            except json.JSONDecodeError:
+                repaired = _repair_json_payload(extracted)
+                if repaired is not None:
+                    return json.loads(repaired)
+        repaired = _repair_json_payload(response)
+        if repaired is not None:
+            return json.loads(repaired)
+        print(f"Failed to parse JSON response: {response}")
+        raise
+
 
 def _extract_json_payload(response: str) -> Optional[str]:
     if not response:
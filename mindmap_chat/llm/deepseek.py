@@ -1,20 +1,41 @@
 """
 DeepSeek API client implementation.
 Uses DeepSeek for generation (answering) but Gemini for embeddings (cheap).
+
+Requests go through a connection pool shared by every DeepSeekClient
+(keep-alive, so only the first call pays the TCP/TLS handshake), with
+separate connect/read timeouts. Rate limits (429), server errors (5xx),
+connection errors and timeouts are retried with jittered exponential
+backoff, waiting for Retry-After when the server sends it.
 """
 
+import asyncio
+import random
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from threading import Lock
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Iterator, Mapping, Optional, Tuple
 
 try:
+    import google.generativeai as genai
+except ImportError:
+    # Fallback to new package if old one not available
     import google.genai as genai
+
+try:
+    import httpx  # Optional: native async requests (acall)
 except ImportError:
-    import google.generativeai as genai
+    httpx = None
 
 from .base import LLMClient
 from config import config
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
 class DeepSeekClient(LLMClient):
     """DeepSeek API client for generation, Gemini for embeddings."""
@@ -23,7 +44,7 @@ class DeepSeekClient(LLMClient):
         """Initialize DeepSeek client."""
         self.api_key = config.deepseek.api_key
         self.model_name = config.deepseek.model_name
-        self.base_url = "https://api.deepseek.com/chat/completions"
+        self.base_url = config.deepseek.base_url
         
         # Keep Gemini for cheap embeddings
         genai.configure(api_key=config.gemini.api_key)
@@ -40,6 +61,136 @@ class DeepSeekClient(LLMClient):
         Returns:
             The model's response
         """
+        headers, payload = self._request(prompt, json_mode)
+        try:
+            with self._post(headers, payload) as response:
+                data = response.json()
+            return data["choices"][0]["message"]["content"]
+        except Exception as e:
+            raise Exception(f"DeepSeek API error: {e}")
+
+    async def acall(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Call DeepSeek API without blocking the event loop (needs httpx;
+        falls back to call() in a worker thread).
+        
+        Args:
+            prompt: The prompt to send
+            json_mode: If True, request JSON response
+            
+        Returns:
+            The model's response
+        """
+        if httpx is None:
+            return await asyncio.to_thread(self.call, prompt, json_mode)
+        headers, payload = self._request(prompt, json_mode)
+        try:
+            response = await self._apost(headers, payload)
+            try:
+                await response.aread()
+                data = response.json()
+            finally:
+                await response.aclose()
+            return data["choices"][0]["message"]["content"]
+        except Exception as e:
+            raise Exception(f"DeepSeek API error: {e}")
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Call DeepSeek API with streaming and yield the answer as it is generated.
+        Only establishing the stream is retried; a stream that breaks after
+        the first chunk raises.
+        
+        Args:
+            prompt: The prompt to send
+            
+        Yields:
+            Text chunks of the response
+        """
+        headers, payload = self._request(prompt, False)
+        payload["stream"] = True
+        try:
+            with self._post(headers, payload, stream=True) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    text = _stream_delta(line)
+                    if text:
+                        yield text
+        except Exception as e:
+            raise Exception(f"DeepSeek API error: {e}")
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async stream() (needs httpx; otherwise yields the whole acall() result)."""
+        if httpx is None:
+            yield await self.acall(prompt)
+            return
+        headers, payload = self._request(prompt, False)
+        payload["stream"] = True
+        try:
+            response = await self._apost(headers, payload)
+            try:
+                async for line in response.aiter_lines():
+                    text = _stream_delta(line)
+                    if text:
+                        yield text
+            finally:
+                await response.aclose()
+        except Exception as e:
+            raise Exception(f"DeepSeek API error: {e}")
+
+    def _post(self, headers: Dict[str, str], payload: Dict[str, Any],
+              stream: bool = False) -> requests.Response:
+        """POST through the shared session, retrying transient failures (raises on the last one)."""
+        settings = config.deepseek
+        for attempt in range(settings.max_retries + 1):
+            try:
+                response = _session().post(
+                    self.base_url, json=payload, headers=headers, stream=stream,
+                    timeout=(settings.connect_timeout, settings.read_timeout),
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == settings.max_retries:
+                    raise
+                time.sleep(_retry_delay(attempt, {}))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == settings.max_retries:
+                if not response.ok:
+                    response.close()
+                    response.raise_for_status()
+                return response
+            delay = _retry_delay(attempt, response.headers)
+            response.close()
+            if delay is None:
+                response.raise_for_status()
+            print(f"[WARN] DeepSeek returned {response.status_code}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    async def _apost(self, headers: Dict[str, str], payload: Dict[str, Any]) -> "httpx.Response":
+        """Async _post(); returns an open response (read or stream it, then aclose())."""
+        settings = config.deepseek
+        client = _async_client()
+        request = client.build_request("POST", self.base_url, json=payload, headers=headers)
+        for attempt in range(settings.max_retries + 1):
+            try:
+                response = await client.send(request, stream=True)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError):
+                if attempt == settings.max_retries:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt, {}))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == settings.max_retries:
+                if response.is_error:
+                    await response.aclose()
+                    response.raise_for_status()
+                return response
+            delay = _retry_delay(attempt, response.headers)
+            await response.aclose()
+            if delay is None:
+                response.raise_for_status()
+            print(f"[WARN] DeepSeek returned {response.status_code}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _request(self, prompt: str, json_mode: bool) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Headers and JSON payload of a chat completion request."""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -57,16 +208,9 @@ class DeepSeekClient(LLMClient):
         
         # Remove None values
         payload = {k: v for k, v in payload.items() if v is not None}
-        
-        try:
-            response = requests.post(self.base_url, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
-        except Exception as e:
-            raise Exception(f"DeepSeek API error: {e}")
+        return headers, payload
 
-    def embed(self, text: str) -> list[float]:
+    def _embed(self, text: str) -> list[float]:
         """
         Generate embedding using Gemini (cheap, token-efficient).
         
@@ -81,3 +225,106 @@ class DeepSeekClient(LLMClient):
             content=text
         )
         return result["embedding"]
+
+    def _embed_many(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generate embeddings for several texts in one request.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text, in order
+        """
+        result = genai.embed_content(
+            model=self.embedding_model,
+            content=texts
+        )
+        return result["embedding"]
+
+    async def _aembed(self, text: str) -> list[float]:
+        result = await genai.embed_content_async(
+            model=self.embedding_model,
+            content=text
+        )
+        return result["embedding"]
+
+    async def _aembed_many(self, texts: list[str]) -> list[list[float]]:
+        result = await genai.embed_content_async(
+            model=self.embedding_model,
+            content=texts
+        )
+        return result["embedding"]
+
+
+def _stream_delta(line: str) -> Optional[str]:
+    """Text of one server-sent event line of a streamed completion (None for keep-alives/[DONE])."""
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    choices = json.loads(data).get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+
+# Connection pools shared by every DeepSeekClient: one requests session per
+# process, one httpx client per event loop (an AsyncClient is bound to its loop)
+_shared_session: Optional[requests.Session] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_pool_lock = Lock()
+
+
+def _session() -> requests.Session:
+    """Process-wide keep-alive session sized by config.deepseek.pool_size."""
+    global _shared_session
+    with _pool_lock:
+        if _shared_session is None:
+            session = requests.Session()
+            # Retries are done by DeepSeekClient._post (jitter, Retry-After)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.deepseek.pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _shared_session = session
+        return _shared_session
+
+
+def _async_client() -> "httpx.AsyncClient":
+    """Keep-alive httpx client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _pool_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            settings = config.deepseek
+            client = _async_clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout),
+                limits=httpx.Limits(max_connections=settings.pool_size, max_keepalive_connections=settings.pool_size),
+            )
+        return client
+
+
+def _retry_delay(attempt: int, headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds to wait before retry number attempt + 1: the server's Retry-After
+    if given (None if that exceeds backoff_max, i.e. give up), else a random
+    wait of up to backoff_base * 2**attempt ("full jitter").
+    """
+    settings = config.deepseek
+    retry_after = _parse_retry_after(headers.get("Retry-After"))
+    if retry_after is not None:
+        return retry_after if retry_after <= settings.backoff_max else None
+    return random.uniform(0, min(settings.backoff_max, settings.backoff_base * 2 ** attempt))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in seconds (delta-seconds or HTTP-date form), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
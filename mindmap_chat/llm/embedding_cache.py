@@ -0,0 +1,304 @@
+"""
+Content-addressed embedding cache.
+Embeddings are keyed by (embedding model, SHA-256 of the text), so the same
+intent or message is only sent to the provider once. Two tiers:
+
+    memory  per-process LRU of the most recent vectors
+    disk    SQLite table shared by processes and kept across restarts
+
+Both tiers are bounded; the disk tier evicts least-recently-used rows.
+"""
+
+import hashlib
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_hash(text: str) -> str:
+    """Stable hash of the text an embedding was computed from."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + SQLite) embedding cache with hit/miss counters."""
+
+    def __init__(self, file_path: Optional[str] = "./data/embedding_cache.db",
+                 memory_entries: int = 4096, disk_entries: int = 200_000):
+        """
+        Args:
+            file_path: SQLite file for the disk tier (None = memory only)
+            memory_entries: Vectors kept in the in-process LRU
+            disk_entries: Rows kept on disk before the oldest are evicted
+        """
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.file_path = Path(file_path) if file_path else None
+        self._lock = Lock()
+        self._memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk_count = 0
+        if self.file_path is not None:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.executescript(SCHEMA)
+                self._disk_count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.file_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Cached embedding of text for a model, or None.
+
+        Args:
+            model: Embedding model name
+            text: Embedded text
+
+        Returns:
+            Embedding vector (shared; do not mutate) or None
+        """
+        key = (model, text_hash(text))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return vector
+        vector = self._disk_get(key)
+        with self._lock:
+            if vector is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, vector)
+        return vector
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        """
+        Store an embedding in both tiers.
+
+        Args:
+            model: Embedding model name
+            text: Embedded text
+            vector: Embedding vector
+        """
+        if not vector:
+            return
+        key = (model, text_hash(text))
+        with self._lock:
+            self._remember(key, vector)
+        self._disk_put(key, vector)
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """
+        Cached embedding, computing and storing it on a miss.
+
+        Args:
+            model: Embedding model name
+            text: Text to embed
+            compute: Called with text on a miss (the provider call)
+
+        Returns:
+            Embedding vector
+        """
+        vector = self.get(model, text)
+        if vector is None:
+            vector = compute(text)
+            self.put(model, text, vector)
+        return vector
+
+    def get_or_compute_many(self, model: str, texts: Sequence[str],
+                            compute: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Cached embeddings of several texts. Misses (deduplicated) are computed
+        with a single call, then stored.
+
+        Args:
+            model: Embedding model name
+            texts: Texts to embed
+            compute: Called once with the missing texts (the provider batch call)
+
+        Returns:
+            One embedding per text, in order
+        """
+        keys = [(model, text_hash(text)) for text in texts]
+        found: Dict[Tuple[str, str], List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._counters["memory_hits"] += sum(1 for key in keys if key in found)
+
+        lookup = list(dict.fromkeys(key for key in keys if key not in found))
+        from_disk = self._disk_get_many(lookup)
+        with self._lock:
+            for key, vector in from_disk.items():
+                self._remember(key, vector)
+            found.update(from_disk)
+            self._counters["disk_hits"] += sum(1 for key in keys if key in from_disk)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        with self._lock:
+            self._counters["misses"] += sum(1 for key in keys if key in missing)
+        if missing:
+            vectors = compute(list(missing.values()))
+            computed = {key: vector for key, vector in zip(missing, vectors) if vector}
+            with self._lock:
+                for key, vector in computed.items():
+                    self._remember(key, vector)
+            self._disk_put_many(computed)
+            found.update(zip(missing, vectors))
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters, hit rate and tier sizes."""
+        with self._lock:
+            stats: Dict[str, float] = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        stats["disk_entries"] = self._disk_count
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop every cached embedding (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+        if self.file_path is not None:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM embeddings")
+            self._disk_count = 0
+
+    def _remember(self, key: Tuple[str, str], vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        if self.file_path is None:
+            return None
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?", key
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    (time.time(), *key),
+                )
+        except sqlite3.Error as e:
+            print(f"[WARN] Embedding cache read failed: {e}")
+            return None
+        return array("f", row[0]).tolist()
+
+    def _disk_get_many(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[float]]:
+        if self.file_path is None or not keys:
+            return {}
+        found = {}
+        try:
+            with closing(self._connect()) as conn, conn:
+                now = time.time()
+                # One statement per model keeps the IN list within SQLite's variable limit per chunk
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    for model in {model for model, _ in chunk}:
+                        hashes = [h for m, h in chunk if m == model]
+                        marks = ",".join("?" * len(hashes))
+                        rows = conn.execute(
+                            f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({marks})",
+                            (model, *hashes),
+                        ).fetchall()
+                        conn.execute(
+                            f"UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash IN ({marks})",
+                            (now, model, *hashes),
+                        )
+                        for text_hash_, blob in rows:
+                            found[(model, text_hash_)] = array("f", blob).tolist()
+        except sqlite3.Error as e:
+            print(f"[WARN] Embedding cache read failed: {e}")
+            return {}
+        return found
+
+    def _disk_put(self, key: Tuple[str, str], vector: List[float]) -> None:
+        self._disk_put_many({key: vector})
+
+    def _disk_put_many(self, vectors: Dict[Tuple[str, str], List[float]]) -> None:
+        if self.file_path is None or not vectors:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                now = time.time()
+                for (model, text_hash_), vector in vectors.items():
+                    cursor = conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                        (model, text_hash_, array("f", vector).tobytes(), now),
+                    )
+                    self._disk_count += cursor.rowcount
+                if self._disk_count > self.disk_entries:
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"[WARN] Embedding cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Trim an extra 10% so eviction runs once per many inserts, not on every one
+        self._disk_count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_count - int(self.disk_entries * 0.9)
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._disk_count -= excess
+        with self._lock:
+            self._counters["evictions"] += excess
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = Lock()
+
+
+def default_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache configured from config.embeddings (None if disabled).
+    """
+    global _default_cache
+    if not config.embeddings.cache_enabled:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(
+                config.embeddings.cache_path or None,
+                memory_entries=config.embeddings.cache_memory_entries,
+                disk_entries=config.embeddings.cache_disk_entries,
+            )
+        return _default_cache
@@ -8,7 +8,7 @@ except ImportError:
     # Fallback to new package if old one not available
     import google.genai as genai
 
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Iterator
 import json
 from .base import LLMClient
 from config import config
@@ -20,7 +20,8 @@ class GeminiClient(LLMClient):
     def __init__(self):
         """Initialize Gemini client."""
         genai.configure(api_key=config.gemini.api_key)
-        self.model = genai.GenerativeModel(config.gemini.model_name)
+        self.model_name = config.gemini.model_name
+        self.model = genai.GenerativeModel(self.model_name)
         
         # Embedding model for vector representations
         self.embedding_model = "gemini-embedding-001"
@@ -36,21 +37,64 @@ class GeminiClient(LLMClient):
         Returns:
             The model's response
         """
-        full_prompt = prompt
-        if json_mode:
-            full_prompt += "\n\nRESPOND ONLY WITH VALID JSON (no markdown, no extra text)."
-        
         response = self.model.generate_content(
-            full_prompt,
-            generation_config={
-                "temperature": config.gemini.temperature,
-                "max_output_tokens": config.gemini.max_output_tokens,
-            }
+            _full_prompt(prompt, json_mode),
+            generation_config=_generation_config(),
+        )
+        
+        return response.text
+
+    async def acall(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Call Gemini API without blocking the event loop.
+        
+        Args:
+            prompt: The prompt to send
+            json_mode: If True, add instruction to return JSON
+            
+        Returns:
+            The model's response
+        """
+        response = await self.model.generate_content_async(
+            _full_prompt(prompt, json_mode),
+            generation_config=_generation_config(),
         )
         
         return response.text
 
-    def embed(self, text: str) -> list[float]:
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Call Gemini API and yield the answer as it is generated.
+        
+        Args:
+            prompt: The prompt to send
+            
+        Yields:
+            Text chunks of the response
+        """
+        response = self.model.generate_content(
+            _full_prompt(prompt, False),
+            generation_config=_generation_config(),
+            stream=True,
+        )
+        for chunk in response:
+            text = _chunk_text(chunk)
+            if text:
+                yield text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async stream()."""
+        response = await self.model.generate_content_async(
+            _full_prompt(prompt, False),
+            generation_config=_generation_config(),
+            stream=True,
+        )
+        async for chunk in response:
+            text = _chunk_text(chunk)
+            if text:
+                yield text
+
+    def _embed(self, text: str) -> list[float]:
         """
         Generate embedding using Gemini's embedding model.
         
@@ -65,3 +109,54 @@ class GeminiClient(LLMClient):
             content=text
         )
         return result["embedding"]
+
+    def _embed_many(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generate embeddings for several texts in one request.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text, in order
+        """
+        result = genai.embed_content(
+            model=self.embedding_model,
+            content=texts
+        )
+        return result["embedding"]
+
+    async def _aembed(self, text: str) -> list[float]:
+        result = await genai.embed_content_async(
+            model=self.embedding_model,
+            content=text
+        )
+        return result["embedding"]
+
+    async def _aembed_many(self, texts: list[str]) -> list[list[float]]:
+        result = await genai.embed_content_async(
+            model=self.embedding_model,
+            content=texts
+        )
+        return result["embedding"]
+
+
+def _full_prompt(prompt: str, json_mode: bool) -> str:
+    if json_mode:
+        return prompt + "\n\nRESPOND ONLY WITH VALID JSON (no markdown, no extra text)."
+    return prompt
+
+
+def _chunk_text(chunk: Any) -> str:
+    try:
+        return chunk.text
+    except ValueError:
+        # Chunk without text parts (e.g. only safety ratings or the finish reason)
+        return ""
+
+
+def _generation_config() -> Dict[str, Any]:
+    return {
+        "temperature": config.gemini.temperature,
+        "max_output_tokens": config.gemini.max_output_tokens,
+    }
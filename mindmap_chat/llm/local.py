@@ -0,0 +1,146 @@
+"""
+Offline embedding backend.
+Embeds text on the CPU with the hashing trick: word unigrams, word bigrams
+and character trigrams are hashed (with a random sign) into
+config.embeddings.embedding_dim buckets, i.e. a random projection of the
+sparse n-gram counts. No network, no model download, and the same text
+always gives the same vector, so routing is deterministic.
+
+Generation can still go to a remote model: wrap the client that should
+answer prompts, and only embeddings stay local.
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+from .base import LLMClient
+from .embedding_cache import EmbeddingCache
+from config import config
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable (bucket, sign) of a feature; Python's hash() is salted per process."""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+def _features(text: str) -> Iterable[str]:
+    words = _TOKEN.findall(text.lower())
+    for word in words:
+        yield "w:" + word
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            yield "c:" + padded[i:i + 3]
+    for first, second in zip(words, words[1:]):
+        yield f"b:{first} {second}"
+
+
+class LocalEmbeddingClient(LLMClient):
+    """LLM client whose embeddings are computed locally; calls go to an optional wrapped client."""
+
+    def __init__(self, generator: Optional[LLMClient] = None, dim: Optional[int] = None):
+        """
+        Args:
+            generator: Client that answers call() (None = embeddings only)
+            dim: Embedding dimension (uses config.embeddings.embedding_dim if None)
+        """
+        self.generator = generator
+        self.model_name = generator.model_name if generator else ""
+        self.dim = dim or config.embeddings.embedding_dim
+        self.embedding_model = f"local-hashing-{self.dim}"
+
+    def call(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Forward a prompt to the wrapped generation client.
+
+        Raises:
+            NotImplementedError: No generation client was given
+        """
+        if self.generator is None:
+            raise NotImplementedError("LocalEmbeddingClient has no generation client to answer prompts")
+        return self.generator.call(prompt, json_mode=json_mode)
+
+    async def acall(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Forward a prompt to the wrapped generation client's async call.
+
+        Raises:
+            NotImplementedError: No generation client was given
+        """
+        if self.generator is None:
+            raise NotImplementedError("LocalEmbeddingClient has no generation client to answer prompts")
+        return await self.generator.acall(prompt, json_mode=json_mode)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Stream a prompt's answer from the wrapped generation client."""
+        if self.generator is None:
+            raise NotImplementedError("LocalEmbeddingClient has no generation client to answer prompts")
+        yield from self.generator.stream(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async stream() from the wrapped generation client."""
+        if self.generator is None:
+            raise NotImplementedError("LocalEmbeddingClient has no generation client to answer prompts")
+        async for chunk in self.generator.astream(prompt):
+            yield chunk
+
+    def _embed(self, text: str) -> list[float]:
+        """
+        Embed text locally.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            L2-normalized vector of length dim (all zeros for text without words)
+        """
+        vector = np.zeros(self.dim, dtype=np.float64)
+        for feature, count in Counter(_features(text)).items():
+            bucket, sign = _bucket(feature, self.dim)
+            # Sublinear term frequency, so one repeated word does not dominate
+            vector[bucket] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def _embed_many(self, texts: List[str]) -> List[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    # Local embedding is cheap CPU work: no worker thread needed
+
+    async def _aembed(self, text: str) -> list[float]:
+        return self._embed(text)
+
+    async def _aembed_many(self, texts: List[str]) -> List[list[float]]:
+        return self._embed_many(texts)
+
+    def _cache(self) -> Optional[EmbeddingCache]:
+        # Recomputing is cheaper than a cache lookup
+        return None
+
+
+def with_configured_embeddings(client: LLMClient) -> LLMClient:
+    """
+    Apply config.embeddings.provider to a generation client.
+
+    Args:
+        client: Client used for prompts (and for embeddings when provider is "remote")
+
+    Returns:
+        The client itself, or a LocalEmbeddingClient wrapping it when provider is "local"
+    """
+    provider = config.embeddings.provider.lower()
+    if provider == "remote":
+        return client
+    if provider == "local":
+        return LocalEmbeddingClient(client)
+    raise ValueError(f"Unknown embedding provider: {provider}")
@@ -0,0 +1,154 @@
+"""
+Response cache for structured (call_json) LLM calls.
+Raw responses are keyed by (generation model, prompt family, SHA-256 of the
+prompt), so an identical prompt (a retry, a re-sent message) is answered
+without a second round trip. In-process only: entries expire after a TTL and
+the least recently used are evicted past a size bound.
+
+Prompt families (the family argument of LLMClient.call_json):
+
+    intent     prompt_extract_intent_from_message (root blocks)
+    classify   prompt_classify_intent_shift (intent detection, deepen blocks)
+    summary    prompt_generate_block_summary
+
+Only responses that parsed as JSON are stored, so a malformed reply is still
+retried. Calls without a family, or of a disabled family, bypass the cache.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import config
+
+
+FAMILIES = ("intent", "classify", "summary")
+
+
+def prompt_hash(prompt: str) -> str:
+    """Stable hash of a prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """TTL + LRU cache of raw LLM responses with per-family switches and hit counters."""
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_entries: int = 1024,
+                 families: Iterable[str] = FAMILIES):
+        """
+        Args:
+            ttl_seconds: Age after which an entry is ignored (0 = never expires)
+            max_entries: Responses kept before the least recently used are evicted
+            families: Prompt families that are cached
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.families = set(families)
+        self._lock = Lock()
+        # (model, family, prompt hash) -> (stored at, raw response)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._by_family: Dict[str, Dict[str, int]] = {}
+
+    def enabled(self, family: Optional[str]) -> bool:
+        """Whether responses of a prompt family are cached."""
+        return bool(family) and family in self.families
+
+    def set_enabled(self, family: str, enabled: bool) -> None:
+        """Turn caching of a prompt family on or off (its cached entries are dropped when off)."""
+        with self._lock:
+            if enabled:
+                self.families.add(family)
+                return
+            self.families.discard(family)
+            for key in [key for key in self._entries if key[1] == family]:
+                del self._entries[key]
+
+    def get(self, model: str, family: str, prompt: str) -> Optional[str]:
+        """
+        Cached response to a prompt, or None (also for a disabled family).
+
+        Args:
+            model: Generation model name
+            family: Prompt family
+            prompt: The prompt
+
+        Returns:
+            Raw response text or None
+        """
+        if not self.enabled(family):
+            return None
+        key = (model, family, prompt_hash(prompt))
+        with self._lock:
+            counters = self._by_family.setdefault(family, {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            counters["hits"] += 1
+            return entry[1]
+
+    def put(self, model: str, family: str, prompt: str, response: str) -> None:
+        """
+        Store a response (ignored for a disabled family).
+
+        Args:
+            model: Generation model name
+            family: Prompt family
+            prompt: The prompt
+            response: Raw response text
+        """
+        if not self.enabled(family):
+            return
+        key = (model, family, prompt_hash(prompt))
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters (overall and per family), hit rate and size."""
+        with self._lock:
+            stats: Dict[str, object] = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["families"] = {family: dict(counters) for family, counters in self._by_family.items()}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop every cached response (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = Lock()
+
+
+def default_response_cache() -> Optional[ResponseCache]:
+    """
+    Process-wide cache configured from config.response_cache (None if disabled).
+    """
+    global _default_cache
+    if not config.response_cache.enabled:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                ttl_seconds=config.response_cache.ttl_seconds,
+                max_entries=config.response_cache.max_entries,
+                families=[f.strip() for f in config.response_cache.families.split(",") if f.strip()],
+            )
+        return _default_cache
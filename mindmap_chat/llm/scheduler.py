@@ -0,0 +1,389 @@
+"""
+Priority-aware scheduling of LLM provider calls.
+ScheduledLLMClient wraps a client so that every provider request (prompts,
+streams and embedding batches) first takes a slot from the provider's
+LLMScheduler:
+
+    rate limit   token bucket of requests_per_minute, refilled continuously,
+                 holding up to burst requests
+    in flight    at most max_in_flight requests at once, of which at most
+                 background_in_flight may be summaries/backfill, so a burst
+                 of background work never takes every slot from an answer
+    priority     waiting requests are granted in priority order, then FIFO:
+                 answer (default) < summary < backfill
+
+The priority class comes from the calling context (call_priority), so
+callers mark background work without threading a parameter through every
+LLM method. Cache hits never reach the scheduler.
+
+Schedulers are shared per provider across threads and event loops; stats()
+reports queue depth, in-flight requests and wait times per class.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from threading import Event, Lock
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .base import LLMClient
+from config import config
+
+
+# Priority classes, most urgent first
+PRIORITIES = ("answer", "summary", "backfill")
+
+_current_priority: ContextVar[str] = ContextVar("llm_call_priority", default="answer")
+
+
+@contextmanager
+def call_priority(name: str) -> Iterator[None]:
+    """
+    Run LLM calls made in this block (thread or task) with a priority class.
+
+    Args:
+        name: One of PRIORITIES
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM call priority: {name}")
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class TokenBucket:
+    """Continuously refilled token bucket (not thread-safe; LLMScheduler locks it)."""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """
+        Args:
+            requests_per_minute: Refill rate (0 = unlimited)
+            burst: Bucket size, i.e. requests allowed at once after an idle period
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take a token if there is one; returns 0, or the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class _Waiter:
+    """A queued request: woken through a threading.Event or, for async callers, its loop."""
+
+    __slots__ = ("priority", "queued_at", "granted", "cancelled", "deadline", "event", "loop")
+
+    def __init__(self, priority: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.deadline: Optional[float] = None  # When to poll the rate limit again (None = wait to be woken)
+        self.loop = loop
+        self.event = asyncio.Event() if loop is not None else Event()
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # Loop already closed; the waiter is gone
+
+    def timeout(self) -> Optional[float]:
+        """Seconds to sleep before dispatching again (None = until woken)."""
+        deadline = self.deadline
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+class LLMScheduler:
+    """Token-bucket rate limit, in-flight cap and priority queue for one provider."""
+
+    def __init__(self, requests_per_minute: float = 0.0, burst: int = 1,
+                 max_in_flight: int = 4, background_in_flight: Optional[int] = None,
+                 wait_samples: int = 1000):
+        """
+        Args:
+            requests_per_minute: Provider rate limit (0 = unlimited)
+            burst: Requests allowed at once after an idle period
+            max_in_flight: Concurrent requests
+            background_in_flight: Of those, most held by non-"answer" classes (None = max_in_flight)
+            wait_samples: Recent wait times kept per class for the stats
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.background_in_flight = max(1, min(
+            self.max_in_flight, background_in_flight if background_in_flight is not None else self.max_in_flight
+        ))
+        self.bucket = TokenBucket(requests_per_minute, burst)
+        self._lock = Lock()
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._background = 0
+        self._queued = {name: 0 for name in PRIORITIES}
+        self._granted = {name: 0 for name in PRIORITIES}
+        self._waits: Dict[str, Deque[float]] = {name: deque(maxlen=wait_samples) for name in PRIORITIES}
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None) -> Iterator[None]:
+        """
+        Hold a request slot for the duration of the block, waiting for one
+        (in priority order) if needed.
+
+        Args:
+            priority: Priority class (the calling context's class if None)
+        """
+        waiter = self._enqueue(priority, None)
+        try:
+            while True:
+                waiter.event.clear()
+                self._dispatch(waiter)
+                if waiter.granted:
+                    break
+                waiter.event.wait(waiter.timeout())
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def aslot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """Async slot(): waiting does not block the event loop."""
+        waiter = self._enqueue(priority, asyncio.get_running_loop())
+        try:
+            while True:
+                waiter.event.clear()
+                self._dispatch(waiter)
+                if waiter.granted:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), waiter.timeout())
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight requests and wait times (seconds) per priority class."""
+        with self._lock:
+            waits = {name: sorted(samples) for name, samples in self._waits.items()}
+            stats: Dict[str, Any] = {
+                "in_flight": self._in_flight,
+                "background_in_flight": self._background,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": sum(self._queued.values()),
+                "queued": dict(self._queued),
+                "granted": dict(self._granted),
+                "requests_per_minute": self.bucket.rate * 60.0,
+            }
+        stats["wait"] = {
+            name: {
+                "count": len(samples),
+                "mean_s": sum(samples) / len(samples) if samples else 0.0,
+                "p95_s": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+                "max_s": samples[-1] if samples else 0.0,
+            }
+            for name, samples in waits.items()
+        }
+        return stats
+
+    def _enqueue(self, priority: Optional[str], loop: Optional[asyncio.AbstractEventLoop]) -> _Waiter:
+        priority = priority or _current_priority.get()
+        waiter = _Waiter(priority, loop)
+        with self._lock:
+            heapq.heappush(self._heap, (PRIORITIES.index(priority), next(self._sequence), waiter))
+            self._queued[priority] += 1
+        return waiter
+
+    def _dispatch(self, caller: Optional[_Waiter] = None) -> None:
+        """
+        Grant slots to waiters in priority order while limits allow.
+
+        A queue blocked on in-flight requests is dispatched again by their
+        release. A queue blocked on the rate limit is polled by its head
+        alone, once, when the next token is due (its deadline); the head is
+        only woken if it is not already due to poll by then.
+
+        Args:
+            caller: Waiter dispatching from its wait loop (None for a release)
+        """
+        woken = []
+        with self._lock:
+            if caller is not None:
+                caller.deadline = None
+            while self._heap:
+                rank, _, waiter = self._heap[0]
+                if waiter.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                if self._in_flight >= self.max_in_flight:
+                    break
+                # The head is the most urgent waiter, so a blocked background head means only background work waits
+                if rank > 0 and self._background >= self.background_in_flight:
+                    break
+                now = time.monotonic()
+                wait = self.bucket.take(now)
+                if wait > 0:
+                    due = now + wait
+                    if waiter.deadline is None or waiter.deadline > due:
+                        if waiter is not caller:
+                            woken.append(waiter)
+                        waiter.deadline = due
+                    break
+                heapq.heappop(self._heap)
+                waiter.granted = True
+                self._in_flight += 1
+                if rank > 0:
+                    self._background += 1
+                self._queued[waiter.priority] -= 1
+                self._granted[waiter.priority] += 1
+                self._waits[waiter.priority].append(now - waiter.queued_at)
+                woken.append(waiter)
+        for waiter in woken:
+            waiter.wake()
+
+    def _release(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if waiter.priority != PRIORITIES[0]:
+                self._background -= 1
+        self._dispatch()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Withdraw a waiter whose caller gave up (cancelled, interrupted)."""
+        with self._lock:
+            granted = waiter.granted
+            if not granted and not waiter.cancelled:
+                waiter.cancelled = True
+                self._queued[waiter.priority] -= 1
+        if granted:
+            self._release(waiter)
+        else:
+            # It may have been the head polling the rate limit; hand that over
+            self._dispatch()
+
+
+# One scheduler per provider per process, configured from config.scheduler
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = Lock()
+
+
+def shared_scheduler(provider: str) -> LLMScheduler:
+    """
+    Process-wide scheduler of a provider.
+
+    Args:
+        provider: Provider name (e.g. the client class name)
+
+    Returns:
+        The same LLMScheduler for every call with this provider
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            settings = config.scheduler
+            scheduler = _schedulers[provider] = LLMScheduler(
+                requests_per_minute=settings.requests_per_minute,
+                burst=settings.burst,
+                max_in_flight=settings.max_in_flight,
+                background_in_flight=settings.background_in_flight,
+            )
+        return scheduler
+
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """stats() of every provider scheduler created so far."""
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {provider: scheduler.stats() for provider, scheduler in schedulers.items()}
+
+
+class ScheduledLLMClient(LLMClient):
+    """LLM client whose provider requests go through an LLMScheduler."""
+
+    def __init__(self, client: LLMClient, scheduler: Optional[LLMScheduler] = None):
+        """
+        Args:
+            client: Client that makes the requests
+            scheduler: Scheduler to use (the provider's shared one if None)
+        """
+        self.client = client
+        self.scheduler = scheduler or shared_scheduler(type(client).__name__)
+        self.model_name = client.model_name
+        self.embedding_model = client.embedding_model
+        self.embedding_cache = client.embedding_cache
+        self.response_cache = client.response_cache
+        self.max_embed_batch = client.max_embed_batch
+
+    def call(self, prompt: str, json_mode: bool = False) -> str:
+        with self.scheduler.slot():
+            return self.client.call(prompt, json_mode=json_mode)
+
+    async def acall(self, prompt: str, json_mode: bool = False) -> str:
+        async with self.scheduler.aslot():
+            return await self.client.acall(prompt, json_mode=json_mode)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # The slot is held until the stream ends
+        with self.scheduler.slot():
+            yield from self.client.stream(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async with self.scheduler.aslot():
+            async for chunk in self.client.astream(prompt):
+                yield chunk
+
+    def _embed(self, text: str) -> list[float]:
+        with self.scheduler.slot():
+            return self.client._embed(text)
+
+    def _embed_many(self, texts: List[str]) -> List[list[float]]:
+        with self.scheduler.slot():
+            return self.client._embed_many(texts)
+
+    async def _aembed(self, text: str) -> list[float]:
+        async with self.scheduler.aslot():
+            return await self.client._aembed(text)
+
+    async def _aembed_many(self, texts: List[str]) -> List[list[float]]:
+        async with self.scheduler.aslot():
+            return await self.client._aembed_many(texts)
+
+
+def with_scheduler(client: LLMClient) -> LLMClient:
+    """
+    Apply config.scheduler to a provider client.
+
+    Args:
+        client: Client that makes the requests
+
+    Returns:
+        A ScheduledLLMClient wrapping it, or the client itself when scheduling is disabled
+    """
+    if not config.scheduler.enabled:
+        return client
+    return ScheduledLLMClient(client)
@@ -8,8 +8,13 @@ load_dotenv()
 import sys
 from config import config, validate_config
 from llm.gemini import GeminiClient
-from storage import JSONStorage
+from llm.embedding_cache import default_embedding_cache
+from llm.response_cache import default_response_cache
+from llm.local import with_configured_embeddings
+from llm.scheduler import scheduler_stats, with_scheduler
+from storage import create_storage
 from conversation import ConversationManager
+from backfill import EmbeddingBackfill, default_progress_path
 
 
 def print_help():
@@ -23,9 +28,13 @@ Commands:
   /switch <id>  Switch to a block
   /delete <id>  Delete a block
   /graphs       List all graphs
+  /search <q>   Search blocks and messages across all graphs
   /switch-graph <id>  Switch to a graph
   /delete-graph <id>  Delete an entire graph
   /clear        Clear conversation history
+  /cache        Show embedding and response cache statistics
+  /llm-stats    Show LLM request queue depth and wait times
+  /backfill     Embed blocks/messages that are missing embeddings
   /help         Show this help
   /exit         Exit
   
@@ -43,8 +52,8 @@ def main():
     
     # Initialize
     print("[INIT] Initializing Gemini Mindmap Chat...")
-    llm = GeminiClient()
-    storage = JSONStorage(config.storage_path)
+    llm = with_configured_embeddings(with_scheduler(GeminiClient()))
+    storage = create_storage(config.storage_path)
     manager = ConversationManager(llm, storage)
     
     print("[OK] Ready!")
@@ -125,6 +134,64 @@ def main():
                     manager.graph = manager.mindmap.get_current_graph()
                     print("[OK] Cleared")
 
+                elif cmd == "/cache":
+                    cache = default_embedding_cache()
+                    if cache is None:
+                        print("Embedding cache is disabled")
+                    else:
+                        stats = cache.stats()
+                        print("\nEmbedding cache:")
+                        print(f"  hits: {stats['memory_hits']} memory, {stats['disk_hits']} disk")
+                        print(f"  misses: {stats['misses']} (hit rate {stats['hit_rate']:.0%})")
+                        print(f"  entries: {stats['memory_entries']} memory, {stats['disk_entries']} disk")
+                        print(f"  evictions: {stats['evictions']}")
+                    responses = default_response_cache()
+                    if responses is None:
+                        print("Response cache is disabled")
+                        continue
+                    stats = responses.stats()
+                    print("\nResponse cache:")
+                    print(f"  hits: {stats['hits']}, misses: {stats['misses']} (hit rate {stats['hit_rate']:.0%})")
+                    print(f"  entries: {stats['entries']}, expired: {stats['expired']}, evictions: {stats['evictions']}")
+                    for family, counters in sorted(stats["families"].items()):
+                        print(f"  {family}: {counters['hits']} hits, {counters['misses']} misses")
+
+                elif cmd == "/llm-stats":
+                    stats = scheduler_stats()
+                    if not stats:
+                        print("No scheduled LLM requests yet")
+                    for provider, provider_stats in stats.items():
+                        print(f"\n{provider}: {provider_stats['in_flight']}/{provider_stats['max_in_flight']} in flight, "
+                              f"{provider_stats['queue_depth']} queued")
+                        for name, wait in provider_stats["wait"].items():
+                            print(f"  {name}: {provider_stats['granted'][name]} requests, "
+                                  f"wait mean {wait['mean_s'] * 1000:.0f} ms, p95 {wait['p95_s'] * 1000:.0f} ms, "
+                                  f"max {wait['max_s'] * 1000:.0f} ms")
+
+                elif cmd == "/backfill":
+                    backfill = EmbeddingBackfill(llm, storage, progress_path=default_progress_path())
+                    try:
+                        backfill.run()
+                    except KeyboardInterrupt:
+                        print("\n[BACKFILL] Interrupted; progress is saved, run /backfill to resume")
+                    manager.mindmap = storage.load()
+                    manager.graph = manager.mindmap.get_current_graph()
+
+                elif cmd == "/search":
+                    query = user_input[len("/search"):].strip()
+                    if not query:
+                        print("Usage: /search <query>")
+                        continue
+                    results = manager.search(query)
+                    if not results:
+                        print("No matches")
+                        continue
+                    print(f"\n[SEARCH] {query}\n")
+                    for r in results:
+                        text = r.text if len(r.text) <= 80 else r.text[:77] + "..."
+                        print(f"  {r.score:.2f}  [{r.kind}] {r.title}: {text}")
+                        print(f"        graph {r.graph_id}, block {r.block_id}")
+
                 elif cmd == "/view":
                     try:
                         block_id = user_input.split()[1]
@@ -185,15 +252,14 @@ def main():
                         traceback.print_exc()
             
             else:
-                # Regular conversation
-                if not manager.graph or not manager.graph.root_block_id:
-                    # No conversation started yet
-                    response = manager.start_new_conversation(user_input)
-                else:
-                    # Continue conversation
-                    response = manager.continue_conversation(user_input)
-                
-                print(f"\nAssistant: {response}")
+                # Regular conversation (starts one if there is none yet);
+                # the answer is printed as it streams in
+                for event, data in manager.stream_conversation(user_input):
+                    if event == "classification":
+                        print("\nAssistant: ", end="", flush=True)
+                    elif event == "token":
+                        print(data["text"], end="", flush=True)
+                print()
         
         except KeyboardInterrupt:
             print("\n\nGoodbye!")
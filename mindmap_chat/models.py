@@ -3,8 +3,10 @@ Core data structures for the mindmap chat system.
 These are JSON-serializable and represent the conversation graph.
 """
 
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field, fields, asdict, replace
+from typing import Callable, Iterator, List, Optional, Dict, Any, Set, Union
+import itertools
 import uuid
 import json
 from datetime import datetime
@@ -19,13 +21,39 @@ class ConversationMessage:
     content: str = ""
     timestamp: float = field(default_factory=lambda: datetime.now().timestamp())
     embedding: List[float] = field(default_factory=list)
+    embedding_model: str = ""  # Model that produced the embedding
+
+    # to_dict/from_dict are written out by hand: asdict() deep-copies every
+    # embedding, which dominated save and change-tracking time.
 
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        return {
+            "message_id": self.message_id,
+            "block_id": self.block_id,
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "embedding": self.embedding,  # Replaced, never mutated: safe to share
+            "embedding_model": self.embedding_model,
+        }
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "ConversationMessage":
-        return cls(**data)
+        if "message_id" not in data or "timestamp" not in data:
+            return cls(**{k: v for k, v in data.items() if k in _MESSAGE_FIELDS})
+        return cls(
+            message_id=data["message_id"],
+            block_id=data.get("block_id", ""),
+            role=data.get("role", "user"),
+            content=data.get("content", ""),
+            timestamp=data["timestamp"],
+            embedding=data.get("embedding") or [],
+            embedding_model=data.get("embedding_model", ""),
+        )
+
+    def copy(self) -> "ConversationMessage":
+        """Independent copy. Embeddings are replaced, never mutated, so they are shared."""
+        return replace(self)
 
 
 @dataclass
@@ -40,15 +68,54 @@ class Block:
     open_questions: List[str] = field(default_factory=list)
     created_at: float = field(default_factory=lambda: datetime.now().timestamp())
     embedding: List[float] = field(default_factory=list)  # Intent embedding
+    embedding_model: str = ""  # Model that produced the embedding
     children: List[str] = field(default_factory=list)
     conversation_refs: List[str] = field(default_factory=list)  # message_ids
 
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        return {
+            "block_id": self.block_id,
+            "parent_block_id": self.parent_block_id,
+            "title": self.title,
+            "intent": self.intent,
+            "summary": self.summary,
+            "key_points": list(self.key_points),
+            "open_questions": list(self.open_questions),
+            "created_at": self.created_at,
+            "embedding": self.embedding,  # Replaced, never mutated: safe to share
+            "embedding_model": self.embedding_model,
+            "children": list(self.children),
+            "conversation_refs": list(self.conversation_refs),
+        }
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Block":
-        return cls(**data)
+        if "block_id" not in data or "created_at" not in data:
+            return cls(**{k: v for k, v in data.items() if k in _BLOCK_FIELDS})
+        return cls(
+            block_id=data["block_id"],
+            parent_block_id=data.get("parent_block_id"),
+            title=data.get("title", ""),
+            intent=data.get("intent", ""),
+            summary=data.get("summary", ""),
+            key_points=list(data.get("key_points") or ()),
+            open_questions=list(data.get("open_questions") or ()),
+            created_at=data["created_at"],
+            embedding=data.get("embedding") or [],
+            embedding_model=data.get("embedding_model", ""),
+            children=list(data.get("children") or ()),
+            conversation_refs=list(data.get("conversation_refs") or ()),
+        )
+
+    def copy(self) -> "Block":
+        """Independent copy. Embeddings are replaced, never mutated, so they are shared."""
+        return replace(
+            self,
+            key_points=list(self.key_points),
+            open_questions=list(self.open_questions),
+            children=list(self.children),
+            conversation_refs=list(self.conversation_refs),
+        )
 
     def add_message_ref(self, message_id: str):
         """Add a message ID reference to this block."""
@@ -61,6 +128,94 @@ class Block:
             self.children.append(block_id)
 
 
+_MESSAGE_FIELDS = {f.name for f in fields(ConversationMessage)}
+_BLOCK_FIELDS = {f.name for f in fields(Block)}
+
+EmbeddingResolver = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class LazyMessageMap(MutableMapping):
+    """
+    message_id -> ConversationMessage mapping that keeps the raw dicts from
+    storage and builds each message on first access.
+
+    Loading a graph therefore only materializes its block tree; message
+    bodies (and embeddings, via the optional resolver) are hydrated when
+    get_block_messages() or a direct lookup needs them.
+    """
+
+    def __init__(self, raw: Optional[Dict[str, Dict[str, Any]]] = None,
+                 resolver: Optional[EmbeddingResolver] = None):
+        """
+        Args:
+            raw: message_id -> raw message dict, in storage order
+            resolver: Turns a raw dict carrying an embedding_ref into one with its embedding
+        """
+        self._items: Dict[str, Union[ConversationMessage, Dict[str, Any]]] = dict(raw or {})
+        self._resolver = resolver
+
+    def __getitem__(self, message_id: str) -> ConversationMessage:
+        item = self._items[message_id]
+        if isinstance(item, dict):
+            item = ConversationMessage.from_dict(self._resolve(item))
+            self._items[message_id] = item
+        return item
+
+    def __setitem__(self, message_id: str, message: ConversationMessage) -> None:
+        self._items[message_id] = message
+
+    def __delitem__(self, message_id: str) -> None:
+        del self._items[message_id]
+
+    def __contains__(self, message_id: object) -> bool:
+        return message_id in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _resolve(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if self._resolver is None or "embedding_ref" not in data:
+            return data
+        return self._resolver(dict(data))
+
+    def is_hydrated(self, message_id: str) -> bool:
+        """Whether the message has already been built."""
+        return not isinstance(self._items.get(message_id), dict)
+
+    def raw(self, message_id: str, resolve_embedding: bool = True) -> Dict[str, Any]:
+        """
+        Serialized form of one message without hydrating it.
+
+        Args:
+            message_id: Message to serialize
+            resolve_embedding: Replace an embedding_ref by the vector (False keeps the ref)
+        """
+        item = self._items[message_id]
+        if not isinstance(item, dict):
+            return item.to_dict()
+        return self._resolve(item) if resolve_embedding else item
+
+    def copy(self) -> "LazyMessageMap":
+        """Independent copy; raw dicts are never mutated, so they are shared."""
+        clone = LazyMessageMap(resolver=self._resolver)
+        clone._items = {
+            mid: item if isinstance(item, dict) else item.copy()
+            for mid, item in self._items.items()
+        }
+        return clone
+
+
+# Process-wide source of ConversationGraph.revision stamps
+_revisions = itertools.count(1)
+
+
+def _next_revision() -> int:
+    return next(_revisions)
+
+
 @dataclass
 class ConversationGraph:
     """The entire conversation state."""
@@ -70,27 +225,34 @@ class ConversationGraph:
     messages: Dict[str, ConversationMessage] = field(default_factory=dict)
     current_block_id: str = ""
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # IDs of already-persisted messages replaced via update_message (not serialized)
+    updated_messages: Set[str] = field(default_factory=set, repr=False, compare=False)
+    # Content stamp, unique within the process (not serialized): every mutating
+    # method below takes a new one and copy() keeps it, so two graphs with the
+    # same revision hold the same blocks and messages. Lets the vector indexes
+    # skip graphs that did not change. Set block embeddings through
+    # set_block_embedding() so the change is seen.
+    revision: int = field(default_factory=_next_revision, repr=False, compare=False)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "graph_id": self.graph_id,
             "root_block_id": self.root_block_id,
             "blocks": {bid: block.to_dict() for bid, block in self.blocks.items()},
-            "messages": {mid: msg.to_dict() for mid, msg in self.messages.items()},
+            "messages": {mid: self.message_data(mid) for mid in self.messages},
             "current_block_id": self.current_block_id,
             "metadata": self.metadata,
         }
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "ConversationGraph":
+    def from_dict(cls, data: Dict[str, Any],
+                  embedding_resolver: Optional[EmbeddingResolver] = None) -> "ConversationGraph":
         blocks = {
             bid: Block.from_dict(block_data)
             for bid, block_data in data.get("blocks", {}).items()
         }
-        messages = {
-            mid: ConversationMessage.from_dict(msg_data)
-            for mid, msg_data in data.get("messages", {}).items()
-        }
+        # Messages are only built when first accessed
+        messages = LazyMessageMap(data.get("messages", {}), embedding_resolver)
         return cls(
             graph_id=data.get("graph_id", str(uuid.uuid4())),
             root_block_id=data.get("root_block_id", ""),
@@ -100,6 +262,28 @@ class ConversationGraph:
             metadata=data.get("metadata", {}),
         )
 
+    def copy(self) -> "ConversationGraph":
+        """Independent copy of the graph, its blocks and messages."""
+        return ConversationGraph(
+            graph_id=self.graph_id,
+            root_block_id=self.root_block_id,
+            blocks={bid: block.copy() for bid, block in self.blocks.items()},
+            messages=(
+                self.messages.copy() if isinstance(self.messages, LazyMessageMap)
+                else {mid: msg.copy() for mid, msg in self.messages.items()}
+            ),
+            current_block_id=self.current_block_id,
+            metadata=dict(self.metadata),
+            updated_messages=set(self.updated_messages),
+            revision=self.revision,
+        )
+
+    def message_data(self, message_id: str, resolve_embedding: bool = True) -> Dict[str, Any]:
+        """Serialized form of one message, without hydrating it if it was loaded lazily."""
+        if isinstance(self.messages, LazyMessageMap):
+            return self.messages.raw(message_id, resolve_embedding)
+        return self.messages[message_id].to_dict()
+
     def add_block(self, block: Block):
         """Add a block to the graph."""
         if block.parent_block_id:
@@ -117,10 +301,29 @@ class ConversationGraph:
             if not self.root_block_id:
                 self.root_block_id = block.block_id
         self.blocks[block.block_id] = block
+        self.revision = _next_revision()
+
+    def set_block_embedding(self, block_id: str, embedding: List[float], model: str = "") -> None:
+        """Replace a block's intent embedding (e.g. from the backfill)."""
+        block = self.blocks[block_id]
+        block.embedding = embedding
+        block.embedding_model = model
+        self.revision = _next_revision()
 
     def add_message(self, message: ConversationMessage):
         """Add a message to the graph."""
         self.messages[message.message_id] = message
+        self.revision = _next_revision()
+
+    def update_message(self, message: ConversationMessage):
+        """
+        Replace an existing message (e.g. to attach an embedding).
+        Messages are otherwise written once, so the change is flagged for the
+        storage backends' change tracking.
+        """
+        self.messages[message.message_id] = message
+        self.updated_messages.add(message.message_id)
+        self.revision = _next_revision()
 
     def get_block_messages(self, block_id: str) -> List[ConversationMessage]:
         """Get all messages for a block."""
@@ -152,6 +355,7 @@ class ConversationGraph:
             for message_id in block.conversation_refs:
                 self.messages.pop(message_id, None)
             del self.blocks[block_id]
+        self.revision = _next_revision()
 
     def rebuild_children(self) -> None:
         """Rebuild children lists from parent_block_id references."""
@@ -243,6 +447,32 @@ class BlockClassification:
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
     
+@dataclass
+class GraphSummary:
+    """Lightweight listing entry for a graph (no blocks or messages)."""
+    graph_id: str
+    title: str = "Untitled"
+    root_block_id: str = ""
+    block_count: int = 0
+    message_count: int = 0
+    is_current: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_graph(cls, graph: "ConversationGraph", is_current: bool = False) -> "GraphSummary":
+        root_block = graph.blocks.get(graph.root_block_id)
+        return cls(
+            graph_id=graph.graph_id,
+            title=root_block.title if root_block else "Untitled",
+            root_block_id=graph.root_block_id,
+            block_count=len(graph.blocks),
+            message_count=len(graph.messages),
+            is_current=is_current,
+        )
+
+
 @dataclass
 class Mindmap:
     """Container for multiple conversation graphs."""
@@ -250,6 +480,7 @@ class Mindmap:
     graphs: Dict[str, ConversationGraph] = field(default_factory=dict)
     current_graph_id: str = ""
     metadata: Dict[str, Any] = field(default_factory=dict)
+    version: int = 0  # Storage version this state was loaded from / last saved as
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -257,12 +488,14 @@ class Mindmap:
             "graphs": {gid: graph.to_dict() for gid, graph in self.graphs.items()},
             "current_graph_id": self.current_graph_id,
             "metadata": self.metadata,
+            "version": self.version,
         }
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "Mindmap":
+    def from_dict(cls, data: Dict[str, Any],
+                  embedding_resolver: Optional[EmbeddingResolver] = None) -> "Mindmap":
         graphs = {
-            gid: ConversationGraph.from_dict(graph_data)
+            gid: ConversationGraph.from_dict(graph_data, embedding_resolver)
             for gid, graph_data in data.get("graphs", {}).items()
         }
         current_graph_id = data.get("current_graph_id", "")
@@ -273,6 +506,17 @@ class Mindmap:
             graphs=graphs,
             current_graph_id=current_graph_id,
             metadata=data.get("metadata", {}),
+            version=data.get("version", 0),
+        )
+
+    def copy(self) -> "Mindmap":
+        """Independent copy of the mindmap and all its graphs."""
+        return Mindmap(
+            mindmap_id=self.mindmap_id,
+            graphs={gid: graph.copy() for gid, graph in self.graphs.items()},
+            current_graph_id=self.current_graph_id,
+            metadata=dict(self.metadata),
+            version=self.version,
         )
 
     def add_graph(self, graph: ConversationGraph) -> None:
@@ -1,5 +1,48 @@
 """Storage module."""
 
+from pathlib import Path
+from typing import Optional
+
+from config import config
+from .base import StorageBackend
+from .change_tracker import StaleMindmapError
 from .json_storage import JSONStorage
+from .sqlite_storage import SQLiteStorage
+from .sharded_storage import ShardedStorage
+
+
+def create_storage(file_path: Optional[str] = None, backend: Optional[str] = None) -> StorageBackend:
+    """
+    Create the storage backend selected in config.
+
+    Args:
+        file_path: Storage path (uses config.storage_path if None)
+        backend: "json", "sqlite" or "sharded" (uses config.storage.backend if None)
+
+    Returns:
+        Storage backend instance
+    """
+    file_path = file_path or config.storage_path
+    backend = (backend or config.storage.backend).lower()
+    if backend == "json":
+        return JSONStorage(
+            file_path,
+            journal=config.storage.journal,
+            compact_threshold_bytes=config.storage.journal_compact_bytes,
+            embedding_sidecar=config.storage.embedding_sidecar,
+            write_behind_interval=config.storage.write_behind_interval,
+            codec=config.storage.codec,
+        )
+    if backend == "sqlite":
+        return SQLiteStorage(str(Path(file_path).with_suffix(".db")))
+    if backend == "sharded":
+        return ShardedStorage(
+            str(Path(file_path).with_suffix("")),
+            legacy_file_path=file_path,
+            embedding_sidecar=config.storage.embedding_sidecar,
+            codec=config.storage.codec,
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
+
 
-__all__ = ["JSONStorage"]
+__all__ = ["StorageBackend", "StaleMindmapError", "JSONStorage", "SQLiteStorage", "ShardedStorage", "create_storage"]
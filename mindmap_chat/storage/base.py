@@ -0,0 +1,149 @@
+"""
+Abstract base class for storage backends.
+Allows swapping JSON files for SQLite (or anything else) without touching callers.
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from models import ConversationGraph, GraphSummary, Mindmap
+
+
+class StorageBackend(ABC):
+    """Abstract base class for mindmap persistence."""
+
+    @abstractmethod
+    def load(self) -> Mindmap:
+        """
+        Load the persisted mindmap.
+
+        Returns:
+            Loaded Mindmap, or empty mindmap if nothing is stored yet
+        """
+        pass
+
+    @abstractmethod
+    def save(self, mindmap: Mindmap) -> None:
+        """
+        Persist the mindmap.
+
+        Args:
+            mindmap: Mindmap to save
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete all persisted state."""
+        pass
+
+    def flush(self) -> None:
+        """Write any saves the backend deferred (no-op unless it buffers writes)."""
+        pass
+
+    def snapshot(self) -> Mindmap:
+        """
+        Read-only view of the persisted mindmap.
+        Backends with a cache return a shared instance, so callers must not mutate it.
+
+        Returns:
+            Persisted Mindmap
+        """
+        return self.load()
+
+    # The methods below work on a single graph. The defaults go through a
+    # full snapshot()/load()/save(); backends that can do better override them.
+
+    def list_graph_summaries(self) -> List[GraphSummary]:
+        """
+        List all graphs without their blocks or messages.
+
+        Returns:
+            One GraphSummary per graph, in storage order
+        """
+        mindmap = self.snapshot()
+        return [
+            GraphSummary.from_graph(graph, is_current=graph_id == mindmap.current_graph_id)
+            for graph_id, graph in mindmap.graphs.items()
+        ]
+
+    def load_graph(self, graph_id: str) -> Optional[ConversationGraph]:
+        """
+        Load a single graph.
+
+        Args:
+            graph_id: ID of the graph
+
+        Returns:
+            The graph, or None if not found
+        """
+        graph = self.snapshot().graphs.get(graph_id)
+        return graph.copy() if graph else None
+
+    def find_graph_for_block(self, block_id: str) -> Optional[str]:
+        """
+        Find which graph a block belongs to.
+
+        Args:
+            block_id: ID of the block
+
+        Returns:
+            Graph ID, or None if no graph contains the block
+        """
+        for graph_id, graph in self.snapshot().graphs.items():
+            if block_id in graph.blocks:
+                return graph_id
+        return None
+
+    def save_graph(self, graph: ConversationGraph, make_current: bool = False) -> None:
+        """
+        Persist a single graph, leaving the others untouched.
+
+        Args:
+            graph: Graph to save
+            make_current: Also make it the current graph
+        """
+        mindmap = self.load()
+        mindmap.graphs[graph.graph_id] = graph
+        if make_current:
+            mindmap.current_graph_id = graph.graph_id
+        self.save(mindmap)
+
+    def set_current_graph(self, graph_id: str) -> bool:
+        """
+        Make a graph the current one.
+
+        Args:
+            graph_id: ID of the graph
+
+        Returns:
+            False if the graph does not exist
+        """
+        mindmap = self.load()
+        if graph_id not in mindmap.graphs:
+            return False
+        mindmap.current_graph_id = graph_id
+        self.save(mindmap)
+        return True
+
+    def delete_graph(self, graph_id: str) -> str:
+        """
+        Delete a graph and all its blocks/messages.
+        If it was current, the first remaining graph becomes current.
+
+        Args:
+            graph_id: ID of the graph
+
+        Returns:
+            The new current graph ID ("" if none left)
+
+        Raises:
+            KeyError: If the graph does not exist
+        """
+        mindmap = self.load()
+        if graph_id not in mindmap.graphs:
+            raise KeyError(graph_id)
+        del mindmap.graphs[graph_id]
+        if mindmap.current_graph_id == graph_id:
+            mindmap.current_graph_id = next(iter(mindmap.graphs.keys()), "")
+        self.save(mindmap)
+        return mindmap.current_graph_id
@@ -0,0 +1,130 @@
+"""
+In-memory mindmap cache for storage backends.
+Keeps the last loaded/saved Mindmap together with the storage version it
+reflects, so repeated loads skip disk reads and parsing until another
+writer changes the underlying files.
+"""
+
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Hashable, Optional, Tuple
+from models import ConversationGraph, Mindmap
+
+
+def file_signature(*paths: Path) -> Tuple[Optional[Tuple[int, int, int]], ...]:
+    """
+    Cheap change detector for a set of files.
+
+    Args:
+        *paths: Files whose (inode, mtime, size) make up the version
+
+    Returns:
+        Tuple with one entry per path (None for missing files)
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class MindmapCache:
+    """
+    Holds one Mindmap keyed by a storage version.
+
+    get() hands out independent copies so callers can mutate freely;
+    peek() returns the shared instance for read-only use.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = Lock()
+        self._mindmap: Optional[Mindmap] = None
+        self._version: Optional[Hashable] = None
+
+    def get(self, version: Hashable) -> Optional[Mindmap]:
+        """
+        Return a private copy of the cached mindmap if it matches version.
+
+        Args:
+            version: Current storage version
+
+        Returns:
+            Copy of the cached mindmap, or None on a miss
+        """
+        with self._lock:
+            if self._mindmap is None or version != self._version:
+                return None
+            return self._mindmap.copy()
+
+    def peek(self, version: Hashable) -> Optional[Mindmap]:
+        """
+        Return the shared cached mindmap if it matches version. Do not mutate it.
+
+        Args:
+            version: Current storage version
+
+        Returns:
+            Shared cached mindmap, or None on a miss
+        """
+        with self._lock:
+            if self._mindmap is None or version != self._version:
+                return None
+            return self._mindmap
+
+    def put(self, mindmap: Mindmap, version: Hashable) -> None:
+        """
+        Cache a copy of mindmap as the state at version.
+
+        Args:
+            mindmap: Mindmap that matches persisted state
+            version: Storage version it was read from or written as
+        """
+        snapshot = mindmap.copy()
+        with self._lock:
+            self._mindmap = snapshot
+            self._version = version
+
+    def invalidate(self) -> None:
+        """Drop the cached mindmap."""
+        with self._lock:
+            self._mindmap = None
+            self._version = None
+
+
+class GraphCache:
+    """Per-graph variant of MindmapCache for backends that store graphs separately."""
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = Lock()
+        self._graphs: Dict[str, Tuple[Hashable, ConversationGraph]] = {}
+
+    def get(self, graph_id: str, version: Hashable) -> Optional[ConversationGraph]:
+        """Return a private copy of the cached graph if it matches version."""
+        with self._lock:
+            entry = self._graphs.get(graph_id)
+            if entry is None or entry[0] != version:
+                return None
+            return entry[1].copy()
+
+    def put(self, graph: ConversationGraph, version: Hashable) -> None:
+        """Cache a copy of graph as the state at version."""
+        snapshot = graph.copy()
+        with self._lock:
+            self._graphs[graph.graph_id] = (version, snapshot)
+
+    def discard(self, graph_id: str) -> None:
+        """Drop one graph."""
+        with self._lock:
+            self._graphs.pop(graph_id, None)
+
+    def invalidate(self) -> None:
+        """Drop every graph."""
+        with self._lock:
+            self._graphs = {}
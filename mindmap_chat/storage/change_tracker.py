@@ -0,0 +1,428 @@
+"""
+Change tracking for incremental saves.
+Remembers the last persisted state so a backend only writes what a turn touched.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Set
+from models import ConversationGraph, Mindmap
+
+# Persisted versions remembered as merge bases for saves from older copies
+MAX_BASELINES = 16
+
+
+@dataclass
+class MindmapDelta:
+    """Rows that differ between the last persisted state and a mindmap."""
+    mindmap: Optional[Dict[str, Any]] = None  # Mindmap header, only when changed
+    graphs: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # graph_id -> graph header
+    deleted_graphs: List[str] = field(default_factory=list)
+    blocks: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)  # graph_id -> block dicts
+    deleted_blocks: Dict[str, List[str]] = field(default_factory=dict)
+    messages: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)  # graph_id -> message dicts
+    deleted_messages: Dict[str, List[str]] = field(default_factory=dict)
+
+    def is_empty(self) -> bool:
+        """True if nothing needs to be written."""
+        return not (
+            self.mindmap
+            or self.graphs
+            or self.deleted_graphs
+            or self.blocks
+            or self.deleted_blocks
+            or self.messages
+            or self.deleted_messages
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact dict form that omits empty sections."""
+        data: Dict[str, Any] = {}
+        for name in _DELTA_FIELDS:
+            value = getattr(self, name)
+            if value:
+                data[name] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MindmapDelta":
+        return cls(**{name: data[name] for name in _DELTA_FIELDS if name in data})
+
+    def apply_to(self, data: Dict[str, Any]) -> None:
+        """
+        Apply the delta in-place to a raw mindmap dict (as produced by Mindmap.to_dict).
+        Upserts and deletes are keyed by ID, so applying the same delta twice is harmless.
+
+        Args:
+            data: Raw mindmap dict to update
+        """
+        if self.mindmap:
+            data.update(self.mindmap)
+        graphs = data.setdefault("graphs", {})
+
+        for graph_id in self.deleted_graphs:
+            graphs.pop(graph_id, None)
+        for graph_id, header in self.graphs.items():
+            graph = graphs.setdefault(graph_id, {"blocks": {}, "messages": {}})
+            graph.update(header)
+
+        for graph_id, block_ids in self.deleted_blocks.items():
+            blocks = graphs.get(graph_id, {}).get("blocks", {})
+            for block_id in block_ids:
+                blocks.pop(block_id, None)
+        for graph_id, block_list in self.blocks.items():
+            if graph_id not in graphs:
+                continue
+            blocks = graphs[graph_id].setdefault("blocks", {})
+            for block_data in block_list:
+                blocks[block_data["block_id"]] = block_data
+
+        for graph_id, message_ids in self.deleted_messages.items():
+            messages = graphs.get(graph_id, {}).get("messages", {})
+            for message_id in message_ids:
+                messages.pop(message_id, None)
+        for graph_id, message_list in self.messages.items():
+            if graph_id not in graphs:
+                continue
+            messages = graphs[graph_id].setdefault("messages", {})
+            for message_data in message_list:
+                messages[message_data["message_id"]] = message_data
+
+    def touched_graph_ids(self) -> Set[str]:
+        """Graph IDs with at least one upserted or deleted row."""
+        touched: Set[str] = set(self.graphs)
+        for rows in (self.blocks, self.deleted_blocks, self.messages, self.deleted_messages):
+            touched.update(rows)
+        return touched
+
+
+_DELTA_FIELDS = (
+    "mindmap",
+    "graphs",
+    "deleted_graphs",
+    "blocks",
+    "deleted_blocks",
+    "messages",
+    "deleted_messages",
+)
+
+
+def mindmap_header(mindmap: Mindmap) -> Dict[str, Any]:
+    """Mindmap fields that are not part of any graph."""
+    return {
+        "mindmap_id": mindmap.mindmap_id,
+        "current_graph_id": mindmap.current_graph_id,
+        "metadata": dict(mindmap.metadata),
+    }
+
+
+def graph_header(graph: ConversationGraph) -> Dict[str, Any]:
+    """Graph fields that are not blocks or messages."""
+    return {
+        "graph_id": graph.graph_id,
+        "root_block_id": graph.root_block_id,
+        "current_block_id": graph.current_block_id,
+        "metadata": dict(graph.metadata),
+    }
+
+
+# Block fields merged element-wise when two writers changed the same block
+_LIST_FIELDS = ("key_points", "open_questions", "children", "conversation_refs")
+
+
+def merge_block(base: Optional[Dict[str, Any]], ours: Dict[str, Any], theirs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Three-way merge of one block dict.
+    Fields we left unchanged keep their value; list fields combine both sides'
+    additions and removals; for other fields our value wins.
+
+    Args:
+        base: Block as both writers last saw it (None if unknown)
+        ours: Block as this writer wants to save it
+        theirs: Block as currently persisted by another writer
+    """
+    base = base or {}
+    merged = dict(theirs)
+    for key, value in ours.items():
+        base_value = base.get(key)
+        if value == base_value:
+            continue
+        if key in _LIST_FIELDS and isinstance(theirs.get(key), list):
+            removed = [item for item in (base_value or []) if item not in value]
+            merged[key] = [item for item in theirs[key] if item not in removed]
+            merged[key] += [item for item in value if item not in merged[key]]
+        else:
+            merged[key] = value
+    return merged
+
+
+@dataclass
+class _GraphBaseline:
+    """Last persisted state of one graph."""
+    header: Dict[str, Any]
+    blocks: Dict[str, Dict[str, Any]]
+    message_ids: Set[str]
+    updated_messages: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # Rewritten after creation
+
+
+class ChangeTracker:
+    """
+    Diffs a mindmap against the last state a backend persisted.
+
+    Blocks are compared field by field. Messages are treated as immutable
+    once persisted, so only their IDs are remembered; messages replaced with
+    ConversationGraph.update_message() are compared against the version
+    last written.
+    """
+
+    def __init__(self):
+        """Initialize with an empty baseline (everything counts as new)."""
+        self._header: Optional[Dict[str, Any]] = None
+        self._graphs: Dict[str, _GraphBaseline] = {}
+
+    def reset(self, mindmap: Optional[Mindmap] = None) -> None:
+        """
+        Replace the baseline with the given mindmap (e.g. right after a load).
+
+        Args:
+            mindmap: Mindmap that matches persisted state, or None to forget everything
+        """
+        self._header = None
+        self._graphs = {}
+        if mindmap is None:
+            return
+        self._header = mindmap_header(mindmap)
+        for graph in mindmap.graphs.values():
+            self.reset_graph(graph)
+
+    def reset_graph(self, graph: ConversationGraph) -> None:
+        """Replace the baseline of a single graph (e.g. after saving it on its own)."""
+        self._graphs[graph.graph_id] = _GraphBaseline(
+            header=graph_header(graph),
+            blocks={bid: block.to_dict() for bid, block in graph.blocks.items()},
+            message_ids=set(graph.messages),
+        )
+
+    def copy(self) -> "ChangeTracker":
+        """Independent baseline (block dicts are replaced on apply, never mutated, so they are shared)."""
+        clone = ChangeTracker()
+        clone._header = self._header
+        clone._graphs = {
+            gid: replace(
+                baseline,
+                blocks=dict(baseline.blocks),
+                message_ids=set(baseline.message_ids),
+                updated_messages=dict(baseline.updated_messages),
+            )
+            for gid, baseline in self._graphs.items()
+        }
+        return clone
+
+    def rebase(self, delta: MindmapDelta, current: Mindmap) -> MindmapDelta:
+        """
+        Adapt a delta computed against this baseline so it applies on top of a
+        newer persisted state written by someone else.
+
+        Blocks both sides changed are merged with merge_block(); everything else
+        (new messages, deletions, headers) applies as is.
+
+        Args:
+            delta: Result of diff() against this baseline
+            current: Mindmap as currently persisted
+
+        Returns:
+            Delta to write on top of current
+        """
+        rebased = replace(delta, blocks={})
+        for graph_id, blocks in delta.blocks.items():
+            baseline = self._graphs.get(graph_id)
+            graph = current.graphs.get(graph_id)
+            merged_blocks = []
+            for block_data in blocks:
+                block_id = block_data["block_id"]
+                base = baseline.blocks.get(block_id) if baseline else None
+                if graph is not None and block_id in graph.blocks:
+                    theirs = graph.blocks[block_id].to_dict()
+                    if theirs != base:
+                        block_data = merge_block(base, block_data, theirs)
+                merged_blocks.append(block_data)
+            rebased.blocks[graph_id] = merged_blocks
+        return rebased
+
+    def forget_graph(self, graph_id: str) -> None:
+        """Drop a graph from the baseline (e.g. after deleting it on its own)."""
+        self._graphs.pop(graph_id, None)
+
+    def diff(self, mindmap: Mindmap) -> MindmapDelta:
+        """
+        Compute what changed since the baseline. Does not modify the baseline.
+
+        Args:
+            mindmap: Current in-memory mindmap
+
+        Returns:
+            MindmapDelta with only the changed rows
+        """
+        delta = MindmapDelta()
+
+        header = mindmap_header(mindmap)
+        if header != self._header:
+            delta.mindmap = header
+
+        for graph_id, graph in mindmap.graphs.items():
+            baseline = self._graphs.get(graph_id)
+
+            header = graph_header(graph)
+            if baseline is None or header != baseline.header:
+                delta.graphs[graph_id] = header
+
+            known_blocks = baseline.blocks if baseline else {}
+            changed_blocks = []
+            for block_id, block in graph.blocks.items():
+                block_data = block.to_dict()
+                if known_blocks.get(block_id) != block_data:
+                    changed_blocks.append(block_data)
+            if changed_blocks:
+                delta.blocks[graph_id] = changed_blocks
+            removed_blocks = [bid for bid in known_blocks if bid not in graph.blocks]
+            if removed_blocks:
+                delta.deleted_blocks[graph_id] = removed_blocks
+
+            known_messages = baseline.message_ids if baseline else set()
+            new_messages = [
+                graph.message_data(mid)
+                for mid in graph.messages
+                if mid not in known_messages
+            ]
+            for mid in graph.updated_messages:
+                if mid in known_messages and mid in graph.messages:
+                    message_data = graph.message_data(mid)
+                    if baseline.updated_messages.get(mid) != message_data:
+                        new_messages.append(message_data)
+            if new_messages:
+                delta.messages[graph_id] = new_messages
+            removed_messages = [mid for mid in known_messages if mid not in graph.messages]
+            if removed_messages:
+                delta.deleted_messages[graph_id] = removed_messages
+
+        delta.deleted_graphs = [gid for gid in self._graphs if gid not in mindmap.graphs]
+        return delta
+
+    def apply(self, delta: MindmapDelta) -> None:
+        """
+        Advance the baseline after a delta has been persisted.
+
+        Args:
+            delta: Delta returned by diff() and successfully written
+        """
+        if delta.mindmap is not None:
+            self._header = delta.mindmap
+
+        for graph_id in delta.deleted_graphs:
+            self._graphs.pop(graph_id, None)
+
+        for graph_id, header in delta.graphs.items():
+            baseline = self._graphs.get(graph_id)
+            if baseline is None:
+                self._graphs[graph_id] = _GraphBaseline(header=header, blocks={}, message_ids=set())
+            else:
+                baseline.header = header
+
+        for graph_id, blocks in delta.blocks.items():
+            baseline = self._graphs[graph_id]
+            for block_data in blocks:
+                baseline.blocks[block_data["block_id"]] = block_data
+        for graph_id, block_ids in delta.deleted_blocks.items():
+            baseline = self._graphs[graph_id]
+            for block_id in block_ids:
+                baseline.blocks.pop(block_id, None)
+
+        for graph_id, messages in delta.messages.items():
+            baseline = self._graphs[graph_id]
+            for message_data in messages:
+                message_id = message_data["message_id"]
+                if message_id in baseline.message_ids:
+                    baseline.updated_messages[message_id] = message_data
+                else:
+                    baseline.message_ids.add(message_id)
+        for graph_id, message_ids in delta.deleted_messages.items():
+            baseline = self._graphs[graph_id]
+            baseline.message_ids.difference_update(message_ids)
+            for message_id in message_ids:
+                baseline.updated_messages.pop(message_id, None)
+
+
+class StaleMindmapError(Exception):
+    """A save came from a mindmap version whose persisted state is no longer known, so it cannot be merged."""
+
+
+class BaselineHistory:
+    """
+    Persisted state of the last few stored versions, the merge bases of saves
+    made from copies loaded at those versions.
+    """
+
+    def __init__(self, max_versions: int = MAX_BASELINES):
+        """
+        Args:
+            max_versions: Versions kept before the least recently used is forgotten
+        """
+        self.max_versions = max_versions
+        self._trackers: "OrderedDict[int, ChangeTracker]" = OrderedDict()
+
+    def __contains__(self, version: object) -> bool:
+        return version in self._trackers
+
+    def remember(self, version: int, tracker: ChangeTracker) -> None:
+        """Keep the persisted state of a version."""
+        self._trackers[version] = tracker
+        self._trackers.move_to_end(version)
+        while len(self._trackers) > self.max_versions:
+            self._trackers.popitem(last=False)
+
+    def remember_mindmap(self, mindmap: Mindmap) -> ChangeTracker:
+        """Keep a mindmap that matches persisted state as the state of its version."""
+        tracker = ChangeTracker()
+        tracker.reset(mindmap)
+        self.remember(mindmap.version, tracker)
+        return tracker
+
+    def base(self, mindmap: Mindmap, stored_version: int,
+             read_stored: Callable[[], Mindmap]) -> ChangeTracker:
+        """
+        State a mindmap must be diffed against: the persisted state of the
+        version it was loaded at. If that was forgotten, it is rebuilt when it
+        is still the stored version (read_stored) or version 0 (nothing saved
+        yet, i.e. empty).
+
+        A stale copy is never diffed against an empty state: everything it
+        holds would count as new, so a merge would bring back what other
+        writers deleted.
+
+        Args:
+            mindmap: Mindmap about to be saved
+            stored_version: Version currently persisted
+            read_stored: Reads the persisted mindmap (called only to rebuild a forgotten base)
+
+        Returns:
+            Tracker of the mindmap's version (do not mutate, copy() it)
+
+        Raises:
+            StaleMindmapError: The base is gone and the stored version moved on
+        """
+        tracker = self._trackers.get(mindmap.version)
+        if tracker is not None:
+            self._trackers.move_to_end(mindmap.version)
+            return tracker
+        if mindmap.version == stored_version:
+            return self.remember_mindmap(read_stored())
+        if mindmap.version == 0:
+            return ChangeTracker()
+        raise StaleMindmapError(
+            f"Mindmap version {mindmap.version} is too old to merge onto stored version "
+            f"{stored_version}; reload it and retry"
+        )
+
+    def clear(self) -> None:
+        """Forget every version."""
+        self._trackers.clear()
@@ -0,0 +1,144 @@
+"""
+Serialization codecs for the file-based backends.
+A codec turns a raw mindmap/graph dict into bytes and back. Files are
+sniffed on load, so stores written with any codec (including the original
+indented conversation.json) keep loading after the setting changes.
+
+Codecs:
+    json         compact stdlib JSON
+    json-pretty  indented stdlib JSON (the original format)
+    orjson       compact JSON via orjson (optional dependency)
+    msgpack      binary MessagePack (optional dependency)
+    auto         orjson if installed, else json
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Codec(ABC):
+    """Encodes raw dicts to bytes and back."""
+
+    name: str = ""
+
+    @abstractmethod
+    def dumps(self, data: Any) -> bytes:
+        """Encode data."""
+        pass
+
+    @abstractmethod
+    def loads(self, payload: bytes) -> Any:
+        """Decode data (raises ValueError on malformed input)."""
+        pass
+
+
+class JSONCodec(Codec):
+    """Stdlib JSON, compact unless an indent is given."""
+
+    def __init__(self, indent: int = None):
+        self.indent = indent
+        self.name = "json" if indent is None else "json-pretty"
+
+    def dumps(self, data: Any) -> bytes:
+        if self.indent is None:
+            return json.dumps(data, separators=(",", ":")).encode("utf-8")
+        return json.dumps(data, indent=self.indent).encode("utf-8")
+
+    def loads(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+
+class OrjsonCodec(Codec):
+    """JSON through orjson (several times faster than the stdlib)."""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ValueError("The orjson codec needs the orjson package (pip install orjson)")
+
+    def dumps(self, data: Any) -> bytes:
+        return orjson.dumps(data)
+
+    def loads(self, payload: bytes) -> Any:
+        return orjson.loads(payload)
+
+
+class MsgpackCodec(Codec):
+    """Binary MessagePack; smallest files, not human-readable."""
+
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ValueError("The msgpack codec needs the msgpack package (pip install msgpack)")
+
+    def dumps(self, data: Any) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, payload: bytes) -> Any:
+        try:
+            return msgpack.unpackb(payload, raw=False)
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise ValueError(f"Malformed msgpack data: {e}") from e
+
+
+def json_codec() -> Codec:
+    """Fastest available JSON codec (used for journal lines and sniffed JSON files)."""
+    return OrjsonCodec() if orjson is not None else JSONCodec()
+
+
+CODECS: Dict[str, Callable[[], Codec]] = {
+    "json": JSONCodec,
+    "json-pretty": lambda: JSONCodec(indent=2),
+    "orjson": OrjsonCodec,
+    "msgpack": MsgpackCodec,
+    "auto": json_codec,
+}
+
+
+def get_codec(name: str = "auto") -> Codec:
+    """
+    Look a codec up by name.
+
+    Args:
+        name: One of CODECS
+
+    Returns:
+        Codec instance
+
+    Raises:
+        ValueError: Unknown name, or its optional dependency is not installed
+    """
+    factory = CODECS.get(name.lower())
+    if factory is None:
+        raise ValueError(f"Unknown storage codec: {name} (expected one of {', '.join(CODECS)})")
+    return factory()
+
+
+def decode(payload: bytes) -> Any:
+    """
+    Decode a file written by any codec.
+    JSON documents start with '{' or '[' (after optional whitespace), which
+    never begins a MessagePack map or array of our shape.
+
+    Raises:
+        ValueError: Malformed data, or msgpack data without msgpack installed
+    """
+    head = payload.lstrip()[:1]
+    if head in (b"{", b"[", b""):
+        return json_codec().loads(payload)
+    if msgpack is None:
+        raise ValueError("Data looks like msgpack, but the msgpack package is not installed")
+    return MsgpackCodec().loads(payload)
@@ -0,0 +1,375 @@
+"""
+Binary sidecar for embeddings.
+Vectors are appended to a flat float32 file that is memory-mapped on load,
+and an append-only index maps each block/message key to its row. JSON
+documents then carry an "embedding_ref" instead of thousands of decimal
+strings per vector.
+
+Files (next to the JSON document):
+    <name>.vectors.idx    header "gen <n>", then "key<TAB>offset<TAB>length" lines
+    <name>.<n>.vectors    float32 data for generation n
+"""
+
+import mmap
+import os
+from array import array
+from pathlib import Path
+from threading import RLock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+ITEM_SIZE = array("f").itemsize
+
+
+def block_key(block_id: str) -> str:
+    return f"b:{block_id}"
+
+
+def message_key(message_id: str) -> str:
+    return f"m:{message_id}"
+
+
+class EmbeddingStore:
+    """Append-only float32 vector file with a row index per block/message key."""
+
+    def __init__(self, base_path: Path, compact_min_elements: int = 1 << 20):
+        """
+        Initialize the store (files are opened lazily).
+
+        Args:
+            base_path: Path of the JSON document the vectors belong to
+            compact_min_elements: Dead floats required before the data file is rewritten
+        """
+        self.base_path = Path(base_path)
+        self.index_path = self.base_path.with_suffix(".vectors.idx")
+        self.compact_min_elements = compact_min_elements
+        self._lock = RLock()
+        self._generation = 0
+        self._rows: Dict[str, Tuple[int, int]] = {}  # key -> (offset, length) in floats
+        self._known: Dict[str, List[float]] = {}  # key -> list object last stored/loaded
+        self._flushed = 0  # floats already in the data file
+        self._dead = 0  # floats no longer referenced by any key
+        self._pending_data = array("f")
+        self._pending_index: List[str] = []
+        self._index_signature: Optional[Tuple[int, int]] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        self._is_open = False
+
+    @property
+    def data_path(self) -> Path:
+        return self.base_path.with_suffix(f".{self._generation}.vectors")
+
+    # ----- opening / mapping -----
+
+    def open(self) -> None:
+        """(Re)load the index and map the data file if another writer changed it."""
+        with self._lock:
+            signature = _stat_signature(self.index_path)
+            if self._is_open and signature == self._index_signature:
+                return
+            self._unmap()
+            self._rows = {}
+            self._known = {}
+            self._pending_data = array("f")
+            self._pending_index = []
+            self._generation = 0
+            if signature is not None:
+                with open(self.index_path, "r") as f:
+                    lines = f.read().splitlines()
+                if lines and lines[0].startswith("gen "):
+                    self._generation = int(lines[0][4:])
+                    lines = lines[1:]
+                for line in lines:
+                    parts = line.split("\t")
+                    if len(parts) != 3:
+                        continue  # Torn final line
+                    key, offset, length = parts[0], int(parts[1]), int(parts[2])
+                    if offset < 0:
+                        self._rows.pop(key, None)
+                    else:
+                        self._rows[key] = (offset, length)
+            self._flushed = self.data_path.stat().st_size // ITEM_SIZE if self.data_path.exists() else 0
+            # Drop rows whose data never made it to disk
+            self._rows = {k: r for k, r in self._rows.items() if r[0] + r[1] <= self._flushed}
+            self._dead = self._flushed - sum(length for _, length in self._rows.values())
+            self._index_signature = signature
+            self._is_open = True
+            self._map()
+
+    def _map(self) -> None:
+        if self._flushed == 0:
+            return
+        with open(self.data_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm).cast("f")
+
+    def _unmap(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def close(self) -> None:
+        """Release the memory map."""
+        with self._lock:
+            self._unmap()
+            self._is_open = False
+
+    # ----- vector access -----
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Read one vector.
+
+        Args:
+            key: block_key()/message_key() of the owner
+
+        Returns:
+            The vector as a list of floats, or None if not stored
+        """
+        with self._lock:
+            if not self._is_open:
+                self.open()
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            vector = self._read_row(row).tolist()
+            self._known[key] = vector
+            return vector
+
+    def _read_row(self, row: Tuple[int, int]):
+        offset, length = row
+        if offset >= self._flushed:
+            start = offset - self._flushed
+            return self._pending_data[start:start + length]
+        if self._view is None or offset + length > len(self._view):
+            self._unmap()
+            self._map()
+        return self._view[offset:offset + length]
+
+    def put(self, key: str, vector: List[float]) -> None:
+        """
+        Store a vector, appending a new row only if it changed.
+
+        Args:
+            key: block_key()/message_key() of the owner
+            vector: Embedding values
+        """
+        with self._lock:
+            if not self._is_open:
+                self.open()
+            if not vector:
+                self.discard(key)
+                return
+            if self._known.get(key) is vector:
+                return  # Same list object we stored or loaded: unchanged
+            packed = array("f", vector)
+            row = self._rows.get(key)
+            if row is not None and row[1] == len(packed) and self._read_row(row).tobytes() == packed.tobytes():
+                self._known[key] = vector
+                return
+            if row is not None:
+                self._dead += row[1]
+            offset = self._flushed + len(self._pending_data)
+            self._pending_data.extend(packed)
+            self._rows[key] = (offset, len(packed))
+            self._pending_index.append(f"{key}\t{offset}\t{len(packed)}\n")
+            self._known[key] = vector
+
+    def discard(self, key: str) -> None:
+        """Forget a key; its row becomes garbage until the next compaction."""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            self._known.pop(key, None)
+            if row is not None:
+                self._dead += row[1]
+                self._pending_index.append(f"{key}\t-1\t0\n")
+
+    def retain(self, keys: Set[str]) -> None:
+        """Discard every key not in keys."""
+        with self._lock:
+            for key in [k for k in self._rows if k not in keys]:
+                self.discard(key)
+
+    def flush(self) -> None:
+        """
+        Persist pending vectors, then their index entries (both fsynced),
+        and compact when most of the data file is garbage.
+        Must run before a document referencing the new rows is written.
+        """
+        with self._lock:
+            self._write_pending()
+            if self._dead >= self.compact_min_elements and self._dead > self._flushed // 2:
+                self.compact()
+
+    def _write_pending(self) -> None:
+        if self._pending_data:
+            with open(self.data_path, "ab") as f:
+                self._pending_data.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            self._flushed += len(self._pending_data)
+            self._pending_data = array("f")
+        if self._pending_index:
+            new_index = not self.index_path.exists()
+            with open(self.index_path, "a") as f:
+                if new_index:
+                    f.write(f"gen {self._generation}\n")
+                f.writelines(self._pending_index)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending_index = []
+            self._index_signature = _stat_signature(self.index_path)
+
+    def compact(self) -> None:
+        """
+        Rewrite live rows into a new data generation and swap the index atomically.
+        A crash at any point leaves either the old or the new generation intact.
+        """
+        with self._lock:
+            self._write_pending()
+            old_data_path = self.data_path
+            live = array("f")
+            rows: Dict[str, Tuple[int, int]] = {}
+            for key, row in self._rows.items():
+                rows[key] = (len(live), row[1])
+                live.extend(self._read_row(row))
+
+            self._generation += 1
+            with open(self.data_path, "wb") as f:
+                live.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            temp_index = self.index_path.with_suffix(".tmp")
+            with open(temp_index, "w") as f:
+                f.write(f"gen {self._generation}\n")
+                f.writelines(f"{key}\t{offset}\t{length}\n" for key, (offset, length) in rows.items())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_index, self.index_path)
+
+            self._unmap()
+            if old_data_path.exists():
+                os.remove(old_data_path)
+            self._rows = rows
+            self._flushed = len(live)
+            self._dead = 0
+            self._index_signature = _stat_signature(self.index_path)
+            self._map()
+            print(f"[COMPACTED] {self.data_path}")
+
+    def clear(self) -> None:
+        """Delete all sidecar files."""
+        with self._lock:
+            self._unmap()
+            for path in (self.data_path, self.index_path):
+                if path.exists():
+                    os.remove(path)
+            self._is_open = False
+            self._index_signature = None
+
+    # ----- document rewriting -----
+
+    def externalize_item(self, item: Dict[str, Any], key: str) -> Dict[str, Any]:
+        """Return a copy of a block/message dict with its embedding moved to the store."""
+        vector = item.get("embedding")
+        if not vector:
+            return item
+        self.put(key, vector)
+        externalized = dict(item)
+        del externalized["embedding"]
+        externalized["embedding_ref"] = key
+        return externalized
+
+    def internalize_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace an embedding_ref in a block/message dict (in-place) with the stored vector."""
+        key = item.pop("embedding_ref", None)
+        if key is not None:
+            item["embedding"] = self.get(key) or []
+        return item
+
+    def externalize_graph(self, graph_data: Dict[str, Any], live_keys: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Return a copy of a graph dict whose blocks/messages carry embedding refs."""
+        blocks = {}
+        for block_id, block in graph_data.get("blocks", {}).items():
+            blocks[block_id] = self.externalize_item(block, block_key(block_id))
+            if live_keys is not None and "embedding_ref" in blocks[block_id]:
+                live_keys.add(block_key(block_id))
+        messages = {}
+        for message_id, message in graph_data.get("messages", {}).items():
+            messages[message_id] = self.externalize_item(message, message_key(message_id))
+            if live_keys is not None and "embedding_ref" in messages[message_id]:
+                live_keys.add(message_key(message_id))
+        return {**graph_data, "blocks": blocks, "messages": messages}
+
+    def internalize_graph(self, graph_data: Dict[str, Any], messages: bool = True) -> Dict[str, Any]:
+        """
+        Resolve embedding refs in a graph dict in-place.
+
+        Args:
+            graph_data: Raw graph dict
+            messages: Also resolve message refs (False leaves them for lazy hydration
+                through internalize_item as the resolver)
+        """
+        for block in graph_data.get("blocks", {}).values():
+            self.internalize_item(block)
+        if messages:
+            for message in graph_data.get("messages", {}).values():
+                self.internalize_item(message)
+        return graph_data
+
+    def externalize_mindmap(self, data: Dict[str, Any], retain: bool = False) -> Dict[str, Any]:
+        """
+        Return a copy of a mindmap dict whose blocks/messages carry embedding refs.
+
+        Args:
+            data: Raw mindmap dict (Mindmap.to_dict())
+            retain: Also discard stored vectors the mindmap no longer references
+        """
+        live_keys: Set[str] = set()
+        graphs = {
+            graph_id: self.externalize_graph(graph_data, live_keys)
+            for graph_id, graph_data in data.get("graphs", {}).items()
+        }
+        if retain:
+            self.retain(live_keys)
+        return {**data, "graphs": graphs}
+
+    def internalize_mindmap(self, data: Dict[str, Any], messages: bool = True) -> Dict[str, Any]:
+        """Resolve embedding refs in a mindmap dict in-place (see internalize_graph)."""
+        for graph_data in data.get("graphs", {}).values():
+            self.internalize_graph(graph_data, messages)
+        return data
+
+    @staticmethod
+    def graph_keys(graph) -> Set[str]:
+        """Keys a loaded ConversationGraph references, without hydrating lazy messages."""
+        keys = {block_key(bid) for bid, block in graph.blocks.items() if block.embedding}
+        for message_id in graph.messages:
+            data = graph.message_data(message_id, resolve_embedding=False)
+            if data.get("embedding") or "embedding_ref" in data:
+                keys.add(message_key(message_id))
+        return keys
+
+    @staticmethod
+    def referenced_keys(data: Dict[str, Any]) -> Set[str]:
+        """Collect embedding refs from an already-externalized mindmap dict."""
+        keys: Set[str] = set()
+        for graph_data in data.get("graphs", {}).values():
+            for item in graph_data.get("blocks", {}).values():
+                if "embedding_ref" in item:
+                    keys.add(item["embedding_ref"])
+            for item in graph_data.get("messages", {}).values():
+                if "embedding_ref" in item:
+                    keys.add(item["embedding_ref"])
+        return keys
+
+
+def _stat_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,61 @@
+"""
+Small file helpers shared by the file-based backends.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+
+def write_bytes_atomic(path: Path, payload: bytes) -> None:
+    """
+    Write bytes to path atomically (temp file in the same directory, then rename).
+
+    Args:
+        path: Destination file
+        payload: Encoded file contents
+    """
+    temp_fd, temp_path = tempfile.mkstemp(
+        dir=path.parent,
+        prefix=".tmp_",
+        suffix=path.suffix
+    )
+    try:
+        with os.fdopen(temp_fd, "wb") as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise e
+
+
+def write_json_atomic(path: Path, data: Any, **dump_kwargs) -> None:
+    """
+    Write JSON to path atomically.
+    Writes to a temp file in the same directory, then renames over the target.
+
+    Args:
+        path: Destination file
+        data: JSON-serializable data
+        **dump_kwargs: Passed through to json.dump (e.g. indent)
+    """
+    # Write to temporary file in same directory (ensures same filesystem)
+    temp_fd, temp_path = tempfile.mkstemp(
+        dir=path.parent,
+        prefix=".tmp_",
+        suffix=path.suffix
+    )
+    try:
+        with os.fdopen(temp_fd, "w") as f:
+            json.dump(data, f, **dump_kwargs)
+
+        # Atomic rename (all-or-nothing on most filesystems)
+        os.replace(temp_path, path)
+    except Exception as e:
+        # Clean up temp file on error
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise e
@@ -2,93 +2,415 @@
 JSON file-based storage for conversation graphs.
 Simple, local, easy to debug and inspect.
 Atomic writes with file locking to prevent corruption.
+
+Optional journal mode: each save appends only the turn's delta to a
+JSON-lines journal next to the snapshot, and the journal is folded back
+into a fresh snapshot in the background once it grows past a threshold.
+
+Optional embedding sidecar: vectors go to a float32 file (see
+embedding_store.py) and the JSON only carries references to them.
+
+Loads are served from an in-memory cache until another process changes
+the files on disk (detected by inode/mtime/size).
+
+Optional write-behind: save() only queues a copy of the mindmap, and a
+background timer writes queued saves at most once per interval, so a
+request that saves several times pays for one write. flush() (also run
+at exit and before every load) writes them immediately.
+
+Snapshots are encoded with a pluggable codec (see codecs.py); loading
+sniffs the format, so files written by any codec keep loading.
+
+Safe across processes: reads and writes hold an fcntl lock on
+<name>.lock, the document carries a version that every save increments,
+and a save based on an older version is merged onto the newer state
+(for the last MAX_BASELINES versions; an older copy raises StaleMindmapError).
 """
 
-import json
+import atexit
 import os
 import tempfile
+from collections import OrderedDict
 from pathlib import Path
-from threading import Lock
+from threading import Lock, Thread, Timer
+from typing import Any, Dict, List, Optional, Tuple
 from models import ConversationGraph, Mindmap
+from .base import StorageBackend
+from .cache import MindmapCache, file_signature
+from .change_tracker import BaselineHistory, MindmapDelta, StaleMindmapError
+from .codecs import Codec, decode, get_codec, json_codec
+from .embedding_store import EmbeddingStore, block_key, message_key
+from .files import write_bytes_atomic
+from .locking import FileLock
 
 
-class JSONStorage:
+class JSONStorage(StorageBackend):
     """JSON file storage for conversation graphs."""
 
-    def __init__(self, file_path: str = "./data/conversation.json"):
+    def __init__(self, file_path: str = "./data/conversation.json", journal: bool = False,
+                 compact_threshold_bytes: int = 4 * 1024 * 1024, embedding_sidecar: bool = False,
+                 write_behind_interval: float = 0.0, codec: str = "auto"):
         """
         Initialize storage.
-        
+
         Args:
             file_path: Path to JSON file
+            journal: If True, append per-turn deltas instead of rewriting the file
+            compact_threshold_bytes: Journal size that triggers background compaction
+            embedding_sidecar: If True, store embeddings in a memory-mapped float32 file
+            write_behind_interval: If > 0, defer saves and write them at most once per this many seconds
+            codec: Snapshot encoding, see codecs.CODECS (any format still loads)
         """
         self.file_path = Path(file_path)
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
-        self._lock = Lock()  # Thread-safe writes
+        self.journal_path = self.file_path.with_suffix(".journal")
+        self.journal = journal
+        self.compact_threshold_bytes = compact_threshold_bytes
+        self._lock = FileLock(self.file_path.with_suffix(".lock"))  # Threads and processes
+        self._compact_lock = Lock()  # At most one compaction at a time
+        self._baselines = BaselineHistory()  # Merge bases of recent versions
+        self._embeddings = EmbeddingStore(self.file_path) if embedding_sidecar else None
+        self._cache = MindmapCache()
+        self.codec: Codec = get_codec(codec)
+        self._line_codec = json_codec()  # Journal records are always JSON lines
+        self.write_behind_interval = write_behind_interval
+        self._pending: "OrderedDict[int, Tuple[Mindmap, Mindmap]]" = OrderedDict()  # id -> (mindmap, copy)
+        self._pending_lock = Lock()
+        self._flush_lock = Lock()  # At most one flush at a time
+        self._flush_timer: Optional[Timer] = None
+        if write_behind_interval > 0:
+            atexit.register(self.flush)
+
+    def _signature(self):
+        """Version of the on-disk state: every file that load() reads."""
+        paths = [self.file_path, self.journal_path]
+        if self._embeddings is not None:
+            paths.append(self._embeddings.index_path)
+        return file_signature(*paths)
+
+    def _current(self) -> Mindmap:
+        """
+        Persisted state as a shared instance (do not mutate), re-read only if
+        another writer changed the files. Caller holds self._lock.
+        """
+        signature = self._signature()
+        shared = self._cache.peek(signature)
+        if shared is not None:
+            return shared
+        mindmap = self._read()
+        self._baselines.remember_mindmap(mindmap)
+        self._cache.put(mindmap, signature)
+        return mindmap
 
     def save(self, mindmap: Mindmap) -> None:
         """
-        Save mindmap to JSON file with atomic write.
+        Save mindmap, or queue it for the background flusher in write-behind mode.
+        Repeated saves of the same mindmap before the next flush are written once.
+
+        Args:
+            mindmap: Mindmap to save
+        """
+        if self.write_behind_interval <= 0:
+            self._save_now(mindmap)
+            return
+
+        pending_copy = mindmap.copy()  # The caller may keep mutating the original
+        with self._pending_lock:
+            self._pending[id(mindmap)] = (mindmap, pending_copy)
+            if self._flush_timer is None:
+                self._flush_timer = Timer(self.write_behind_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Write all queued saves now (shutdown, tests, and before every load)."""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = list(self._pending.values())
+                self._pending.clear()
+                timer, self._flush_timer = self._flush_timer, None
+            if timer is not None:
+                timer.cancel()
+            for mindmap, pending_copy in pending:
+                try:
+                    self._save_now(pending_copy)
+                except StaleMindmapError as e:
+                    print(f"[ERROR] Deferred save of {self.file_path} dropped: {e}")
+                    continue
+                except Exception as e:
+                    print(f"[ERROR] Deferred save of {self.file_path} failed: {e}")
+                    with self._pending_lock:
+                        self._pending.setdefault(id(mindmap), (mindmap, pending_copy))
+                    continue
+                # The original now matches the stored version, unless the save was merged
+                mindmap.version = max(mindmap.version, pending_copy.version)
+
+    def _save_now(self, mindmap: Mindmap) -> None:
+        """
+        Save mindmap with a compare-and-swap on the stored version.
         Writes to temp file first, then renames to prevent corruption.
-        
+        In journal mode only the delta since the last load/save is appended.
+
+        If another thread or process saved since this mindmap was loaded, its
+        changes are merged onto the newer stored state instead of overwriting
+        it. The mindmap then keeps its old version, so a later save from it is
+        merged again (harmless, merges are idempotent).
+
         Args:
             mindmap: Mindmap to save
+
+        Raises:
+            StaleMindmapError: The mindmap is older than every remembered merge base
         """
-        data = mindmap.to_dict()
-        
         with self._lock:
-            # Write to temporary file in same directory (ensures same filesystem)
-            temp_fd, temp_path = tempfile.mkstemp(
-                dir=self.file_path.parent,
-                prefix=".tmp_",
-                suffix=".json"
-            )
+            if self._embeddings is not None:
+                self._embeddings.open()  # Pick up vectors other processes appended
+            current = self._current()
+            base = self._baselines.base(mindmap, current.version, lambda: current)
+            delta = base.diff(mindmap)
+            if delta.is_empty():
+                return
+            if current.version != mindmap.version:
+                self._save_merged(base.rebase(delta, current), current, mindmap.version)
+                return
+
+            version = current.version + 1
+            if self.journal and self.file_path.exists():
+                self._append_record(version, delta)
+                saved_path = self.journal_path
+            else:
+                data = mindmap.to_dict()
+                data["version"] = version
+                self._write_full(data)
+                saved_path = self.file_path
+            tracker = base.copy()
+            tracker.apply(delta)
+            mindmap.version = version
+            self._baselines.remember(version, tracker)
+            self._cache.put(mindmap, self._signature())
+            print(f"[SAVED] {saved_path} (version {version})")
+            journal_size = self.journal_path.stat().st_size if saved_path == self.journal_path else 0
+
+        if journal_size >= self.compact_threshold_bytes:
+            Thread(target=self.compact, daemon=True).start()
+
+    def _save_merged(self, delta: MindmapDelta, current: Mindmap, base_version: int) -> None:
+        """Write a rebased delta on top of the newer stored state (caller holds self._lock)."""
+        version = current.version + 1
+        data = current.to_dict()
+        delta.apply_to(data)
+        data["version"] = version
+        if self.journal and self.file_path.exists():
+            self._append_record(version, delta)
+        else:
+            self._write_full(data)
+        merged = Mindmap.from_dict(data)
+        for graph in merged.graphs.values():
+            graph.rebuild_children()
+        self._baselines.remember_mindmap(merged)
+        self._cache.put(merged, self._signature())
+        print(f"[MERGED] {self.file_path} (version {base_version} onto {current.version} -> {version})")
+
+    def _write_full(self, data: Dict[str, Any]) -> None:
+        self._write_snapshot(self._externalize(data))
+        if self.journal_path.exists():
+            # The full snapshot supersedes any journal left over from journal mode
+            os.remove(self.journal_path)
+
+    def _append_record(self, seq: int, delta: MindmapDelta) -> None:
+        record = {"seq": seq, **self._externalize_record(delta.to_dict())}
+        with open(self.journal_path, "ab") as f:
+            f.write(self._line_codec.dumps(record) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, data: Dict[str, Any]) -> None:
+        write_bytes_atomic(self.file_path, self.codec.dumps(data))
+
+    def _externalize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Move embeddings of a full mindmap dict to the sidecar (vectors are flushed first)."""
+        if self._embeddings is None:
+            return data
+        data = self._embeddings.externalize_mindmap(data, retain=True)
+        self._embeddings.flush()
+        return data
+
+    def _externalize_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Move embeddings of a journal record to the sidecar (vectors are flushed first)."""
+        if self._embeddings is None:
+            return record
+        store = self._embeddings
+        record = dict(record)
+        if "blocks" in record:
+            record["blocks"] = {
+                gid: [store.externalize_item(b, block_key(b["block_id"])) for b in blocks]
+                for gid, blocks in record["blocks"].items()
+            }
+        if "messages" in record:
+            record["messages"] = {
+                gid: [store.externalize_item(m, message_key(m["message_id"])) for m in messages]
+                for gid, messages in record["messages"].items()
+            }
+        for block_ids in record.get("deleted_blocks", {}).values():
+            for block_id in block_ids:
+                store.discard(block_key(block_id))
+        for message_ids in record.get("deleted_messages", {}).values():
+            for message_id in message_ids:
+                store.discard(message_key(message_id))
+        store.flush()
+        return record
+
+    def compact(self) -> None:
+        """
+        Fold the journal into a fresh snapshot.
+        Replay happens outside the write lock, so saves keep appending meanwhile;
+        only records included in the new snapshot are dropped from the journal.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return  # Another compaction is already running
+        try:
+            with self._lock:
+                snapshot_signature = file_signature(self.file_path)
+                data = self._read_snapshot()
+                records = self._read_journal(after_seq=data.pop("journal_seq", 0))
+            if not records:
+                return
+
+            upto = records[-1][0]
+            for _, delta in records:
+                delta.apply_to(data)
+            data["journal_seq"] = upto
+            data["version"] = max(data.get("version", 0), upto)
+
+            with self._lock:
+                if file_signature(self.file_path) != snapshot_signature:
+                    return  # Another process compacted or rewrote the snapshot meanwhile
+                cached = self._cache.peek(self._signature())
+                self._write_snapshot(data)
+                remaining = [
+                    line for line in self._read_journal_lines()
+                    if self._record_seq(line) > upto
+                ]
+                temp_fd, temp_path = tempfile.mkstemp(
+                    dir=self.file_path.parent,
+                    prefix=".tmp_",
+                    suffix=".journal"
+                )
+                with os.fdopen(temp_fd, "wb") as f:
+                    f.writelines(remaining)
+                os.replace(temp_path, self.journal_path)
+                if self._embeddings is not None:
+                    # Vectors referenced by neither the new snapshot nor the rest of the journal are garbage
+                    live_keys = self._embeddings.referenced_keys(data)
+                    for _, delta in self._read_journal(after_seq=upto):
+                        for items in [*delta.blocks.values(), *delta.messages.values()]:
+                            live_keys.update(i["embedding_ref"] for i in items if "embedding_ref" in i)
+                    self._embeddings.retain(live_keys)
+                    self._embeddings.flush()
+                if cached is not None:
+                    # Same logical state, new files: keep serving it from memory
+                    self._cache.put(cached, self._signature())
+            print(f"[COMPACTED] {self.file_path} (through seq {upto})")
+        finally:
+            self._compact_lock.release()
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        """Read the snapshot as a raw mindmap dict (legacy single-graph files are wrapped)."""
+        if not self.file_path.exists():
+            return {}
+        with open(self.file_path, "rb") as f:
+            data = decode(f.read())
+        if data and "graphs" not in data:
+            graph = ConversationGraph.from_dict(data)
+            mindmap = Mindmap()
+            mindmap.add_graph(graph)
+            data = mindmap.to_dict()
+        return data
+
+    def _read_journal_lines(self) -> List[bytes]:
+        if not self.journal_path.exists():
+            return []
+        with open(self.journal_path, "rb") as f:
+            return f.readlines()
+
+    def _record_seq(self, line: bytes) -> int:
+        try:
+            return self._line_codec.loads(line).get("seq", 0)
+        except ValueError:
+            return 0
+
+    def _read_journal(self, after_seq: int = 0) -> List[Tuple[int, MindmapDelta]]:
+        """Parse journal records newer than after_seq, stopping at a torn final line."""
+        records = []
+        for line in self._read_journal_lines():
             try:
-                with os.fdopen(temp_fd, "w") as f:
-                    json.dump(data, f, indent=2)
-                
-                # Atomic rename (all-or-nothing on most filesystems)
-                os.replace(temp_path, self.file_path)
-                print(f"[SAVED] {self.file_path}")
-            except Exception as e:
-                # Clean up temp file on error
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                raise e
+                record = self._line_codec.loads(line)
+            except ValueError:
+                print(f"[WARN] Ignoring incomplete journal record in {self.journal_path}")
+                break
+            seq = record.pop("seq", 0)
+            if seq > after_seq:
+                records.append((seq, MindmapDelta.from_dict(record)))
+        return records
 
     def load(self) -> Mindmap:
         """
-        Load conversation graph from JSON file (thread-safe).
-        
+        Load conversation graph from JSON file (thread- and process-safe).
+        In journal mode the journal is replayed on top of the snapshot.
+
         Returns:
             Loaded Mindmap, or empty mindmap if file doesn't exist
         """
+        if self._pending:
+            self.flush()  # Read-your-writes within the process
         with self._lock:
-            if not self.file_path.exists():
-                return Mindmap()
-            
-            try:
-                with open(self.file_path, "r") as f:
-                    data = json.load(f)
-            except json.JSONDecodeError:
-                print(f"[ERROR] Corrupted JSON in {self.file_path}, returning empty mindmap")
-                return Mindmap()
-            
-            if "graphs" in data:
-                mindmap = Mindmap.from_dict(data)
-            for graph in mindmap.graphs.values():
-                graph.rebuild_children()
-            return mindmap
-
-        graph = ConversationGraph.from_dict(data)
-        graph.rebuild_children()
-        mindmap = Mindmap()
-        mindmap.add_graph(graph)
+            return self._current().copy()
+
+    def snapshot(self) -> Mindmap:
+        """Shared cached mindmap (reloaded only if the files changed). Do not mutate it."""
+        if self._pending:
+            self.flush()
+        with self._lock:
+            return self._current()
+
+    def _read(self) -> Mindmap:
+        """Parse the snapshot and replay the journal (caller holds self._lock)."""
+        if not self.file_path.exists():
+            return Mindmap()
+
+        try:
+            data = self._read_snapshot()
+        except ValueError:
+            print(f"[ERROR] Corrupted data in {self.file_path}, returning empty mindmap")
+            return Mindmap()
+
+        version = data.get("version", 0)
+        for seq, delta in self._read_journal(after_seq=data.pop("journal_seq", 0)):
+            delta.apply_to(data)
+            version = max(version, seq)
+        data["version"] = version
+
+        resolver = None
+        if self._embeddings is not None:
+            self._embeddings.open()
+            self._embeddings.internalize_mindmap(data, messages=False)
+            resolver = self._embeddings.internalize_item
+        mindmap = Mindmap.from_dict(data, resolver)
+        for graph in mindmap.graphs.values():
+            graph.rebuild_children()
         return mindmap
 
     def clear(self) -> None:
-        """Delete the storage file (thread-safe)."""
+        """Delete the storage file and journal (thread-safe). Queued saves are dropped."""
+        with self._pending_lock:
+            self._pending.clear()
         with self._lock:
-            if self.file_path.exists():
-                os.remove(self.file_path)
-                print(f"[CLEARED] {self.file_path}")
+            for path in (self.file_path, self.journal_path):
+                if path.exists():
+                    os.remove(path)
+                    print(f"[CLEARED] {path}")
+            if self._embeddings is not None:
+                self._embeddings.clear()
+            self._cache.invalidate()
+            self._baselines.clear()
+
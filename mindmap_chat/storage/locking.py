@@ -0,0 +1,56 @@
+"""
+Cross-process file locking for the file-based backends.
+Uses fcntl advisory locks where available (Linux/macOS), so several uvicorn
+workers or a CLI session sharing one data directory serialize their writes.
+"""
+
+import os
+from pathlib import Path
+from threading import RLock
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class FileLock:
+    """
+    Exclusive lock held by one thread of one process at a time.
+
+    Re-entrant within the owning thread, so locked methods can call each other.
+    The lock file (<name>.lock) is created on first use and never deleted.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Lock file path
+        """
+        self.path = Path(path)
+        self._thread_lock = RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except Exception:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
@@ -0,0 +1,340 @@
+"""
+Per-graph sharded JSON storage.
+Each graph lives in its own file, and a small manifest holds titles, counts
+and the current graph, so listings never parse blocks or messages and a chat
+turn only rewrites the graph it touched. Parsed shards are cached in memory
+until their file changes on disk. The manifest carries a version bumped by
+every write, so a save made from an older load is merged onto the shards
+another writer saved since instead of overwriting them (a load older than the
+last MAX_BASELINES versions raises StaleMindmapError).
+
+Layout:
+    <dir>/manifest.json
+    <dir>/graphs/<graph_id>.json  (encoded with the configured codec)
+    <dir>/embeddings.*           (optional float32 embedding sidecar)
+    <dir>.shards.lock            (cross-process write lock)
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from models import ConversationGraph, GraphSummary, Mindmap
+from .base import StorageBackend
+from .cache import GraphCache, file_signature
+from .change_tracker import BaselineHistory, ChangeTracker, MindmapDelta
+from .codecs import Codec, decode, get_codec
+from .embedding_store import EmbeddingStore, block_key, message_key
+from .files import write_bytes_atomic, write_json_atomic
+from .json_storage import JSONStorage
+from .locking import FileLock
+
+
+class ShardedStorage(StorageBackend):
+    """JSON storage with one file per graph plus a manifest."""
+
+    def __init__(self, dir_path: str = "./data/conversation", legacy_file_path: Optional[str] = None,
+                 embedding_sidecar: bool = False, codec: str = "auto"):
+        """
+        Initialize storage.
+
+        Args:
+            dir_path: Directory holding the manifest and graph shards
+            legacy_file_path: Single-file conversation.json to migrate on first load
+            embedding_sidecar: If True, store embeddings in a memory-mapped float32 file
+            codec: Shard encoding, see codecs.CODECS (the manifest stays indented JSON)
+        """
+        self.dir_path = Path(dir_path)
+        self.graphs_path = self.dir_path / "graphs"
+        self.manifest_path = self.dir_path / "manifest.json"
+        self.graphs_path.mkdir(parents=True, exist_ok=True)
+        self.legacy_file_path = Path(legacy_file_path) if legacy_file_path else None
+        self._lock = FileLock(self.dir_path.with_suffix(".shards.lock"))  # Threads and processes
+        self._baselines = BaselineHistory()  # Merge bases of recent versions
+        self._embeddings = EmbeddingStore(self.dir_path / "embeddings") if embedding_sidecar else None
+        self._graph_cache = GraphCache()
+        self.codec: Codec = get_codec(codec)
+
+    def _shard_path(self, graph_id: str) -> Path:
+        return self.graphs_path / f"{graph_id}.json"
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            print(f"[ERROR] Corrupted manifest {self.manifest_path}, treating as empty")
+            return {}
+
+    def _read_shard(self, graph_id: str) -> Optional[ConversationGraph]:
+        path = self._shard_path(graph_id)
+        signature = file_signature(path)
+        cached = self._graph_cache.get(graph_id, signature)
+        if cached is not None:
+            return cached
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = decode(f.read())
+        except ValueError:
+            print(f"[ERROR] Corrupted graph shard {path}, skipping")
+            return None
+        resolver = None
+        if self._embeddings is not None:
+            self._embeddings.internalize_graph(data, messages=False)
+            resolver = self._embeddings.internalize_item
+        graph = ConversationGraph.from_dict(data, resolver)
+        graph.rebuild_children()
+        self._graph_cache.put(graph, signature)
+        return graph
+
+    def _write_shard(self, graph: ConversationGraph) -> None:
+        data = graph.to_dict()
+        if self._embeddings is not None:
+            data = self._embeddings.externalize_graph(data)
+            self._embeddings.flush()
+        path = self._shard_path(graph.graph_id)
+        write_bytes_atomic(path, self.codec.dumps(data))
+        self._graph_cache.put(graph, file_signature(path))
+
+    def _remove_shard(self, graph_id: str) -> None:
+        """
+        Delete a graph's shard and its sidecar vectors (caller holds self._lock,
+        so no other writer is between flushing vectors and listing them).
+        """
+        if self._embeddings is not None:
+            graph = self._read_shard(graph_id)
+            if graph is not None:
+                for key in self._embeddings.graph_keys(graph):
+                    self._embeddings.discard(key)
+                self._embeddings.flush()
+        self._graph_cache.discard(graph_id)
+        path = self._shard_path(graph_id)
+        if path.exists():
+            os.remove(path)
+
+    def _write_manifest(self, mindmap_fields: Dict[str, Any], graphs: Dict[str, Dict[str, Any]]) -> int:
+        """Write the manifest with its version bumped; returns the new version."""
+        version = mindmap_fields.get("version", 0) + 1
+        write_json_atomic(self.manifest_path, {**mindmap_fields, "version": version, "graphs": graphs}, indent=2)
+        return version
+
+    @staticmethod
+    def _manifest_entry(graph: ConversationGraph) -> Dict[str, Any]:
+        summary = GraphSummary.from_graph(graph).to_dict()
+        del summary["graph_id"], summary["is_current"]
+        summary["block_ids"] = list(graph.blocks)
+        return summary
+
+    def save(self, mindmap: Mindmap) -> None:
+        """
+        Rewrite only the shards of graphs that changed since the version this
+        mindmap was loaded from, then the manifest.
+
+        If another thread or process saved since, the changes are merged onto
+        the stored shards instead of overwriting them. The mindmap then keeps
+        its old version, so a later save from it is merged again (harmless,
+        merges are idempotent).
+
+        Args:
+            mindmap: Mindmap to save
+
+        Raises:
+            StaleMindmapError: The mindmap is older than every remembered merge base
+        """
+        with self._lock:
+            if self._embeddings is not None:
+                self._embeddings.open()  # Pick up vectors other processes appended
+            manifest = self._read_manifest()
+            stored_version = manifest.get("version", 0)
+            base = self._baselines.base(mindmap, stored_version, self.load)
+            delta = base.diff(mindmap)
+            if delta.is_empty():
+                return
+
+            merged = stored_version != mindmap.version
+            if merged:
+                graphs = self._merge_shards(base, delta)
+            else:
+                graphs = {gid: mindmap.graphs[gid] for gid in delta.touched_graph_ids()}
+
+            if self._embeddings is not None:
+                for block_ids in delta.deleted_blocks.values():
+                    for block_id in block_ids:
+                        self._embeddings.discard(block_key(block_id))
+                for message_ids in delta.deleted_messages.values():
+                    for message_id in message_ids:
+                        self._embeddings.discard(message_key(message_id))
+            for graph in graphs.values():
+                self._write_shard(graph)
+            entries = manifest.pop("graphs", {})
+            for graph_id in delta.deleted_graphs:
+                entries.pop(graph_id, None)
+                self._remove_shard(graph_id)
+            for graph_id, graph in graphs.items():
+                entries[graph_id] = self._manifest_entry(graph)
+            if delta.mindmap:
+                manifest.update(delta.mindmap)
+            version = self._write_manifest(manifest, entries)
+
+            if merged:
+                print(f"[MERGED] {self.dir_path} (version {mindmap.version} onto {stored_version} -> {version})")
+                return
+            tracker = base.copy()
+            tracker.apply(delta)
+            mindmap.version = version
+            self._baselines.remember(version, tracker)
+            print(f"[SAVED] {self.dir_path} ({len(graphs)} graph(s))")
+
+    def _merge_shards(self, base: ChangeTracker, delta: MindmapDelta) -> Dict[str, ConversationGraph]:
+        """
+        Rebase a delta onto the stored shards of the graphs it touches (caller
+        holds self._lock).
+
+        Returns:
+            graph_id -> merged graph to write (graphs deleted meanwhile are skipped)
+        """
+        current = Mindmap()
+        for graph_id in delta.touched_graph_ids():
+            graph = self._read_shard(graph_id)
+            if graph is not None:
+                current.graphs[graph_id] = graph
+        delta = base.rebase(delta, current)
+        data = {"graphs": {gid: graph.to_dict() for gid, graph in current.graphs.items()}}
+        delta.apply_to(data)
+        graphs = {}
+        for graph_id in delta.touched_graph_ids():
+            if graph_id in data["graphs"]:
+                graph = ConversationGraph.from_dict(data["graphs"][graph_id])
+                graph.rebuild_children()
+                graphs[graph_id] = graph
+        return graphs
+
+    def load(self) -> Mindmap:
+        """
+        Load every graph listed in the manifest (thread-safe).
+        Migrates a legacy single-file store the first time.
+
+        Returns:
+            Loaded Mindmap, or empty mindmap if nothing is stored
+        """
+        if not self.manifest_path.exists() and self.legacy_file_path and self.legacy_file_path.exists():
+            self._migrate_legacy()
+
+        with self._lock:
+            manifest = self._read_manifest()
+            if self._embeddings is not None:
+                self._embeddings.open()
+            graphs = {}
+            for graph_id in manifest.get("graphs", {}):
+                graph = self._read_shard(graph_id)
+                if graph:
+                    graphs[graph_id] = graph
+
+            mindmap = Mindmap(version=manifest.get("version", 0))
+            if manifest:
+                mindmap.mindmap_id = manifest.get("mindmap_id", mindmap.mindmap_id)
+                mindmap.metadata = manifest.get("metadata", {})
+            mindmap.graphs = graphs
+            current_graph_id = manifest.get("current_graph_id", "")
+            mindmap.current_graph_id = current_graph_id if current_graph_id in graphs else ""
+            if mindmap.version not in self._baselines:
+                self._baselines.remember_mindmap(mindmap)
+            return mindmap
+
+    def _migrate_legacy(self) -> None:
+        mindmap = JSONStorage(str(self.legacy_file_path)).load()
+        mindmap.version = 0  # Versions restart with the manifest
+        self.save(mindmap)
+        # Keep the original around, but out of the way so it is not migrated twice
+        os.replace(self.legacy_file_path, self.legacy_file_path.with_suffix(".json.migrated"))
+        print(f"[MIGRATED] {self.legacy_file_path} -> {self.dir_path}")
+
+    def list_graph_summaries(self) -> List[GraphSummary]:
+        """List graphs from the manifest only."""
+        if not self.manifest_path.exists() and self.legacy_file_path and self.legacy_file_path.exists():
+            self._migrate_legacy()
+        manifest = self._read_manifest()
+        current_graph_id = manifest.get("current_graph_id", "")
+        return [
+            GraphSummary(
+                graph_id=graph_id,
+                title=entry.get("title", "Untitled"),
+                root_block_id=entry.get("root_block_id", ""),
+                block_count=entry.get("block_count", 0),
+                message_count=entry.get("message_count", 0),
+                is_current=graph_id == current_graph_id,
+            )
+            for graph_id, entry in manifest.get("graphs", {}).items()
+        ]
+
+    def load_graph(self, graph_id: str) -> Optional[ConversationGraph]:
+        """Load one graph shard."""
+        with self._lock:
+            if self._embeddings is not None:
+                self._embeddings.open()
+            return self._read_shard(graph_id)
+
+    def find_graph_for_block(self, block_id: str) -> Optional[str]:
+        """Look a block up in the manifest's block index."""
+        for graph_id, entry in self._read_manifest().get("graphs", {}).items():
+            if block_id in entry.get("block_ids", ()):
+                return graph_id
+        return None
+
+    def save_graph(self, graph: ConversationGraph, make_current: bool = False) -> None:
+        """Write one graph shard and update its manifest entry."""
+        with self._lock:
+            if self._embeddings is not None:
+                self._embeddings.open()  # Pick up vectors other processes appended
+            self._write_shard(graph)
+            manifest = self._read_manifest()
+            graphs = manifest.pop("graphs", {})
+            graphs[graph.graph_id] = self._manifest_entry(graph)
+            if make_current:
+                manifest["current_graph_id"] = graph.graph_id
+            self._write_manifest(manifest, graphs)
+            print(f"[SAVED] {self._shard_path(graph.graph_id)}")
+
+    def set_current_graph(self, graph_id: str) -> bool:
+        """Update the current graph in the manifest only."""
+        with self._lock:
+            manifest = self._read_manifest()
+            graphs = manifest.pop("graphs", {})
+            if graph_id not in graphs:
+                return False
+            manifest["current_graph_id"] = graph_id
+            self._write_manifest(manifest, graphs)
+            return True
+
+    def delete_graph(self, graph_id: str) -> str:
+        """Remove one graph shard and its manifest entry."""
+        with self._lock:
+            manifest = self._read_manifest()
+            graphs = manifest.pop("graphs", {})
+            if graph_id not in graphs:
+                raise KeyError(graph_id)
+            del graphs[graph_id]
+            if self._embeddings is not None:
+                self._embeddings.open()  # Pick up vectors other processes appended
+            if manifest.get("current_graph_id") == graph_id:
+                manifest["current_graph_id"] = next(iter(graphs.keys()), "")
+            self._write_manifest(manifest, graphs)
+            self._remove_shard(graph_id)
+            return manifest.get("current_graph_id", "")
+
+    def clear(self) -> None:
+        """Delete the manifest and all shards (thread-safe)."""
+        with self._lock:
+            if self._embeddings is not None:
+                self._embeddings.clear()
+            self._graph_cache.invalidate()
+            if self.dir_path.exists():
+                shutil.rmtree(self.dir_path)
+                print(f"[CLEARED] {self.dir_path}")
+            self.graphs_path.mkdir(parents=True, exist_ok=True)
+            self._baselines.clear()
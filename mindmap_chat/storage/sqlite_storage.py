@@ -0,0 +1,342 @@
+"""
+SQLite storage for conversation graphs.
+One row per graph, block and message, so a chat turn only upserts the rows it touched.
+A version counter bumped by every save lets loads be served from memory, and
+lets a save made from an older load merge onto rows another writer saved since
+(a load older than the last MAX_BASELINES versions raises StaleMindmapError).
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from models import ConversationGraph, GraphSummary, Mindmap
+from .base import StorageBackend
+from .cache import MindmapCache
+from .change_tracker import BaselineHistory, MindmapDelta
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mindmap (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS graphs (
+    graph_id TEXT PRIMARY KEY,
+    root_block_id TEXT NOT NULL DEFAULT '',
+    current_block_id TEXT NOT NULL DEFAULT '',
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    block_id TEXT PRIMARY KEY,
+    graph_id TEXT NOT NULL,
+    parent_block_id TEXT,
+    title TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    graph_id TEXT NOT NULL,
+    block_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blocks_graph ON blocks (graph_id);
+CREATE INDEX IF NOT EXISTS idx_messages_graph ON messages (graph_id);
+"""
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite storage for conversation graphs with row-level incremental saves."""
+
+    def __init__(self, file_path: str = "./data/conversation.db"):
+        """
+        Initialize storage and create tables if needed.
+
+        Args:
+            file_path: Path to SQLite database file
+        """
+        self.file_path = Path(file_path)
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()  # Thread-safe writes
+        self._baselines = BaselineHistory()  # Merge bases of recent versions
+        self._cache = MindmapCache()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.file_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _current(self, conn: sqlite3.Connection) -> Mindmap:
+        """
+        Persisted state as a shared instance (do not mutate), re-read only if
+        another writer bumped the version. Caller holds self._lock.
+        """
+        version = self._read_version(conn)
+        shared = self._cache.peek(version)
+        if shared is None:
+            shared = self._read(conn, version)
+            self._cache.put(shared, version)
+        if version not in self._baselines:
+            self._baselines.remember_mindmap(shared)
+        return shared
+
+    def save(self, mindmap: Mindmap) -> None:
+        """
+        Upsert only the graphs, blocks and messages that changed since the
+        version this mindmap was loaded from. Everything is written in a single
+        transaction.
+
+        If another thread or process saved since, the changes are merged onto
+        the newer rows instead of deleting what that writer added. The mindmap
+        then keeps its old version, so a later save from it is merged again
+        (harmless, merges are idempotent).
+
+        Args:
+            mindmap: Mindmap to save
+
+        Raises:
+            StaleMindmapError: The mindmap is older than every remembered merge base
+        """
+        with self._lock:
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")  # Hold the write lock across the version check
+                    current = self._current(conn)
+                    base = self._baselines.base(mindmap, current.version, lambda: current)
+                    delta = base.diff(mindmap)
+                    if delta.is_empty():
+                        return
+                    merged = current.version != mindmap.version
+                    if merged:
+                        delta = base.rebase(delta, current)
+                    self._write_delta(conn, delta)
+                    version = self._bump_version(conn)
+
+            if merged:
+                data = current.to_dict()
+                delta.apply_to(data)
+                data["version"] = version
+                saved = Mindmap.from_dict(data)
+                for graph in saved.graphs.values():
+                    graph.rebuild_children()
+                self._baselines.remember_mindmap(saved)
+                print(f"[MERGED] {self.file_path} (version {mindmap.version} onto {current.version} -> {version})")
+            else:
+                saved = mindmap
+                tracker = base.copy()
+                tracker.apply(delta)
+                mindmap.version = version
+                self._baselines.remember(version, tracker)
+                print(f"[SAVED] {self.file_path}")
+            self._cache.put(saved, version)
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection) -> int:
+        conn.execute(
+            "INSERT INTO mindmap (key, value) VALUES ('version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        return SQLiteStorage._read_version(conn)
+
+    @staticmethod
+    def _read_version(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM mindmap WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _write_delta(self, conn: sqlite3.Connection, delta: MindmapDelta) -> None:
+        if delta.mindmap is not None:
+            conn.executemany(
+                "INSERT INTO mindmap (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                [(key, json.dumps(value)) for key, value in delta.mindmap.items()],
+            )
+
+        for graph_id in delta.deleted_graphs:
+            conn.execute("DELETE FROM messages WHERE graph_id = ?", (graph_id,))
+            conn.execute("DELETE FROM blocks WHERE graph_id = ?", (graph_id,))
+            conn.execute("DELETE FROM graphs WHERE graph_id = ?", (graph_id,))
+
+        conn.executemany(
+            "INSERT INTO graphs (graph_id, root_block_id, current_block_id, metadata) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(graph_id) DO UPDATE SET "
+            "root_block_id = excluded.root_block_id, "
+            "current_block_id = excluded.current_block_id, "
+            "metadata = excluded.metadata",
+            [
+                (gid, h["root_block_id"], h["current_block_id"], json.dumps(h["metadata"]))
+                for gid, h in delta.graphs.items()
+            ],
+        )
+
+        for graph_id, block_ids in delta.deleted_blocks.items():
+            conn.executemany("DELETE FROM blocks WHERE block_id = ?", [(bid,) for bid in block_ids])
+        for graph_id, blocks in delta.blocks.items():
+            conn.executemany(
+                "INSERT INTO blocks (block_id, graph_id, parent_block_id, title, data) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(block_id) DO UPDATE SET "
+                "graph_id = excluded.graph_id, "
+                "parent_block_id = excluded.parent_block_id, "
+                "title = excluded.title, "
+                "data = excluded.data",
+                [
+                    (b["block_id"], graph_id, b["parent_block_id"], b["title"], json.dumps(b))
+                    for b in blocks
+                ],
+            )
+
+        for graph_id, message_ids in delta.deleted_messages.items():
+            conn.executemany("DELETE FROM messages WHERE message_id = ?", [(mid,) for mid in message_ids])
+        for graph_id, messages in delta.messages.items():
+            conn.executemany(
+                "INSERT INTO messages (message_id, graph_id, block_id, role, timestamp, data) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(message_id) DO UPDATE SET data = excluded.data",
+                [
+                    (m["message_id"], graph_id, m["block_id"], m["role"], m["timestamp"], json.dumps(m))
+                    for m in messages
+                ],
+            )
+
+    def load(self) -> Mindmap:
+        """
+        Load the mindmap from the database (thread-safe).
+        Rows come back in insertion order, matching the JSON backend.
+
+        Returns:
+            Loaded Mindmap, or empty mindmap if the database is empty
+        """
+        with self._lock:
+            with closing(self._connect()) as conn:
+                return self._current(conn).copy()
+
+    def _read(self, conn: sqlite3.Connection, version: int) -> Mindmap:
+        """Read every row into a Mindmap stamped with version."""
+        header = {
+            key: json.loads(value)
+            for key, value in conn.execute("SELECT key, value FROM mindmap WHERE key != 'version'")
+        }
+        graphs: Dict[str, Dict[str, Any]] = {}
+        for graph_id, root_id, current_id, metadata in conn.execute(
+            "SELECT graph_id, root_block_id, current_block_id, metadata FROM graphs ORDER BY rowid"
+        ):
+            graphs[graph_id] = {
+                "graph_id": graph_id,
+                "root_block_id": root_id,
+                "current_block_id": current_id,
+                "metadata": json.loads(metadata),
+                "blocks": {},
+                "messages": {},
+            }
+        for graph_id, block_id, data in conn.execute(
+            "SELECT graph_id, block_id, data FROM blocks ORDER BY rowid"
+        ):
+            if graph_id in graphs:
+                graphs[graph_id]["blocks"][block_id] = json.loads(data)
+        for graph_id, message_id, data in conn.execute(
+            "SELECT graph_id, message_id, data FROM messages ORDER BY rowid"
+        ):
+            if graph_id in graphs:
+                graphs[graph_id]["messages"][message_id] = json.loads(data)
+
+        if not header and not graphs:
+            return Mindmap(version=version)
+
+        mindmap = Mindmap.from_dict({**header, "graphs": graphs, "version": version})
+        for graph in mindmap.graphs.values():
+            graph.rebuild_children()
+        return mindmap
+
+    def snapshot(self) -> Mindmap:
+        """Shared cached mindmap (reloaded only if the version changed). Do not mutate it."""
+        with closing(self._connect()) as conn:
+            version = self._read_version(conn)
+        shared = self._cache.peek(version)
+        if shared is not None:
+            return shared
+        mindmap = self.load()
+        return self._cache.peek(version) or mindmap
+
+    def list_graph_summaries(self) -> List[GraphSummary]:
+        """List graphs with a single aggregate query (no block/message payloads)."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM mindmap WHERE key = 'current_graph_id'").fetchone()
+            current_graph_id = json.loads(row[0]) if row else ""
+            rows = conn.execute(
+                "SELECT g.graph_id, g.root_block_id, "
+                "(SELECT title FROM blocks WHERE block_id = g.root_block_id), "
+                "(SELECT COUNT(*) FROM blocks WHERE graph_id = g.graph_id), "
+                "(SELECT COUNT(*) FROM messages WHERE graph_id = g.graph_id) "
+                "FROM graphs g ORDER BY g.rowid"
+            ).fetchall()
+        return [
+            GraphSummary(
+                graph_id=graph_id,
+                title=title or "Untitled",
+                root_block_id=root_block_id,
+                block_count=block_count,
+                message_count=message_count,
+                is_current=graph_id == current_graph_id,
+            )
+            for graph_id, root_block_id, title, block_count, message_count in rows
+        ]
+
+    def load_graph(self, graph_id: str) -> Optional[ConversationGraph]:
+        """Load one graph's rows."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT root_block_id, current_block_id, metadata FROM graphs WHERE graph_id = ?",
+                (graph_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            blocks = {
+                block_id: json.loads(data)
+                for block_id, data in conn.execute(
+                    "SELECT block_id, data FROM blocks WHERE graph_id = ? ORDER BY rowid", (graph_id,)
+                )
+            }
+            messages = {
+                message_id: json.loads(data)
+                for message_id, data in conn.execute(
+                    "SELECT message_id, data FROM messages WHERE graph_id = ? ORDER BY rowid", (graph_id,)
+                )
+            }
+        graph = ConversationGraph.from_dict({
+            "graph_id": graph_id,
+            "root_block_id": row[0],
+            "current_block_id": row[1],
+            "metadata": json.loads(row[2]),
+            "blocks": blocks,
+            "messages": messages,
+        })
+        graph.rebuild_children()
+        return graph
+
+    def find_graph_for_block(self, block_id: str) -> Optional[str]:
+        """Look the block up by primary key."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT graph_id FROM blocks WHERE block_id = ?", (block_id,)).fetchone()
+        return row[0] if row else None
+
+    def clear(self) -> None:
+        """Delete the database file (thread-safe)."""
+        with self._lock:
+            for suffix in ("", "-wal", "-shm"):
+                path = Path(f"{self.file_path}{suffix}")
+                if path.exists():
+                    os.remove(path)
+            self._baselines.clear()
+            self._cache.invalidate()
+            with closing(self._connect()) as conn:
+                conn.executescript(SCHEMA)
+            print(f"[CLEARED] {self.file_path}")
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup: make the mindmap_chat modules importable the way the
+CLI runs them (top-level imports such as `from config import config`) and
+keep the tests off the disk-backed embedding cache.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("MINDMAP_EMBEDDING_CACHE", "0")
+os.environ.setdefault("MINDMAP_RESPONSE_CACHE", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,70 @@
+"""Offline stand-ins for LLM providers."""
+
+import hashlib
+import json
+import random
+from typing import List
+
+from llm.base import LLMClient
+from models import Block, ConversationGraph, ConversationMessage, Mindmap
+
+
+class FakeLLM(LLMClient):
+    """
+    Deterministic client: call_json replies classify every message as
+    next_action, embeddings are seeded by the text. Records every provider
+    request in calls/embeds.
+    """
+
+    def __init__(self, dim: int = 64, next_action: str = "CONTINUE"):
+        self.dim = dim
+        self.next_action = next_action
+        self.embedding_model = "fake-embedding"
+        self.model_name = "fake"
+        self.calls: List[str] = []
+        self.embeds = 0
+
+    def call(self, prompt: str, json_mode: bool = False) -> str:
+        self.calls.append(prompt)
+        if json_mode:
+            return json.dumps({
+                "classification": self.next_action,
+                "confidence": 0.5,
+                "reasoning": "fake",
+                "new_blocks": [{"title": "Child", "intent": "Child intent"}],
+                "title": "Topic",
+                "intent": "Topic intent",
+                "summary": "summary",
+                "key_points": [],
+                "open_questions": [],
+            })
+        return "reply"
+
+    def _embed(self, text: str) -> list[float]:
+        self.embeds += 1
+        rng = random.Random(int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16))
+        return [rng.gauss(0, 1) for _ in range(self.dim)]
+
+
+def sample_mindmap(blocks: int = 2, messages_per_block: int = 2) -> Mindmap:
+    """One graph with a root block, children, and user/assistant messages in each block."""
+    graph = ConversationGraph()
+    parent = None
+    for b in range(blocks):
+        block = Block(parent_block_id=parent, title=f"Block {b}", intent=f"Intent {b}")
+        graph.add_block(block)
+        parent = parent or block.block_id
+        for m in range(messages_per_block):
+            add_message(graph, block.block_id, f"block {b} message {m}")
+    graph.current_block_id = graph.root_block_id
+    mindmap = Mindmap()
+    mindmap.add_graph(graph)
+    return mindmap
+
+
+def add_message(graph: ConversationGraph, block_id: str, content: str) -> ConversationMessage:
+    """Append a message to a block the way BlockManager does."""
+    message = ConversationMessage(block_id=block_id, role="user", content=content)
+    graph.add_message(message)
+    graph.blocks[block_id].add_message_ref(message.message_id)
+    return message
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+from conversation import ConversationManager
+from fakes import FakeLLM
+from llm.embedding_cache import EmbeddingCache
+from storage.json_storage import JSONStorage
+
+
+class ThreadRecordingStorage(JSONStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def load(self):
+        self.threads.append(threading.current_thread())
+        return super().load()
+
+    def save(self, mindmap):
+        self.threads.append(threading.current_thread())
+        super().save(mindmap)
+
+
+def test_async_turns_keep_storage_off_the_event_loop(tmp_path):
+    storage = ThreadRecordingStorage(str(tmp_path / "conversation.json"))
+    llm = FakeLLM()
+    llm.embedding_cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+
+    async def run():
+        loop_thread = threading.current_thread()
+        manager = await ConversationManager.acreate(llm, storage)
+        await manager.astart_new_conversation("first topic")
+        await manager.acontinue_conversation("a follow-up")
+        async for _ in manager.astream_conversation("and another"):
+            pass
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert len(storage.threads) == 4
+    assert loop_thread not in storage.threads
+    assert len(storage.load().get_current_graph().messages) == 6
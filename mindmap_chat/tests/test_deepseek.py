@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import config
+from llm.deepseek import DeepSeekClient
+
+
+class FakeDeepSeek(BaseHTTPRequestHandler):
+    """Chat completions endpoint that first replies with the queued error statuses."""
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is observable
+    errors = []  # (status, headers) replies to send before succeeding
+    requests = []  # (client address, arrival time) of every request
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        FakeDeepSeek.requests.append((self.client_address, time.monotonic()))
+        if FakeDeepSeek.errors:
+            status, headers = FakeDeepSeek.errors.pop(0)
+            self._reply(status, b'{"error": "unavailable"}', "application/json", headers)
+        elif body.get("stream"):
+            events = [f'data: {json.dumps({"choices": [{"delta": {"content": word}}]})}\n\n' for word in ("he", "llo")]
+            self._reply(200, "".join(events + ["data: [DONE]\n\n"]).encode(), "text/event-stream")
+        else:
+            reply = {"choices": [{"message": {"content": "echo " + body["messages"][0]["content"]}}]}
+            self._reply(200, json.dumps(reply).encode(), "application/json")
+
+    def _reply(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDeepSeek)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeDeepSeek.errors, FakeDeepSeek.requests = [], []
+    monkeypatch.setattr(config.deepseek, "api_key", "test-key")
+    monkeypatch.setattr(config.deepseek, "base_url", f"http://127.0.0.1:{server.server_port}/chat/completions")
+    monkeypatch.setattr(config.deepseek, "backoff_base", 0.01)
+    yield DeepSeekClient()
+    server.shutdown()
+    server.server_close()
+
+
+def test_transient_errors_are_retried(client):
+    FakeDeepSeek.errors = [(503, {}), (502, {})]
+    assert client.call("hi") == "echo hi"
+    assert len(FakeDeepSeek.requests) == 3
+
+
+def test_retry_after_is_honored(client):
+    FakeDeepSeek.errors = [(429, {"Retry-After": "0.3"})]
+    assert client.call("hi") == "echo hi"
+    (_, first), (_, second) = FakeDeepSeek.requests
+    assert second - first >= 0.3
+
+
+def test_retry_after_beyond_backoff_max_fails_at_once(client):
+    FakeDeepSeek.errors = [(429, {"Retry-After": str(config.deepseek.backoff_max + 60)})]
+    with pytest.raises(Exception, match="DeepSeek API error"):
+        client.call("hi")
+    assert len(FakeDeepSeek.requests) == 1
+
+
+def test_client_errors_are_not_retried(client):
+    FakeDeepSeek.errors = [(400, {}), (400, {})]
+    with pytest.raises(Exception, match="DeepSeek API error"):
+        client.call("hi")
+    assert len(FakeDeepSeek.requests) == 1
+
+
+def test_gives_up_after_max_retries(client):
+    FakeDeepSeek.errors = [(503, {})] * (config.deepseek.max_retries + 2)
+    with pytest.raises(Exception, match="DeepSeek API error"):
+        client.call("hi")
+    assert len(FakeDeepSeek.requests) == config.deepseek.max_retries + 1
+
+
+def test_stream_retries_before_the_first_chunk(client):
+    FakeDeepSeek.errors = [(502, {})]
+    assert "".join(client.stream("hi")) == "hello"
+
+
+def test_sequential_calls_share_one_connection(client):
+    for i in range(5):
+        client.call(f"prompt {i}")
+    assert len({address for address, _ in FakeDeepSeek.requests}) == 1
+
+
+def test_async_calls_retry_and_stream(client):
+    async def run():
+        FakeDeepSeek.errors = [(429, {"Retry-After": "0.1"})]
+        answers = await asyncio.gather(*(client.acall(f"prompt {i}") for i in range(3)))
+        chunks = [chunk async for chunk in client.astream("hi")]
+        FakeDeepSeek.errors = [(400, {})]
+        with pytest.raises(Exception, match="DeepSeek API error"):
+            await client.acall("bad")
+        return answers, chunks
+
+    answers, chunks = asyncio.run(run())
+    assert answers == [f"echo prompt {i}" for i in range(3)]
+    assert "".join(chunks) == "hello"
@@ -0,0 +1,120 @@
+import multiprocessing
+
+import pytest
+
+from fakes import add_message, sample_mindmap
+from storage import StaleMindmapError
+from storage.change_tracker import MAX_BASELINES
+from storage.json_storage import JSONStorage
+
+
+def contents(mindmap):
+    return {m.content for graph in mindmap.graphs.values() for m in graph.messages.values()}
+
+
+@pytest.fixture(params=[False, True], ids=["snapshot", "journal"])
+def journal(request):
+    return request.param
+
+
+def test_every_save_increments_the_version(tmp_path, journal):
+    storage = JSONStorage(str(tmp_path / "conversation.json"), journal=journal)
+    mindmap = sample_mindmap()
+    storage.save(mindmap)
+    version = mindmap.version
+    graph = mindmap.get_current_graph()
+    add_message(graph, graph.root_block_id, "next")
+    storage.save(mindmap)
+    assert mindmap.version == version + 1
+    assert JSONStorage(str(tmp_path / "conversation.json"), journal=journal).load().version == version + 1
+
+
+def test_overlapping_saves_across_instances(tmp_path, journal):
+    path = str(tmp_path / "conversation.json")
+    JSONStorage(path, journal=journal).save(sample_mindmap())
+    a, b = JSONStorage(path, journal=journal), JSONStorage(path, journal=journal)
+
+    first, second = a.load(), b.load()
+    add_message(first.get_current_graph(), first.get_current_graph().root_block_id, "via a")
+    add_message(second.get_current_graph(), second.get_current_graph().root_block_id, "via b")
+    a.save(first)
+    b.save(second)
+    # A second save of the stale copy is merged again without duplicating anything
+    b.save(second)
+
+    stored = JSONStorage(path, journal=journal).load()
+    assert {"via a", "via b"} <= contents(stored)
+    assert len(stored.get_current_graph().messages) == 6
+    root = stored.get_current_graph().blocks[stored.get_current_graph().root_block_id]
+    assert len(root.conversation_refs) == 4
+
+
+def test_deletes_from_a_stale_copy_keep_new_rows(tmp_path, journal):
+    storage = JSONStorage(str(tmp_path / "conversation.json"), journal=journal)
+    storage.save(sample_mindmap())
+    first, second = storage.load(), storage.load()
+
+    graph = first.get_current_graph()
+    add_message(graph, graph.root_block_id, "kept")
+    storage.save(first)
+
+    graph = second.get_current_graph()
+    child = next(bid for bid in graph.blocks if bid != graph.root_block_id)
+    graph.delete_blocks([child])
+    storage.save(second)
+
+    stored = storage.load()
+    assert "kept" in contents(stored)
+    assert child not in stored.get_current_graph().blocks
+
+
+def test_copy_older_than_every_baseline_is_not_merged(tmp_path, journal):
+    storage = JSONStorage(str(tmp_path / "conversation.json"), journal=journal)
+    storage.save(sample_mindmap())
+    stale, deleting = storage.load(), storage.load()
+
+    graph = deleting.get_current_graph()
+    child = next(bid for bid in graph.blocks if bid != graph.root_block_id)
+    graph.delete_blocks([child])
+    storage.save(deleting)
+    for i in range(MAX_BASELINES + 4):
+        mindmap = storage.load()
+        graph = mindmap.get_current_graph()
+        add_message(graph, graph.root_block_id, f"newer {i}")
+        storage.save(mindmap)
+
+    graph = stale.get_current_graph()
+    add_message(graph, graph.root_block_id, "from the stale copy")
+    with pytest.raises(StaleMindmapError):
+        storage.save(stale)
+
+    stored = JSONStorage(str(tmp_path / "conversation.json"), journal=journal).load()
+    assert child not in stored.get_current_graph().blocks
+    assert "from the stale copy" not in contents(stored)
+
+
+def _append_messages(path, journal, worker, count):
+    storage = JSONStorage(path, journal=journal)
+    for i in range(count):
+        mindmap = storage.load()
+        graph = mindmap.get_current_graph()
+        add_message(graph, graph.root_block_id, f"worker {worker} message {i}")
+        storage.save(mindmap)
+
+
+def test_concurrent_processes_lose_no_messages(tmp_path, journal):
+    path = str(tmp_path / "conversation.json")
+    JSONStorage(path, journal=journal).save(sample_mindmap(blocks=1, messages_per_block=0))
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_messages, args=(path, journal, w, 10)) for w in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    stored = JSONStorage(path, journal=journal).load()
+    graph = stored.get_current_graph()
+    assert contents(stored) == {f"worker {w} message {i}" for w in range(4) for i in range(10)}
+    assert len(graph.blocks[graph.root_block_id].conversation_refs) == 40
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from conversation import ConversationManager
+from core.intent_detector import _classify_with_llm
+from fakes import FakeLLM, sample_mindmap
+from llm.response_cache import ResponseCache
+from models import BlockClassification
+from storage.json_storage import JSONStorage
+
+
+def cached_llm(**kwargs):
+    llm = FakeLLM()
+    llm.response_cache = ResponseCache(**kwargs)
+    return llm
+
+
+def test_identical_prompt_is_answered_from_the_cache():
+    llm = cached_llm()
+    first = llm.call_json("prompt", family="classify")
+    assert llm.call_json("prompt", family="classify") == first
+    assert len(llm.calls) == 1
+    assert llm.response_cache.stats()["families"]["classify"] == {"hits": 1, "misses": 1}
+
+
+def test_uncached_calls_and_families_bypass_the_cache():
+    llm = cached_llm(families=["summary"])
+    for _ in range(2):
+        llm.call_json("prompt")
+        llm.call_json("prompt", family="classify")
+    assert len(llm.calls) == 4
+
+
+def test_malformed_reply_is_not_cached():
+    llm = cached_llm()
+    replies = iter(["not json", '{"ok": true}'])
+    llm.call = lambda prompt, json_mode=False: next(replies)
+    try:
+        llm.call_json("prompt", family="classify")
+    except ValueError:
+        pass
+    assert llm.call_json("prompt", family="classify") == {"ok": True}
+
+
+def test_entries_expire_after_the_ttl():
+    llm = cached_llm(ttl_seconds=0.05)
+    llm.call_json("prompt", family="summary")
+    time.sleep(0.1)
+    llm.call_json("prompt", family="summary")
+    assert len(llm.calls) == 2
+
+
+def test_deepen_expansion_reuses_the_classifier_response(tmp_path):
+    storage = JSONStorage(str(tmp_path / "conversation.json"))
+    storage.save(sample_mindmap())
+    llm = cached_llm()
+    manager = ConversationManager(llm, storage)
+    block = manager.graph.blocks[manager.graph.root_block_id]
+    messages = manager.graph.get_block_messages(block.block_id)
+
+    _classify_with_llm(llm, block, "go deeper", messages)
+    deepen = BlockClassification(action="deepen", confidence=0.8, reasoning="similar")
+    new_blocks = manager._resolve_deepen_blocks(deepen, block, "go deeper")
+    asyncio.run(manager._aresolve_deepen_blocks(deepen, block, "go deeper"))
+
+    assert new_blocks == [{"title": "Child", "intent": "Child intent"}]
+    assert len(llm.calls) == 1
+    assert llm.response_cache.stats()["families"]["classify"]["hits"] == 2
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fakes import FakeLLM
+from llm.scheduler import LLMScheduler, ScheduledLLMClient, call_priority
+
+
+def test_rate_limited_wait_does_not_spin():
+    scheduler = LLMScheduler(requests_per_minute=120, burst=1, max_in_flight=4)
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(3):
+        with scheduler.slot():
+            pass
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    assert wall >= 0.9
+    assert cpu < 0.2 * wall
+
+
+def test_async_rate_limited_wait_does_not_spin():
+    scheduler = LLMScheduler(requests_per_minute=120, burst=1, max_in_flight=4)
+
+    async def run():
+        async def one():
+            async with scheduler.aslot():
+                pass
+        await asyncio.gather(*(one() for _ in range(3)))
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    asyncio.run(run())
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    assert wall >= 0.9
+    assert cpu < 0.2 * wall
+
+
+def test_waiters_are_granted_in_priority_order():
+    scheduler = LLMScheduler(max_in_flight=1)
+    order = []
+    started = threading.Event()
+
+    def blocker():
+        with scheduler.slot():
+            started.set()
+            time.sleep(0.2)
+
+    def request(name, priority):
+        with call_priority(priority), scheduler.slot():
+            order.append(name)
+
+    threads = [threading.Thread(target=blocker)]
+    threads[0].start()
+    started.wait()
+    for name, priority in [("b1", "backfill"), ("s1", "summary"), ("a1", "answer"), ("a2", "answer")]:
+        thread = threading.Thread(target=request, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    assert scheduler.stats()["queue_depth"] == 4
+    for thread in threads:
+        thread.join()
+    assert order == ["a1", "a2", "s1", "b1"]
+
+
+def test_background_work_leaves_slots_for_answers():
+    scheduler = LLMScheduler(max_in_flight=3, background_in_flight=1)
+    release = threading.Event()
+
+    def background():
+        with call_priority("backfill"), scheduler.slot():
+            release.wait()
+
+    threads = [threading.Thread(target=background) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    stats = scheduler.stats()
+    assert stats["background_in_flight"] == 1
+    assert stats["queued"]["backfill"] == 2
+    start = time.perf_counter()
+    with scheduler.slot():
+        pass
+    assert time.perf_counter() - start < 0.05
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = LLMScheduler(requests_per_minute=60, burst=1, max_in_flight=1)
+
+    async def run():
+        async with scheduler.aslot():
+            pass
+        task = asyncio.create_task(scheduler.aslot().__aenter__())
+        await asyncio.sleep(0.05)
+        assert scheduler.stats()["queue_depth"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_scheduled_client_counts_requests_by_priority():
+    inner = FakeLLM()
+    client = ScheduledLLMClient(inner, LLMScheduler())
+    client.call("answer")
+    with call_priority("summary"):
+        client.call_json("summary")
+    client.embed_many(["a", "b"])
+    assert client.scheduler.stats()["granted"] == {"answer": 2, "summary": 1, "backfill": 0}
+    assert len(inner.calls) == 2
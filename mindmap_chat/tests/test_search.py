@@ -0,0 +1,62 @@
+import random
+
+from core.search import MessageIndex, SemanticSearch
+from core.vector_index import BlockVectorIndex
+from fakes import add_message, sample_mindmap
+
+
+def vector(seed, dim=16):
+    rng = random.Random(seed)
+    return [rng.gauss(0, 1) for _ in range(dim)]
+
+
+def embedded_mindmap():
+    mindmap = sample_mindmap(blocks=3, messages_per_block=2)
+    for i, (graph_id, graph) in enumerate(mindmap.graphs.items()):
+        for j, block in enumerate(graph.blocks.values()):
+            block.embedding = vector(f"block {i} {j}")
+        for message in graph.messages.values():
+            message.embedding = vector(message.content)
+    return mindmap
+
+
+def new_search():
+    return SemanticSearch(BlockVectorIndex(), MessageIndex(BlockVectorIndex()))
+
+
+def test_replacing_a_block_with_as_many_messages_indexes_them():
+    mindmap = embedded_mindmap()
+    search = new_search()
+    search.search(mindmap, vector("anything"))
+
+    graph = mindmap.get_current_graph()
+    leaf = next(bid for bid, block in graph.blocks.items() if not block.children)
+    removed = len(graph.blocks[leaf].conversation_refs)
+    graph.delete_blocks([leaf])
+    new_ids = []
+    for n in range(removed):
+        message = add_message(graph, graph.root_block_id, f"new message {n}")
+        message.embedding = vector(f"new message {n}")
+        new_ids.append(message.message_id)
+
+    for n, message_id in enumerate(new_ids):
+        results = search.search(mindmap, vector(f"new message {n}"), k=1)
+        assert results[0].message_id == message_id
+        assert results[0].score > 0.99
+
+
+def test_search_skips_rows_missing_from_an_older_copy():
+    mindmap = embedded_mindmap()
+    stale = mindmap.copy()
+    search = new_search()
+
+    graph = mindmap.get_current_graph()
+    message = add_message(graph, graph.root_block_id, "only in the newer copy")
+    message.embedding = vector("only in the newer copy")
+    search.search(mindmap, vector("anything"))
+
+    # Another request synced the shared indexes to the newer copy first
+    search.blocks.sync = search.messages.sync = lambda mindmap: []
+    results = search.search(stale, vector("only in the newer copy"), k=5)
+    assert message.message_id not in {r.message_id for r in results}
+    assert results
@@ -0,0 +1,174 @@
+import pytest
+
+from fakes import add_message, sample_mindmap
+from storage import StaleMindmapError
+from storage.change_tracker import MAX_BASELINES
+from storage.sharded_storage import ShardedStorage
+
+
+def contents(mindmap):
+    return {m.content for graph in mindmap.graphs.values() for m in graph.messages.values()}
+
+
+def test_overlapping_saves_keep_both_writers_messages(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "conversation"))
+    storage.save(sample_mindmap())
+
+    first, second = storage.load(), storage.load()
+    for mindmap, text in ((first, "from first"), (second, "from second")):
+        graph = mindmap.get_current_graph()
+        add_message(graph, graph.root_block_id, text)
+    storage.save(first)
+    storage.save(second)
+
+    stored = ShardedStorage(str(tmp_path / "conversation")).load()
+    assert {"from first", "from second"} <= contents(stored)
+    root = stored.get_current_graph().blocks[stored.get_current_graph().root_block_id]
+    assert len(root.conversation_refs) == 4
+
+
+def test_overlapping_saves_across_instances(tmp_path):
+    path = str(tmp_path / "conversation")
+    ShardedStorage(path).save(sample_mindmap())
+    a, b = ShardedStorage(path), ShardedStorage(path)
+
+    first, second = a.load(), b.load()
+    add_message(first.get_current_graph(), first.get_current_graph().root_block_id, "via a")
+    add_message(second.get_current_graph(), second.get_current_graph().root_block_id, "via b")
+    a.save(first)
+    b.save(second)
+    # A second save of the stale copy is merged again without duplicating anything
+    b.save(second)
+
+    stored = ShardedStorage(path).load()
+    assert {"via a", "via b"} <= contents(stored)
+    assert len(stored.get_current_graph().messages) == 6
+
+
+def test_deletes_from_a_stale_copy_keep_new_rows(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "conversation"))
+    storage.save(sample_mindmap())
+    first, second = storage.load(), storage.load()
+
+    graph = first.get_current_graph()
+    add_message(graph, graph.root_block_id, "kept")
+    storage.save(first)
+
+    graph = second.get_current_graph()
+    child = next(bid for bid in graph.blocks if bid != graph.root_block_id)
+    graph.delete_blocks([child])
+    storage.save(second)
+
+    stored = storage.load()
+    assert "kept" in contents(stored)
+    assert child not in stored.get_current_graph().blocks
+
+
+def test_save_after_load_is_incremental(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "conversation"))
+    storage.save(sample_mindmap())
+    mindmap = storage.load()
+    version = mindmap.version
+    storage.save(mindmap)  # Nothing changed
+    assert storage.load().version == version
+
+
+def test_overlapping_saves_with_embedding_sidecar(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "conversation"), embedding_sidecar=True)
+    mindmap = sample_mindmap()
+    for message in mindmap.get_current_graph().messages.values():
+        message.embedding = [0.5] * 8
+    storage.save(mindmap)
+
+    first, second = storage.load(), storage.load()
+    for copy, text in ((first, "from first"), (second, "from second")):
+        graph = copy.get_current_graph()
+        add_message(graph, graph.root_block_id, text).embedding = [1.0] * 8
+    storage.save(first)
+    storage.save(second)
+
+    reader = ShardedStorage(str(tmp_path / "conversation"), embedding_sidecar=True)
+    stored = reader.load()
+    messages = list(stored.get_current_graph().messages.values())
+    assert {"from first", "from second"} <= {m.content for m in messages}
+    assert all(len(m.embedding) == 8 for m in messages)
+    assert reader.list_graph_summaries()[0].message_count == 6
+
+
+def test_load_keeps_vectors_of_a_graph_not_yet_in_the_manifest(tmp_path):
+    path = str(tmp_path / "conversation")
+    writer = ShardedStorage(path, embedding_sidecar=True)
+    writer.save(sample_mindmap())
+    graph = sample_mindmap().get_current_graph()
+    for message in graph.messages.values():
+        message.embedding = [0.25] * 8
+
+    # The writer has flushed the new graph's vectors and shard but not yet its manifest entry
+    writer._write_shard(graph)
+    ShardedStorage(path, embedding_sidecar=True).load()
+    writer.save_graph(graph)
+
+    stored = ShardedStorage(path, embedding_sidecar=True).load_graph(graph.graph_id)
+    assert all(m.embedding == [0.25] * 8 for m in stored.messages.values())
+
+
+def test_delete_graph_drops_its_vectors(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "conversation"), embedding_sidecar=True)
+    mindmap = sample_mindmap()
+    for message in mindmap.get_current_graph().messages.values():
+        message.embedding = [0.5] * 8
+    storage.save(mindmap)
+    assert storage._embeddings._rows
+
+    storage.delete_graph(mindmap.current_graph_id)
+    assert not storage._embeddings._rows
+
+
+def test_merge_after_older_baselines_were_evicted(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "conversation"))
+    storage.save(sample_mindmap())
+    stale, deleting = storage.load(), storage.load()
+
+    graph = deleting.get_current_graph()
+    child = next(bid for bid in graph.blocks if bid != graph.root_block_id)
+    graph.delete_blocks([child])
+    storage.save(deleting)
+    recent = None
+    for i in range(MAX_BASELINES + 4):
+        mindmap = storage.load()
+        if i == MAX_BASELINES + 2:
+            recent = mindmap.copy()
+        graph = mindmap.get_current_graph()
+        add_message(graph, graph.root_block_id, f"newer {i}")
+        storage.save(mindmap)
+
+    # Still remembered: merged onto the newer shards
+    graph = recent.get_current_graph()
+    add_message(graph, graph.root_block_id, "from a recent copy")
+    storage.save(recent)
+    # Forgotten: refused rather than diffed against nothing, which would restore the child
+    graph = stale.get_current_graph()
+    add_message(graph, graph.root_block_id, "from the stale copy")
+    with pytest.raises(StaleMindmapError):
+        storage.save(stale)
+
+    stored = ShardedStorage(str(tmp_path / "conversation")).load()
+    assert child not in stored.get_current_graph().blocks
+    assert "from a recent copy" in contents(stored)
+    assert "from the stale copy" not in contents(stored)
+    assert len(stored.get_current_graph().messages) == 2 + (MAX_BASELINES + 4) + 1  # Root messages + newer + recent
+
+
+def test_save_without_a_baseline_rebuilds_it_from_the_shards(tmp_path):
+    path = str(tmp_path / "conversation")
+    mindmap = sample_mindmap()
+    mindmap.add_graph(sample_mindmap().get_current_graph())
+    ShardedStorage(path).save(mindmap)
+
+    # Loaded by one instance, saved by another that never saw this version
+    copy = ShardedStorage(path).load()
+    removed = next(gid for gid in copy.graphs if gid != copy.current_graph_id)
+    del copy.graphs[removed]
+    ShardedStorage(path).save(copy)
+
+    assert list(ShardedStorage(path).load().graphs) == [copy.current_graph_id]
@@ -0,0 +1,99 @@
+import pytest
+
+from fakes import add_message, sample_mindmap
+from storage import StaleMindmapError
+from storage.change_tracker import MAX_BASELINES
+from storage.sqlite_storage import SQLiteStorage
+
+
+def contents(mindmap):
+    return {m.content for graph in mindmap.graphs.values() for m in graph.messages.values()}
+
+
+def test_overlapping_saves_keep_both_writers_messages(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "conversation.db"))
+    storage.save(sample_mindmap())
+
+    first, second = storage.load(), storage.load()
+    for mindmap, text in ((first, "from first"), (second, "from second")):
+        graph = mindmap.get_current_graph()
+        add_message(graph, graph.root_block_id, text)
+    storage.save(first)
+    storage.save(second)
+
+    stored = SQLiteStorage(str(tmp_path / "conversation.db")).load()
+    assert {"from first", "from second"} <= contents(stored)
+    root = stored.get_current_graph().blocks[stored.get_current_graph().root_block_id]
+    assert len(root.conversation_refs) == 4
+
+
+def test_overlapping_saves_across_instances(tmp_path):
+    path = str(tmp_path / "conversation.db")
+    SQLiteStorage(path).save(sample_mindmap())
+    a, b = SQLiteStorage(path), SQLiteStorage(path)
+
+    first, second = a.load(), b.load()
+    add_message(first.get_current_graph(), first.get_current_graph().root_block_id, "via a")
+    add_message(second.get_current_graph(), second.get_current_graph().root_block_id, "via b")
+    a.save(first)
+    b.save(second)
+    # A second save of the stale copy is merged again without duplicating anything
+    b.save(second)
+
+    stored = SQLiteStorage(path).load()
+    assert {"via a", "via b"} <= contents(stored)
+    assert len(stored.get_current_graph().messages) == 6
+
+
+def test_deletes_from_a_stale_copy_keep_new_rows(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "conversation.db"))
+    storage.save(sample_mindmap())
+    first, second = storage.load(), storage.load()
+
+    graph = first.get_current_graph()
+    add_message(graph, graph.root_block_id, "kept")
+    storage.save(first)
+
+    graph = second.get_current_graph()
+    child = next(bid for bid in graph.blocks if bid != graph.root_block_id)
+    graph.delete_blocks([child])
+    storage.save(second)
+
+    stored = storage.load()
+    assert "kept" in contents(stored)
+    assert child not in stored.get_current_graph().blocks
+
+
+def test_save_after_load_is_incremental(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "conversation.db"))
+    storage.save(sample_mindmap())
+    mindmap = storage.load()
+    version = mindmap.version
+    storage.save(mindmap)  # Nothing changed
+    assert storage.load().version == version
+
+
+def test_copy_older_than_every_baseline_is_not_merged(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "conversation.db"))
+    storage.save(sample_mindmap())
+    stale, deleting = storage.load(), storage.load()
+
+    graph = deleting.get_current_graph()
+    child = next(bid for bid in graph.blocks if bid != graph.root_block_id)
+    deleted_messages = set(graph.blocks[child].conversation_refs)
+    graph.delete_blocks([child])
+    storage.save(deleting)
+    for i in range(MAX_BASELINES + 4):
+        mindmap = storage.load()
+        graph = mindmap.get_current_graph()
+        add_message(graph, graph.root_block_id, f"newer {i}")
+        storage.save(mindmap)
+
+    graph = stale.get_current_graph()
+    add_message(graph, graph.root_block_id, "from the stale copy")
+    with pytest.raises(StaleMindmapError):
+        storage.save(stale)
+
+    stored = SQLiteStorage(str(tmp_path / "conversation.db")).load().get_current_graph()
+    assert child not in stored.blocks
+    assert not deleted_messages & set(stored.messages)
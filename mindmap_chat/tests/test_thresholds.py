@@ -0,0 +1,46 @@
+"""Per-provider detection thresholds."""
+
+import pytest
+
+from config import config, thresholds_for
+from core.embeddings import compute_similarity
+from core.intent_detector import route_by_similarity
+from llm.local import LocalEmbeddingClient
+
+
+# Not part of the calibration sample in benchmarks/threshold_calibration.py
+INTENT = "Learn to grow tomatoes in a small backyard vegetable garden"
+ON_TOPIC = [
+    "How often should I water the tomatoes in my garden?",
+    "Which tomato varieties grow well in a small backyard garden?",
+]
+OFF_TOPIC = [
+    "How do I reset my router password?",
+    "What is the plot of Hamlet?",
+]
+
+
+@pytest.fixture
+def local_thresholds(monkeypatch):
+    monkeypatch.setattr(config, "thresholds", thresholds_for("local"))
+
+
+def test_unknown_provider_uses_remote_thresholds():
+    assert thresholds_for("unknown") == thresholds_for("remote")
+    assert thresholds_for("local").continue_threshold < thresholds_for("remote").continue_threshold
+
+
+def test_local_thresholds_separate_on_and_off_topic(local_thresholds):
+    client = LocalEmbeddingClient()
+    intent = client.embed(INTENT)
+    for message in ON_TOPIC:
+        assert route_by_similarity(compute_similarity(client.embed(message), intent)) in ("continue", "deepen")
+    for message in OFF_TOPIC:
+        assert route_by_similarity(compute_similarity(client.embed(message), intent)) == "tangent"
+
+
+def test_remote_thresholds_treat_local_on_topic_scores_as_off_topic():
+    # Why the local provider needs its own thresholds
+    client = LocalEmbeddingClient()
+    similarity = compute_similarity(client.embed(ON_TOPIC[0]), client.embed(INTENT))
+    assert similarity < thresholds_for("remote").tangent_threshold
@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from conversation import ConversationManager
+from core.vector_index import BlockVectorIndex
+from fakes import FakeLLM, sample_mindmap
+from models import Block, Mindmap
+from storage.json_storage import JSONStorage
+from storage.sqlite_storage import SQLiteStorage
+
+
+def vector(seed, dim=16):
+    rng = random.Random(seed)
+    return [rng.gauss(0, 1) for _ in range(dim)]
+
+
+def embedded_mindmap(graphs=3):
+    mindmap = Mindmap()
+    for g in range(graphs):
+        graph = sample_mindmap(blocks=4, messages_per_block=1).get_current_graph()
+        for block_id in graph.blocks:
+            graph.set_block_embedding(block_id, vector(block_id))
+        mindmap.add_graph(graph)
+    return mindmap
+
+
+class CountingIndex(BlockVectorIndex):
+    def __init__(self):
+        super().__init__()
+        self.encoded = []
+
+    def add_vector(self, graph_id, item_id, embedding):
+        self.encoded.append(item_id)
+        super().add_vector(graph_id, item_id, embedding)
+
+
+def test_sync_reencodes_only_changed_blocks():
+    mindmap = embedded_mindmap()
+    index = CountingIndex()
+    index.sync(mindmap)
+    assert len(index) == 12 and len(index.encoded) == 12
+
+    index.encoded.clear()
+    index.sync(mindmap.copy())
+    assert index.encoded == []
+
+    graph = mindmap.get_current_graph()
+    block_id = next(iter(graph.blocks))
+    graph.set_block_embedding(block_id, vector("new"))
+    leaf = next(bid for bid, block in graph.blocks.items() if not block.children)
+    graph.delete_blocks([leaf])
+    index.sync(mindmap)
+    assert index.encoded == [block_id]
+    assert leaf not in index and len(index) == 11
+    assert index.search(vector("new"))[0][1] == block_id
+
+
+def test_sync_skips_unchanged_rows_after_a_fresh_load(tmp_path):
+    writer = SQLiteStorage(str(tmp_path / "conversation.db"))
+    writer.save(embedded_mindmap())
+    index = CountingIndex()
+    index.sync(writer.load())
+
+    # Another process saved: this one parses fresh rows with new embedding lists
+    reader = SQLiteStorage(str(tmp_path / "conversation.db"))
+    mindmap = reader.load()
+    graph = mindmap.get_current_graph()
+    block_id = next(iter(graph.blocks))
+    graph.set_block_embedding(block_id, vector("changed"))
+    reader.save(mindmap)
+
+    index.encoded.clear()
+    index.sync(writer.load())
+    assert index.encoded == [block_id]
+
+
+def test_removed_graph_leaves_the_index():
+    mindmap = embedded_mindmap()
+    index = BlockVectorIndex()
+    index.sync(mindmap)
+    del mindmap.graphs[mindmap.current_graph_id]
+    index.sync(mindmap)
+    assert len(index) == 8
+
+
+def test_sync_drops_rows_it_did_not_index():
+    mindmap = embedded_mindmap()
+    index = BlockVectorIndex()
+    index.sync(mindmap)
+    graph = mindmap.get_current_graph()
+    orphan = Block(title="Unsaved", intent="Unsaved intent", embedding=vector("orphan"))
+    index.add(graph.graph_id, orphan)
+    index.add("unknown-graph", Block(title="Gone", intent="Gone intent", embedding=vector("gone")))
+
+    index.sync(mindmap.copy())
+    assert orphan.block_id not in index and len(index) == 12
+
+
+class FailingReplyLLM(FakeLLM):
+    """Classifies and embeds, then fails to generate the answer."""
+
+    def call(self, prompt, json_mode=False):
+        if not json_mode:
+            raise RuntimeError("provider error")
+        return super().call(prompt, json_mode)
+
+
+def test_failed_turn_leaves_no_rows_for_the_next_request(tmp_path):
+    storage = JSONStorage(str(tmp_path / "conversation.json"))
+    storage.save(sample_mindmap())
+
+    failed = ConversationManager(FailingReplyLLM(next_action="NEW_CHILD"), storage)
+    with pytest.raises(Exception):
+        failed.continue_conversation("Let's open a subtopic")
+    assert any(block.intent == "Child intent" for block in failed.graph.blocks.values())
+
+    # The next request embeds a message identical to the unsaved child's intent
+    manager = ConversationManager(FakeLLM(next_action="TANGENT"), storage)
+    assert manager.continue_conversation("Child intent") == "reply"
+    saved = storage.load()
+    assert len(saved.graphs) == 2
+    assert all(block.title != "Child" for graph in saved.graphs.values() for block in graph.blocks.values())
@@ -1,8 +1,11 @@
 from fastapi import Request, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import sys
 import os
+import json
+import threading
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
@@ -11,26 +14,34 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../.
 
 from app import app, templates
 from models import ConversationMessage, Block, Mindmap
-from storage import JSONStorage
+from storage import create_storage
 from conversation import ConversationManager
 from llm.gemini import GeminiClient
-from config import validate_config
+from llm.local import with_configured_embeddings
+from llm.scheduler import scheduler_stats, with_scheduler
+from config import config, validate_config
+from backfill import EmbeddingBackfill, default_progress_path
 
 # Initialize backends (lazy - only validate when actually needed).
 # Keep LLM and storage cached, but ALWAYS create a fresh ConversationManager
-# so it reloads the latest mindmap state from disk on every request.
+# so it picks up the latest mindmap state on every request. Storage serves
+# that from memory unless another process changed the files on disk.
+# Storage calls do file/SQLite I/O, so handlers run them in a worker thread
+# (asyncio.to_thread) to keep the event loop free.
 storage = None
 llm_client = None
+backfill_stop = threading.Event()
+
+def get_data_file() -> str:
+    """Conversation data file (absolute path relative to the repo root)."""
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+    return os.path.join(repo_root, "mindmap_chat", "data", "conversation.json")
 
 def get_storage():
     """Lazy initialize storage."""
     global storage
     if storage is None:
-        # Use absolute path relative to the repo root
-        import os
-        repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-        data_file = os.path.join(repo_root, "mindmap_chat", "data", "conversation.json")
-        storage = JSONStorage(data_file)
+        storage = create_storage(get_data_file())
     return storage
 
 def get_llm_client():
@@ -38,12 +49,40 @@ def get_llm_client():
     global llm_client
     if llm_client is None:
         validate_config()  # Only validate when needed
-        llm_client = GeminiClient()
+        llm_client = with_configured_embeddings(with_scheduler(GeminiClient()))
     return llm_client
 
-def get_conversation_manager() -> ConversationManager:
+async def get_conversation_manager() -> ConversationManager:
     """Return a fresh ConversationManager bound to current storage state."""
-    return ConversationManager(get_llm_client(), get_storage())
+    return await ConversationManager.acreate(get_llm_client(), get_storage())
+
+
+def run_embedding_backfill():
+    """Embed historical blocks/messages in the background (never on a request)."""
+    store = get_storage()
+    try:
+        backfill = EmbeddingBackfill(
+            get_llm_client(), store,
+            progress_path=default_progress_path(get_data_file()),
+        )
+        backfill.run(stop=backfill_stop)
+    except Exception as e:
+        print(f"[WARN] Embedding backfill stopped: {e}")
+
+
+@app.on_event("startup")
+async def start_embedding_backfill():
+    """Start the embedding backfill thread if MINDMAP_EMBEDDING_BACKFILL_ON_STARTUP=1."""
+    if config.embeddings.backfill_on_startup:
+        threading.Thread(target=run_embedding_backfill, name="embedding-backfill", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def flush_storage():
+    """Write any deferred (write-behind) saves before the worker exits."""
+    backfill_stop.set()
+    if storage is not None:
+        await asyncio.to_thread(storage.flush)
 
 
 # ============= Request/Response Models =============
@@ -74,14 +113,10 @@ class ChatRequest(BaseModel):
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render the home page."""
-    mindmap = get_storage().load()
-    mindmaps_list = []
-    for graph_id, graph in mindmap.graphs.items():
-        root_block = graph.blocks.get(graph.root_block_id)
-        mindmaps_list.append({
-            "graph_id": graph_id,
-            "title": root_block.title if root_block else "Untitled",
-        })
+    mindmaps_list = [
+        {"graph_id": summary.graph_id, "title": summary.title}
+        for summary in await asyncio.to_thread(get_storage().list_graph_summaries)
+    ]
 
     return templates.TemplateResponse(
         "index.html",
@@ -103,19 +138,8 @@ async def list_mindmaps():
     Returns:
         List of mindmap summaries with id, title, root_block_id
     """
-    mindmap = get_storage().load()
-    
-    mindmaps_list = []
-    for graph_id, graph in mindmap.graphs.items():
-        root_block = graph.blocks.get(graph.root_block_id)
-        mindmaps_list.append({
-            "graph_id": graph_id,
-            "title": root_block.title if root_block else "Untitled",
-            "root_block_id": graph.root_block_id,
-            "block_count": len(graph.blocks),
-            "message_count": len(graph.messages),
-            "is_current": graph_id == mindmap.current_graph_id,
-        })
+    summaries = await asyncio.to_thread(get_storage().list_graph_summaries)
+    mindmaps_list = [summary.to_dict() for summary in summaries]
     
     return {"mindmaps": mindmaps_list}
 
@@ -124,7 +148,7 @@ async def list_mindmaps():
 async def create_new_mindmap(payload: StartConversationRequest):
     """
     Start a new conversation using ConversationManager.
-    Calls manager.start_new_conversation(topic).
+    Calls manager.astart_new_conversation(topic).
     
     Args:
         payload: StartConversationRequest with topic
@@ -132,20 +156,19 @@ async def create_new_mindmap(payload: StartConversationRequest):
     Returns:
         New mindmap with root block and initial response
     """
-    mgr = get_conversation_manager()
+    mgr = await get_conversation_manager()
     
     # Use manager to start conversation (this creates the graph structure)
-    response_text = mgr.start_new_conversation(payload.topic)
+    response_text = await mgr.astart_new_conversation(payload.topic)
     
     # Get the current graph (just created)
-    mindmap = get_storage().load()
-    graph = mindmap.graphs.get(mindmap.current_graph_id)
+    graph = mgr.graph
     root_block = graph.blocks.get(graph.root_block_id)
 
     # Ensure the root node title matches the user-provided topic
     if root_block and payload.topic:
         root_block.title = payload.topic
-        get_storage().save(mindmap)
+        await asyncio.to_thread(get_storage().save, mgr.mindmap)
     
     return {
         "graph_id": graph.graph_id,
@@ -169,13 +192,13 @@ async def chat(payload: ChatRequest):
         else:
             response = manager.continue_conversation(user_input)
     """
-    mgr = get_conversation_manager()
+    mgr = await get_conversation_manager()
 
     # Decide whether to start a new conversation or continue the current one
     if not mgr.graph or not mgr.graph.root_block_id:
-        assistant_response = mgr.start_new_conversation(payload.content)
+        assistant_response = await mgr.astart_new_conversation(payload.content)
     else:
-        assistant_response = mgr.continue_conversation(payload.content)
+        assistant_response = await mgr.acontinue_conversation(payload.content)
 
     # After the call above, ConversationManager has already saved to storage.
     graph = mgr.graph
@@ -204,6 +227,71 @@ async def chat(payload: ChatRequest):
     }
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(payload: ChatRequest):
+    """Same as /api/chat, with the answer streamed as Server-Sent Events.
+
+    Events (each "event: <name>" plus a JSON "data:" line):
+        classification  where the message went, before any token
+        token           {"text": ...} per chunk of the answer
+        done            stored message ids, full response and the updated graph
+        error           {"detail": ...}; the turn is not saved
+
+    The answer is persisted only once it has been streamed completely.
+    """
+    mgr = await get_conversation_manager()
+
+    async def events():
+        try:
+            async for event, data in mgr.astream_conversation(payload.content):
+                if event == "done":
+                    data = {**data, "graph": mgr.graph.to_d3_graph()}
+                yield _sse_event(event, data)
+        except Exception as e:
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/api/search")
+async def search(q: str, k: int = 10):
+    """
+    Semantic search over the blocks and messages of every graph.
+    
+    Args:
+        q: Query text (embedded once)
+        k: Number of results
+        
+    Returns:
+        Ranked results with graph_id/block_id (and message_id for messages)
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    mgr = await get_conversation_manager()
+    results = await mgr.asearch(q, k=max(1, min(k, 100)))
+    return {"query": q, "results": [result.to_dict() for result in results]}
+
+
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """
+    LLM request scheduling metrics per provider.
+    
+    Returns:
+        In-flight requests, queue depth per priority class and wait times
+    """
+    return {"providers": scheduler_stats()}
+
+
 @app.get("/api/mindmaps/{graph_id}/graph")
 async def get_graph(graph_id: str):
     """
@@ -215,8 +303,7 @@ async def get_graph(graph_id: str):
     Returns:
         D3-formatted graph with nodes and links
     """
-    mindmap = get_storage().load()
-    graph = mindmap.graphs.get(graph_id)
+    graph = await asyncio.to_thread(get_storage().load_graph, graph_id)
     
     if not graph:
         raise HTTPException(status_code=404, detail=f"Graph {graph_id} not found")
@@ -235,16 +322,11 @@ async def get_block_messages(block_id: str):
     Returns:
         List of messages in the block
     """
-    mindmap = get_storage().load()
-    
     # Find the graph containing this block
-    graph = None
-    for g in mindmap.graphs.values():
-        if block_id in g.blocks:
-            graph = g
-            break
+    graph_id = await asyncio.to_thread(get_storage().find_graph_for_block, block_id)
+    graph = await asyncio.to_thread(get_storage().load_graph, graph_id) if graph_id else None
     
-    if not graph:
+    if not graph or block_id not in graph.blocks:
         raise HTTPException(status_code=404, detail=f"Block {block_id} not found")
     
     block = graph.blocks[block_id]
@@ -274,7 +356,7 @@ async def get_block_messages(block_id: str):
 async def add_message_to_block(block_id: str, payload: MessageRequest, background_tasks: BackgroundTasks):
     """
     Add a user message to a block and get LLM response using ConversationManager.
-    Calls manager.continue_conversation(content).
+    Calls manager.acontinue_conversation(content).
     
     Args:
         block_id: ID of the block
@@ -283,7 +365,8 @@ async def add_message_to_block(block_id: str, payload: MessageRequest, backgroun
     Returns:
         Updated messages and assistant response
     """
-    mindmap = get_storage().load()
+    mgr = await get_conversation_manager()
+    mindmap = mgr.mindmap
     
     # Find the graph containing this block
     graph = None
@@ -297,19 +380,16 @@ async def add_message_to_block(block_id: str, payload: MessageRequest, backgroun
         raise HTTPException(status_code=404, detail=f"Block {block_id} not found")
     
     # Update conversation manager context and use it to continue conversation
-    mgr = get_conversation_manager()
-    mgr.mindmap = mindmap
     mgr.graph = graph
     mgr.graph.current_block_id = block_id
     
     # Use manager to continue conversation
     try:
-        response_text = mgr.continue_conversation(payload.content)
+        response_text = await mgr.acontinue_conversation(payload.content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
     
-    # Save updated graph
-    get_storage().save(mindmap)
+    # acontinue_conversation() has already saved the mindmap (including the switch above)
     
     # Get updated messages for this block
     messages = graph.get_block_messages(block_id)
@@ -341,21 +421,20 @@ async def switch_to_block(block_id: str):
     Returns:
         Updated current block info
     """
-    mindmap = get_storage().load()
-    
     # Find the graph containing this block
-    for gid, g in mindmap.graphs.items():
-        if block_id in g.blocks:
-            mindmap.current_graph_id = gid
-            g.current_block_id = block_id
-            get_storage().save(mindmap)
-            return {
-                "block_id": block_id,
-                "graph_id": gid,
-                "success": True,
-            }
+    gid = await asyncio.to_thread(get_storage().find_graph_for_block, block_id)
+    graph = await asyncio.to_thread(get_storage().load_graph, gid) if gid else None
     
-    raise HTTPException(status_code=404, detail=f"Block {block_id} not found")
+    if not graph or block_id not in graph.blocks:
+        raise HTTPException(status_code=404, detail=f"Block {block_id} not found")
+    
+    graph.current_block_id = block_id
+    await asyncio.to_thread(get_storage().save_graph, graph, make_current=True)
+    return {
+        "block_id": block_id,
+        "graph_id": gid,
+        "success": True,
+    }
 
 
 @app.delete("/api/blocks/{block_id}")
@@ -363,7 +442,8 @@ async def delete_block(block_id: str):
     """
     Delete a block and all its descendants.
     """
-    mindmap = get_storage().load()
+    mgr = await get_conversation_manager()
+    mindmap = mgr.mindmap
 
     graph = None
     for gid, g in mindmap.graphs.items():
@@ -375,18 +455,15 @@ async def delete_block(block_id: str):
     if not graph:
         raise HTTPException(status_code=404, detail=f"Block {block_id} not found")
 
-    mgr = get_conversation_manager()
-    mgr.mindmap = mindmap
     mgr.graph = graph
 
     try:
-        mgr.delete_block(block_id)
+        await asyncio.to_thread(mgr.delete_block, block_id)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    # Reload updated mindmap after deletion
-    mindmap = get_storage().load()
-    graph = mindmap.graphs.get(mindmap.current_graph_id)
+    # delete_block() has already saved; the manager holds the updated graph
+    graph = mgr.graph
     if not graph:
         raise HTTPException(status_code=500, detail="No active graph after delete")
 
@@ -421,14 +498,9 @@ async def switch_mindmap(graph_id: str):
     Returns:
         Updated current mindmap info
     """
-    mindmap = get_storage().load()
-    
-    if graph_id not in mindmap.graphs:
+    if not await asyncio.to_thread(get_storage().set_current_graph, graph_id):
         raise HTTPException(status_code=404, detail=f"Graph {graph_id} not found")
     
-    mindmap.current_graph_id = graph_id
-    get_storage().save(mindmap)
-    
     return {
         "graph_id": graph_id,
         "success": True,
@@ -440,19 +512,12 @@ async def delete_mindmap(graph_id: str):
     """
     Delete a mindmap (graph) and all its blocks/messages.
     """
-    mindmap = get_storage().load()
-
-    if graph_id not in mindmap.graphs:
+    try:
+        current_graph_id = await asyncio.to_thread(get_storage().delete_graph, graph_id)
+    except KeyError:
         raise HTTPException(status_code=404, detail=f"Graph {graph_id} not found")
 
-    del mindmap.graphs[graph_id]
-
-    if mindmap.current_graph_id == graph_id:
-        mindmap.current_graph_id = next(iter(mindmap.graphs.keys()), "")
-
-    get_storage().save(mindmap)
-
     return {
         "success": True,
-        "current_graph_id": mindmap.current_graph_id,
+        "current_graph_id": current_graph_id,
     }